@@ -1,6 +1,110 @@
-from django.contrib import admin
-from .models import Location, Court, Reservation
+from django import forms
+from django.contrib import admin, messages
+from django.http import HttpResponseRedirect
+from .availability import is_available, reservation_hours
+from .booking import SlotUnavailable, book_reservation, cancel_booking
+from .models import ArchivedReservation, Location, Court, Reservation
+from .pagination import EstimatedCountPaginator
 
-admin.site.register(Location)
-admin.site.register(Court)
-admin.site.register(Reservation)
+@admin.register(Location)
+class LocationAdmin(admin.ModelAdmin):
+    list_display = ('name', 'city', 'state', 'address')
+    search_fields = ('name', 'city')
+
+@admin.register(Court)
+class CourtAdmin(admin.ModelAdmin):
+    list_display = ('name', 'location')
+    list_select_related = ('location',)
+    list_filter = ('location',)
+
+class ReservationAdminForm(forms.ModelForm):
+    class Meta:
+        model = Reservation
+        fields = '__all__'
+
+    def clean(self):
+        """
+        Rejects new reservations that do not end after they start, and new
+        confirmed reservations that overlap an existing booking.
+        """
+        cleaned_data = super().clean()
+        court, date = cleaned_data.get('court'), cleaned_data.get('date')
+        start_time, end_time = cleaned_data.get('start_time'), cleaned_data.get('end_time')
+        if self.instance._state.adding and start_time and end_time and not reservation_hours(start_time, end_time):
+            self.add_error('end_time', 'End time must be after the start time.')
+            return cleaned_data
+        if (
+            self.instance._state.adding and cleaned_data.get('status') == 'confirmed' and
+            court and date and start_time and end_time and
+            not is_available(court.id, date, start_time, end_time)
+        ):
+            raise forms.ValidationError('Court is already booked for this time.')
+        return cleaned_data
+
+@admin.register(Reservation)
+class ReservationAdmin(admin.ModelAdmin):
+    """
+    Reservation changelist sized for millions of rows.
+
+    Rows are fetched with their court, location and user in one query, the
+    filters and date hierarchy are backed by indexes, and the paginator never
+    runs a full COUNT(*). Confirmed bookings made or cancelled here claim and
+    release their slots like the site does; court and time of an existing
+    reservation are read-only, so moving one means cancelling and booking again.
+    """
+    form = ReservationAdminForm
+    list_display = ('id', 'date', 'start_time', 'end_time', 'court', 'location', 'user', 'status')
+    list_select_related = ('court__location', 'user')
+    list_filter = ('status', 'date', 'court__location')
+    date_hierarchy = 'date'
+    ordering = ('-id',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    raw_id_fields = ('user', 'court')
+
+    @admin.display(description='Location', ordering='court__location__name')
+    def location(self, reservation):
+        return reservation.court.location.name
+
+    def get_readonly_fields(self, request, obj=None):
+        if obj is None:
+            return ()
+        if obj.status == 'cancelled':
+            return ('user', 'court', 'date', 'start_time', 'end_time', 'status')
+        return ('user', 'court', 'date', 'start_time', 'end_time')
+
+    def changeform_view(self, request, object_id=None, form_url='', extra_context=None):
+        try:
+            return super().changeform_view(request, object_id, form_url, extra_context)
+        except SlotUnavailable:
+            # Another booking claimed the hour after the form was validated;
+            # the admin's transaction has been rolled back.
+            self.message_user(request, 'Court is already booked for this time.', messages.ERROR)
+            return HttpResponseRedirect(request.get_full_path())
+
+    def save_model(self, request, obj, form, change):
+        if not change and obj.status == 'confirmed':
+            book_reservation(obj)
+        elif 'status' in form.changed_data and obj.status == 'cancelled':
+            cancel_booking(obj)
+        else:
+            super().save_model(request, obj, form, change)
+
+@admin.register(ArchivedReservation)
+class ArchivedReservationAdmin(admin.ModelAdmin):
+    """
+    Read-only view of the reservations moved out by archive_reservations.
+    """
+    list_display = ('id', 'date', 'start_time', 'end_time', 'court', 'user', 'status', 'archived_at')
+    list_select_related = ('court__location', 'user')
+    list_filter = ('status',)
+    date_hierarchy = 'date'
+    ordering = ('-id',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
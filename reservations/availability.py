@@ -0,0 +1,283 @@
+import time
+import uuid
+from collections import defaultdict
+from django.core.cache import cache
+from .models import Court, Reservation
+
+# Bookable one-hour slots on the HOUR_CHOICES grid: 07:00 up to the 22:00-23:00 slot.
+FIRST_HOUR = int(Reservation.HOUR_CHOICES[0][0][:2])
+LAST_HOUR = int(Reservation.HOUR_CHOICES[-1][0][:2])
+SLOT_HOURS = list(range(FIRST_HOUR, LAST_HOUR))
+FULL_MASK = (1 << len(SLOT_HOURS)) - 1
+
+OCCUPANCY_TIMEOUT = 60 * 60 * 24
+LOCK_TIMEOUT = 5
+LOCK_WAIT = 1.0
+LOCK_POLL_INTERVAL = 0.01
+
+def reservation_hours(start_time, end_time):
+    """
+    Returns the one-hour slots covered by a reservation.
+
+    Reservations are stored with an inclusive end time one minute before the
+    hour (e.g. '08:00' to '09:59'), so the slot containing end_time is included
+    unless the end time falls exactly on the hour.
+
+    Args:
+        start_time (str): Start time formatted as 'HH:MM'.
+        end_time (str): End time formatted as 'HH:MM'.
+
+    Returns:
+        range: The starting hours of every occupied slot.
+    """
+    start_hour = int(start_time[:2])
+    end_hour, end_minute = int(end_time[:2]), int(end_time[3:5])
+    return range(start_hour, end_hour + (1 if end_minute else 0))
+
+def hours_mask(hours):
+    """
+    Builds an occupancy bitmap from a list of slot hours.
+
+    Bit 0 is the 07:00 slot, bit 1 the 08:00 slot, and so on. Hours outside
+    the bookable grid are ignored.
+
+    Args:
+        hours (iterable[int]): Starting hours of the slots to mark.
+
+    Returns:
+        int: The occupancy bitmap.
+    """
+    mask = 0
+    for hour in hours:
+        if FIRST_HOUR <= hour < LAST_HOUR:
+            mask |= 1 << (hour - FIRST_HOUR)
+    return mask
+
+def mask_hours(mask):
+    """
+    Returns the slot hours whose bits are set in an occupancy bitmap.
+
+    Args:
+        mask (int): The occupancy bitmap.
+
+    Returns:
+        list[int]: Starting hours of the marked slots.
+    """
+    return [hour for index, hour in enumerate(SLOT_HOURS) if mask >> index & 1]
+
+def mask_string(mask):
+    """
+    Renders an occupancy bitmap as one character per slot, '1' when booked.
+
+    Args:
+        mask (int): The occupancy bitmap.
+
+    Returns:
+        str: A string such as '0011000000000000', starting at the 07:00 slot.
+    """
+    return ''.join('1' if mask >> index & 1 else '0' for index in range(len(SLOT_HOURS)))
+
+def occupancy(court_ids, dates, exclude=None):
+    """
+    Loads confirmed reservations for a set of courts and dates in one query.
+
+    Args:
+        court_ids (iterable[int]): Primary keys of the courts to inspect.
+        dates (iterable[date]): Dates to inspect.
+        exclude (int, optional): Primary key of a reservation to ignore.
+
+    Returns:
+        dict: Maps every (court_id, date) pair to its occupancy bitmap. Pairs
+        without reservations are present with a value of 0.
+    """
+    court_ids = list(court_ids)
+    dates = list(dates)
+    bitmaps = {(court_id, day): 0 for court_id in court_ids for day in dates}
+    if not bitmaps:
+        return bitmaps
+
+    reservations = Reservation.objects.filter(
+        court_id__in=court_ids,
+        date__in=dates,
+        status='confirmed',
+    )
+    if exclude is not None:
+        reservations = reservations.exclude(pk=exclude)
+
+    masks = defaultdict(int)
+    for court_id, day, start_time, end_time in reservations.values_list('court_id', 'date', 'start_time', 'end_time'):
+        masks[(court_id, day)] |= hours_mask(reservation_hours(start_time, end_time))
+    bitmaps.update(masks)
+    return bitmaps
+
+def version_key(court_id, date):
+    return f'reservations:occupancy:version:{court_id}:{date.isoformat()}'
+
+def occupancy_key(court_id, date, version):
+    return f'reservations:occupancy:{court_id}:{date.isoformat()}:{version}'
+
+def occupancy_versions(pairs):
+    """
+    Returns the current cache version token of every (court_id, date) pair.
+
+    Missing tokens are created with cache.add so concurrent workers agree on
+    them. Tokens are random so a token lost to eviction is never reissued.
+
+    Args:
+        pairs (iterable[tuple]): The (court_id, date) pairs.
+
+    Returns:
+        dict: Maps every pair to its version token.
+    """
+    keys = {pair: version_key(*pair) for pair in pairs}
+    found = cache.get_many(keys.values())
+    versions = {}
+    for pair, key in keys.items():
+        if key not in found:
+            cache.add(key, uuid.uuid4().hex, timeout=None)
+            found[key] = cache.get(key)
+        versions[pair] = found[key]
+    return versions
+
+def invalidate_occupancy(pairs):
+    """
+    Publishes new version tokens for the given (court_id, date) pairs.
+
+    Cached bitmaps stored under the previous tokens are never read again, even
+    if a worker that computed them before the write stores them afterwards.
+
+    Args:
+        pairs (iterable[tuple]): The (court_id, date) pairs that changed.
+    """
+    cache.set_many({version_key(*pair): uuid.uuid4().hex for pair in set(pairs)}, timeout=None)
+
+def availability_versions(court_ids):
+    """
+    Returns the availability counter of the location owning each court.
+
+    The counter lives in the database and is bumped in the same transaction
+    as every booking change, so unlike the cache version tokens it is seen by
+    every worker process.
+
+    Args:
+        court_ids (iterable[int]): Primary keys of the courts.
+
+    Returns:
+        dict: Maps every court id to its location's availability_version.
+    """
+    return dict(Court.objects.filter(id__in=set(court_ids)).values_list('id', 'location__availability_version'))
+
+def cached_occupancy(court_ids, dates, versions=None):
+    """
+    Returns per-(court, date) occupancy bitmaps from the cache.
+
+    Entries are stored with the availability_version of their location read
+    before computing them, and entries older than the current one are
+    ignored. A worker whose cache missed another worker's invalidation, such
+    as with the per-process local-memory cache, therefore never serves
+    occupancy older than the database counter.
+
+    Cold pairs are computed with a single occupancy query. A lock key taken
+    with cache.add lets one worker recompute a cold pair while the others
+    poll the cache for up to LOCK_WAIT seconds before falling back to the
+    database. With a backend whose add is not atomic several workers may
+    recompute the same pair, which costs queries but not correctness.
+
+    Args:
+        court_ids (iterable[int]): Primary keys of the courts to inspect.
+        dates (iterable[date]): Dates to inspect.
+        versions (dict, optional): Maps court ids to the availability_version
+        the bitmaps must be at least as recent as; loaded with one query when
+        not given.
+
+    Returns:
+        dict: Maps every (court_id, date) pair to its occupancy bitmap.
+    """
+    court_ids, dates = set(court_ids), set(dates)
+    if versions is None:
+        versions = availability_versions(court_ids)
+    pairs = [(court_id, day) for court_id in court_ids for day in dates]
+    tokens = occupancy_versions(pairs)
+    keys = {pair: occupancy_key(*pair, tokens[pair]) for pair in pairs}
+
+    def fresh(found):
+        return {
+            pair: found[key][1] for pair, key in keys.items()
+            if key in found and found[key][0] >= versions.get(pair[0], 0)
+        }
+
+    bitmaps = fresh(cache.get_many(keys.values()))
+    missing = [pair for pair in pairs if pair not in bitmaps]
+    owned = [pair for pair in missing if cache.add(f'{keys[pair]}:lock', 1, timeout=LOCK_TIMEOUT)]
+    if owned:
+        computed = occupancy({court_id for court_id, _ in owned}, {day for _, day in owned})
+        cache.set_many(
+            {keys[pair]: (versions.get(pair[0], 0), computed[pair]) for pair in owned},
+            timeout=OCCUPANCY_TIMEOUT,
+        )
+        cache.delete_many([f'{keys[pair]}:lock' for pair in owned])
+        bitmaps.update((pair, computed[pair]) for pair in owned)
+
+    waiting = [pair for pair in missing if pair not in bitmaps]
+    deadline = time.monotonic() + LOCK_WAIT
+    while waiting and time.monotonic() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        bitmaps.update(fresh(cache.get_many([keys[pair] for pair in waiting])))
+        waiting = [pair for pair in waiting if pair not in bitmaps]
+
+    if waiting:
+        computed = occupancy({court_id for court_id, _ in waiting}, {day for _, day in waiting})
+        bitmaps.update((pair, computed[pair]) for pair in waiting)
+    return bitmaps
+
+def free_hours(court_id, date):
+    """
+    Returns the free one-hour slots for a court on a given date.
+
+    Args:
+        court_id (int): Primary key of the court.
+        date (date): The date to inspect.
+
+    Returns:
+        list[str]: Start times ('HH:00') of the slots that can still be booked.
+    """
+    mask = cached_occupancy([court_id], [date])[(court_id, date)]
+    return [f"{hour:02}:00" for hour in mask_hours(FULL_MASK & ~mask)]
+
+def is_available(court_id, date, start_time, end_time, exclude=None):
+    """
+    Checks whether a time range on a court is free of confirmed reservations.
+
+    Args:
+        court_id (int): Primary key of the court.
+        date (date): The reservation date.
+        start_time (str): Start time formatted as 'HH:MM'.
+        end_time (str): Inclusive end time formatted as 'HH:MM'.
+        exclude (int, optional): Primary key of a reservation to ignore.
+
+    Returns:
+        bool: True if none of the requested slots are occupied.
+    """
+    requested = hours_mask(reservation_hours(start_time, end_time))
+    booked = occupancy([court_id], [date], exclude=exclude)[(court_id, date)]
+    return not requested & booked
+
+def find_conflicts(reservations):
+    """
+    Returns the reservations that overlap an existing confirmed booking.
+
+    All courts and dates of the candidate reservations are checked against the
+    occupancy cache, with one query for the availability counters and at most
+    one for the cold pairs.
+
+    Args:
+        reservations (list[Reservation]): Unsaved candidate reservations.
+
+    Returns:
+        list[Reservation]: The candidates that cannot be booked.
+    """
+    bitmaps = cached_occupancy({reservation.court_id for reservation in reservations}, {reservation.date for reservation in reservations})
+    return [
+        reservation for reservation in reservations
+        if hours_mask(reservation_hours(reservation.start_time, reservation.end_time)) & bitmaps[(reservation.court_id, reservation.date)]
+    ]
@@ -0,0 +1,145 @@
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, connection, transaction
+from collections import defaultdict
+from django.db.models import Case, F, PositiveIntegerField, Q, When
+from django.utils import timezone
+from .availability import FULL_MASK, hours_mask, invalidate_occupancy, reservation_hours
+from .models import CourtDayOccupancy, Location, Reservation, ReservationSlot
+
+def bump_availability_version(court_ids):
+    """
+    Increments the availability counter of the locations owning the given courts.
+
+    Args:
+        court_ids (iterable[int]): Primary keys of the courts that changed.
+    """
+    Location.objects.filter(court__in=set(court_ids)).update(availability_version=F('availability_version') + 1)
+
+ROLLUP_UPDATE_BATCH = 100
+
+def update_occupancy_rollup(reservations, booked):
+    """
+    Sets or clears the hours of reservations in the CourtDayOccupancy rollup.
+
+    Missing rollup rows are created first; the masks are then changed with one
+    UPDATE per ROLLUP_UPDATE_BATCH court days using bitwise operations, so
+    concurrent bookings of other hours on the same court and day do not
+    overwrite each other.
+
+    Args:
+        reservations (iterable[Reservation]): The booked or cancelled reservations.
+        booked (bool): True to mark the hours as booked, False to release them.
+    """
+    masks = defaultdict(int)
+    for reservation in reservations:
+        masks[(reservation.court_id, reservation.date)] |= hours_mask(reservation_hours(reservation.start_time, reservation.end_time))
+    if not masks:
+        return
+
+    if booked:
+        CourtDayOccupancy.objects.bulk_create(
+            (CourtDayOccupancy(court_id=court_id, date=date) for court_id, date in masks),
+            ignore_conflicts=True,
+        )
+    items = list(masks.items())
+    # Bulk imports change many court days at once; bound the statement size.
+    for offset in range(0, len(items), ROLLUP_UPDATE_BATCH):
+        whens, pairs = [], Q()
+        for (court_id, date), mask in items[offset:offset + ROLLUP_UPDATE_BATCH]:
+            whens.append(When(
+                court_id=court_id, date=date,
+                then=F('hours_mask').bitor(mask) if booked else F('hours_mask').bitand(FULL_MASK & ~mask),
+            ))
+            pairs |= Q(court_id=court_id, date=date)
+        CourtDayOccupancy.objects.filter(pairs).update(
+            hours_mask=Case(*whens, default=F('hours_mask'), output_field=PositiveIntegerField()),
+        )
+
+class SlotUnavailable(Exception):
+    """
+    Raised when a reservation overlaps an hour already claimed on its court.
+    """
+
+def book_reservations(reservations):
+    """
+    Saves a set of reservations and claims one ReservationSlot per occupied hour.
+
+    All reservations and their claims are inserted with bulk_create in one
+    transaction, so the set is booked all-or-nothing. If another booking
+    claimed any of the hours first, the unique constraint on (court, date,
+    hour) rejects the insert, the whole transaction is rolled back and
+    SlotUnavailable is raised. The CourtDayOccupancy rollup is updated in the
+    same transaction, and cached occupancy of the booked courts and dates is
+    invalidated once it commits.
+
+    Args:
+        reservations (list[Reservation]): The unsaved reservations to book.
+
+    Raises:
+        ValidationError: If a reservation does not end after it starts, so
+            it would occupy no hour.
+        SlotUnavailable: If any requested hour is already booked.
+    """
+    if any(not reservation_hours(reservation.start_time, reservation.end_time) for reservation in reservations):
+        raise ValidationError({'end_time': ['End time must be after the start time.']})
+    try:
+        with transaction.atomic():
+            if connection.features.can_return_rows_from_bulk_insert:
+                Reservation.objects.bulk_create(reservations)
+            else:
+                for reservation in reservations:
+                    reservation.save()
+            ReservationSlot.objects.bulk_create(
+                ReservationSlot(reservation=reservation, court_id=reservation.court_id, date=reservation.date, hour=hour)
+                for reservation in reservations
+                for hour in reservation_hours(reservation.start_time, reservation.end_time)
+            )
+            bump_availability_version(reservation.court_id for reservation in reservations)
+            update_occupancy_rollup(reservations, booked=True)
+            transaction.on_commit(lambda: invalidate_occupancy((reservation.court_id, reservation.date) for reservation in reservations))
+    except IntegrityError:
+        for reservation in reservations:
+            reservation.pk = None
+            reservation._state.adding = True
+        raise SlotUnavailable('Court is already booked for this time.')
+
+def book_reservation(reservation):
+    """
+    Books a single reservation. See book_reservations.
+
+    Args:
+        reservation (Reservation): The unsaved reservation to book.
+
+    Raises:
+        ValidationError: If the reservation does not end after it starts.
+        SlotUnavailable: If any requested hour is already booked.
+    """
+    book_reservations([reservation])
+
+def cancel_booking(reservation):
+    """
+    Marks a reservation as cancelled, releases its slot claims and rollup hours,
+    and invalidates the cached occupancy of its court and date once the
+    transaction commits.
+
+    The status is switched with a conditional update, so when the same
+    reservation is cancelled concurrently only one call releases anything.
+
+    Args:
+        reservation (Reservation): The confirmed reservation to cancel.
+
+    Returns:
+        bool: True if this call cancelled the reservation, False if it was no
+        longer confirmed.
+    """
+    with transaction.atomic():
+        updated_at = timezone.now()
+        cancelled = Reservation.objects.filter(pk=reservation.pk, status='confirmed').update(status='cancelled', updated_at=updated_at)
+        if not cancelled:
+            return False
+        reservation.status, reservation.updated_at = 'cancelled', updated_at
+        reservation.slots.all().delete()
+        bump_availability_version([reservation.court_id])
+        update_occupancy_rollup([reservation], booked=False)
+        transaction.on_commit(lambda: invalidate_occupancy([(reservation.court_id, reservation.date)]))
+    return True
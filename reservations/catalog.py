@@ -0,0 +1,131 @@
+import threading
+import uuid
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from .models import Court, Location
+
+CATALOG_VERSION_KEY = 'reservations:catalog:version'
+
+LOCATION_FIELDS = [field.attname for field in Location._meta.concrete_fields]
+
+class CourtCatalog:
+    """
+    Immutable snapshot of every location and its courts.
+
+    Courts carry their location in the foreign key cache, so rendering
+    Court.__str__ does not hit the database.
+    """
+
+    def __init__(self, version, locations, courts):
+        self.version = version
+        self.locations = locations
+        self.courts = courts
+        self.courts_by_id = {court.id: court for court in courts}
+        self.locations_by_id = {location.id: location for location in locations}
+
+    def court_choices(self):
+        return [(court.id, str(court)) for court in self.courts]
+
+_catalog = None
+_lock = threading.Lock()
+
+def get_catalog_version():
+    """
+    Returns the current catalog version token from the shared cache.
+
+    The token is a random string rather than a counter so that a token lost to
+    cache eviction is never reissued with a value a worker already loaded.
+
+    Returns:
+        str: The version token.
+    """
+    return cache.get_or_set(CATALOG_VERSION_KEY, lambda: uuid.uuid4().hex, timeout=None)
+
+async def aget_catalog_version():
+    return await cache.aget_or_set(CATALOG_VERSION_KEY, lambda: uuid.uuid4().hex, timeout=None)
+
+def invalidate_catalog():
+    """
+    Publishes a new catalog version so every worker reloads on its next access.
+    """
+    cache.set(CATALOG_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+
+def load_catalog(version):
+    """
+    Loads every location with its courts in a single LEFT JOIN query.
+
+    Args:
+        version (str): The version token the snapshot is built for.
+
+    Returns:
+        CourtCatalog: The loaded catalog.
+    """
+    return build_catalog(version, catalog_rows())
+
+async def aload_catalog(version):
+    """
+    Async counterpart of load_catalog, fetching the rows with the async ORM.
+    """
+    return build_catalog(version, [row async for row in catalog_rows()])
+
+def catalog_rows():
+    # Always the primary: a lagging replica's snapshot would be cached under
+    # the new version token and outlive the next replica sync.
+    return Location.objects.using(DEFAULT_DB_ALIAS).order_by('name', 'id', 'court__name', 'court__id').values_list(
+        *LOCATION_FIELDS, 'court__id', 'court__name'
+    )
+
+def build_catalog(version, rows):
+    """
+    Builds a catalog from location rows LEFT JOINed with their courts.
+    """
+    locations = []
+    courts = []
+    location = None
+    for row in rows:
+        location_values, court_id, court_name = row[:-2], row[-2], row[-1]
+        if location is None or location.id != location_values[0]:
+            location = Location.from_db(DEFAULT_DB_ALIAS, LOCATION_FIELDS, location_values)
+            location.courts = []
+            locations.append(location)
+        if court_id is not None:
+            court = Court.from_db(DEFAULT_DB_ALIAS, ['id', 'location_id', 'name'], (court_id, location.id, court_name))
+            court.location = location
+            location.courts.append(court)
+            courts.append(court)
+
+    return CourtCatalog(version, locations, courts)
+
+def get_catalog():
+    """
+    Returns the process-level catalog, reloading it if its version is stale.
+
+    Returns:
+        CourtCatalog: The current catalog.
+    """
+    global _catalog
+    version = get_catalog_version()
+    catalog = _catalog
+    if catalog is None or catalog.version != version:
+        with _lock:
+            if _catalog is None or _catalog.version != version:
+                _catalog = load_catalog(version)
+            catalog = _catalog
+    return catalog
+
+async def aget_catalog():
+    """
+    Async counterpart of get_catalog for coroutine views.
+
+    A stale snapshot is reloaded without holding the thread lock, since the
+    event loop must not block; concurrent reloads build equivalent snapshots.
+
+    Returns:
+        CourtCatalog: The current catalog.
+    """
+    global _catalog
+    version = await aget_catalog_version()
+    catalog = _catalog
+    if catalog is None or catalog.version != version:
+        catalog = _catalog = await aload_catalog(version)
+    return catalog
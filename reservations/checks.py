@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+PER_PROCESS_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+def cache_is_per_process():
+    """
+    Returns whether the default cache is private to each process, so that
+    other processes, such as management commands, never see its entries.
+    """
+    return settings.CACHES['default']['BACKEND'] in PER_PROCESS_CACHES
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Warns, with check --deploy, when the default cache is not shared between
+    worker processes.
+
+    Catalog, availability and rate limit invalidations then only reach the
+    process that made them, so such a deployment must run a single worker.
+    """
+    if not cache_is_per_process():
+        return []
+    return [Warning(
+        'The default cache is local to each process.',
+        hint=(
+            'Run a single worker process, or set RESERVATIONS_CACHE_DIR or RESERVATIONS_REDIS_URL '
+            'to share the cache between workers and management commands.'
+        ),
+        id='reservations.W001',
+    )]
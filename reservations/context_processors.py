@@ -0,0 +1,24 @@
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.utils.functional import SimpleLazyObject
+from .catalog import get_catalog_version
+
+FRAGMENT_CACHE_TIMEOUT = 60 * 60 * 24
+
+def fragment_cache(request):
+    """
+    Adds the timeout and version used by the {% cache %} fragments of the public pages.
+
+    The version combines the court catalog version, which the Location and
+    Court signals replace on every change, with the static files manifest
+    hash, so fragments are rebuilt after an admin edit or a collectstatic.
+    The version is only read from the cache when a template uses it.
+
+    Returns:
+        dict: 'fragment_timeout' and 'fragment_version' template variables.
+    """
+    return {
+        'fragment_timeout': FRAGMENT_CACHE_TIMEOUT,
+        'fragment_version': SimpleLazyObject(
+            lambda: f"{get_catalog_version()}-{getattr(staticfiles_storage, 'manifest_hash', '')}"
+        ),
+    }
@@ -0,0 +1,80 @@
+from functools import wraps
+from asgiref.sync import iscoroutinefunction
+from django.contrib.auth.views import redirect_to_login
+from django.http import HttpResponse
+from .ratelimit import take_tokens
+from .routers import current_routing
+
+def async_login_required(login_url=None):
+    """
+    Async counterpart of login_required for coroutine views.
+
+    The user is resolved with request.auser() and stored on request.user, so
+    templates rendered by the view read it without a synchronous query.
+
+    Args:
+        login_url (str, optional): Where anonymous users are redirected.
+    """
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            request.user = await request.auser()
+            if not request.user.is_authenticated:
+                return redirect_to_login(request.get_full_path(), login_url)
+            return await view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+def read_replica(view):
+    """
+    Lets a read-only view send its queries to the replica database.
+
+    Reads still go to the primary once the request or an earlier request of
+    the same browser session wrote; see PrimaryReplicaRouter.
+    """
+    def allow_replica():
+        routing = current_routing()
+        if routing is not None:
+            routing.replica = True
+
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            allow_replica()
+            return await view(request, *args, **kwargs)
+    else:
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            allow_replica()
+            return view(request, *args, **kwargs)
+    return wrapper
+
+def rate_limit(scope, account=None, methods=('POST',)):
+    """
+    Limits how often a view is called per client IP and per account, with the
+    token buckets configured in settings.RATE_LIMITS[scope].
+
+    Requests over the limit get a 429 response with Retry-After before the
+    view runs, so they cost no database queries or password hashing.
+
+    Args:
+        scope (str): The RATE_LIMITS entry holding the limits.
+        account (callable, optional): Returns the account a request acts on,
+        such as a posted username, or None.
+        methods (tuple, optional): The limited methods; None limits them all.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if methods is None or request.method in methods:
+                retry_after = take_tokens(scope, {
+                    'ip': request.META.get('REMOTE_ADDR'),
+                    'account': account(request) if account else None,
+                })
+                if retry_after:
+                    response = HttpResponse('Too many requests. Please try again later.', status=429, content_type='text/plain')
+                    response['Retry-After'] = str(retry_after)
+                    return response
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
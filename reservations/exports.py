@@ -0,0 +1,143 @@
+import csv
+import datetime
+from django.core import signing
+from django.utils import timezone
+from .availability import reservation_hours
+
+CALENDAR_FEED_SALT = 'reservations.calendar_feed'
+# Rows fetched per query and rows joined into each chunk written to the client.
+EXPORT_CHUNK_SIZE = 2000
+CSV_HEADER = ['id', 'date', 'start_time', 'end_time', 'status', 'location', 'court', 'username', 'email']
+
+def calendar_token(user):
+    """
+    Returns the token in the URL of a user's calendar feed.
+
+    Calendar apps cannot log in, so the feed is identified by a signed user id
+    that does not expire.
+
+    Args:
+        user (User): The owner of the feed.
+
+    Returns:
+        str: The token.
+    """
+    return signing.Signer(salt=CALENDAR_FEED_SALT).sign(str(user.pk))
+
+def calendar_token_user_id(token):
+    """
+    Returns the user id signed in a calendar feed token, or None if the token
+    was tampered with.
+    """
+    try:
+        return int(signing.Signer(salt=CALENDAR_FEED_SALT).unsign(token))
+    except (signing.BadSignature, ValueError):
+        return None
+
+def chunked(pieces, size=EXPORT_CHUNK_SIZE):
+    """
+    Joins an iterable of strings into chunks of up to size pieces, so a
+    streaming response does not write to the client once per row.
+    """
+    chunk = []
+    for piece in pieces:
+        chunk.append(piece)
+        if len(chunk) >= size:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+
+def ical_text(value):
+    """
+    Escapes a TEXT value for iCalendar (RFC 5545, section 3.3.11).
+    """
+    return value.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+def ical_line(line):
+    """
+    Folds a content line at 75 octets and terminates it with CRLF.
+    """
+    folded, octets = [], 0
+    for character in line:
+        size = len(character.encode())
+        if octets + size > 75:
+            folded.append('\r\n ')
+            octets = 1
+        folded.append(character)
+        octets += size
+    return ''.join(folded) + '\r\n'
+
+def ical_datetime(value):
+    return value.astimezone(datetime.timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+def ical_event(reservation, domain):
+    """
+    Renders a reservation as a VEVENT. The court and location must be
+    selected with the reservation.
+    """
+    hours = reservation_hours(reservation.start_time, reservation.end_time)
+    start = timezone.make_aware(datetime.datetime.combine(reservation.date, datetime.time(int(reservation.start_time[:2]))))
+    end = start + datetime.timedelta(hours=max(len(hours), 1))
+    location = reservation.court.location
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:reservation-{reservation.pk}@{domain}',
+        f'DTSTAMP:{ical_datetime(reservation.updated_at)}',
+        f'DTSTART:{ical_datetime(start)}',
+        f'DTEND:{ical_datetime(end)}',
+        f'SUMMARY:{ical_text(f"Padel at {location.name} - {reservation.court.name}")}',
+        f'LOCATION:{ical_text(f"{location.address}, {location.city}, {location.state}")}',
+        'END:VEVENT',
+    ]
+    return ''.join(ical_line(line) for line in lines)
+
+def ical_stream(reservations, domain):
+    """
+    Streams reservations as an iCalendar document.
+
+    Rows are read with a chunked iterator, so memory use does not depend on
+    the number of reservations.
+
+    Args:
+        reservations (QuerySet): The reservations, with court__location selected.
+        domain (str): The host used to build globally unique event ids.
+
+    Yields:
+        str: Chunks of the document.
+    """
+    yield ical_line('BEGIN:VCALENDAR') + ical_line('VERSION:2.0') + ical_line('PRODID:-//Padel Court Reservations//EN')
+    yield ical_line('CALSCALE:GREGORIAN') + ical_line('X-WR-CALNAME:Padel reservations')
+    yield from chunked(ical_event(reservation, domain) for reservation in reservations.iterator(chunk_size=EXPORT_CHUNK_SIZE))
+    yield ical_line('END:VCALENDAR')
+
+class Echo:
+    """
+    File-like object whose write returns the value, so csv.writer can
+    format one row at a time.
+    """
+
+    def write(self, value):
+        return value
+
+def csv_stream(reservations):
+    """
+    Streams reservations as CSV.
+
+    Args:
+        reservations (iterable): Reservations or archived reservations, with
+        court__location and user selected, read with a chunked iterator.
+
+    Yields:
+        str: Chunks of the CSV document, starting with the header.
+    """
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_HEADER)
+    yield from chunked(
+        writer.writerow([
+            reservation.pk, reservation.date.isoformat(), reservation.start_time, reservation.end_time,
+            reservation.status, reservation.court.location.name, reservation.court.name,
+            reservation.user.username, reservation.user.email,
+        ])
+        for reservation in reservations
+    )
@@ -1,22 +1,120 @@
 from django import forms
+from django.core.exceptions import ValidationError
+from .catalog import get_catalog
 from .models import Reservation, Court
 from django.contrib.auth.forms import UserCreationForm, UserChangeForm, AuthenticationForm
 from django.contrib.auth.models import User
-from datetime import date
+from datetime import date, timedelta
+
+class CourtChoiceIterator(forms.models.ModelChoiceIterator):
+    """
+    Iterates the courts of the cached catalog instead of running the queryset.
+    """
+
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ("", self.field.empty_label)
+        for court in get_catalog().courts:
+            yield self.choice(court)
+
+    def __len__(self):
+        return len(get_catalog().courts) + (self.field.empty_label is not None)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(get_catalog().courts)
+
+class CourtChoiceField(forms.ModelChoiceField):
+    """
+    Court selector backed by the process-level court catalog.
+
+    Rendering and validation are served from the catalog, so neither a GET nor
+    a POST of the reservation form queries the Court or Location tables.
+    """
+    iterator = CourtChoiceIterator
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        try:
+            return get_catalog().courts_by_id[int(value)]
+        except (KeyError, TypeError, ValueError):
+            raise ValidationError(
+                self.error_messages['invalid_choice'],
+                code='invalid_choice',
+                params={'value': value},
+            )
+
+class CourtMultipleChoiceField(forms.ModelMultipleChoiceField):
+    """
+    Multiple court selector backed by the process-level court catalog.
+    """
+    iterator = CourtChoiceIterator
+
+    def _check_values(self, value):
+        courts_by_id = get_catalog().courts_by_id
+        courts = []
+        for pk in value:
+            try:
+                courts.append(courts_by_id[int(pk)])
+            except (KeyError, TypeError, ValueError):
+                raise ValidationError(
+                    self.error_messages['invalid_choice'],
+                    code='invalid_choice',
+                    params={'value': pk},
+                )
+        return courts
 
 class ReservationForm(forms.ModelForm):
+    MAX_RECURRING_WEEKS = 12
     START_TIME_CHOICES = [(f"{hour:02}:00", f"{hour:02}:00") for hour in range(7, 23)]
     END_TIME_CHOICES = [(f"{hour:02}:00", f"{hour:02}:00") for hour in range(8, 24)]
 
     start_time = forms.ChoiceField(choices=START_TIME_CHOICES, widget=forms.Select(attrs={'class': 'form-control'}))
     end_time = forms.ChoiceField(choices=END_TIME_CHOICES, widget=forms.Select(attrs={'class': 'form-control'}))
     date = forms.DateField(widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date', 'min': date.today().strftime}))
-    court = forms.ModelChoiceField(queryset=Court.objects.all(), widget=forms.Select(attrs={'class': 'form-control'}))
+    court = CourtChoiceField(queryset=Court.objects.all(), widget=forms.Select(attrs={'class': 'form-control'}))
+    extra_courts = CourtMultipleChoiceField(queryset=Court.objects.all(), required=False, label='Also book courts', widget=forms.SelectMultiple(attrs={'class': 'form-control'}))
+    weeks = forms.IntegerField(min_value=1, max_value=MAX_RECURRING_WEEKS, initial=1, required=False, label='Repeat weekly for (weeks)', widget=forms.NumberInput(attrs={'class': 'form-control'}))
 
     class Meta:
         model = Reservation
         fields = ['court', 'date', 'start_time', 'end_time']
 
+    def clean(self):
+        cleaned_data = super().clean()
+        start_time, end_time = cleaned_data.get('start_time'), cleaned_data.get('end_time')
+        if start_time and end_time and end_time <= start_time:
+            self.add_error('end_time', 'End time must be after the start time.')
+        return cleaned_data
+
+    def occurrences(self, reservation):
+        """
+        Expands a validated reservation into every occurrence requested by the form.
+
+        One reservation is built per selected court and per week, starting on
+        the date of the given reservation.
+
+        Args:
+            reservation (Reservation): The unsaved reservation for the first
+                occurrence, with user and times already set.
+
+        Returns:
+            list[Reservation]: The requested reservations, earliest first.
+        """
+        courts = [reservation.court]
+        for court in self.cleaned_data.get('extra_courts') or []:
+            if court not in courts:
+                courts.append(court)
+
+        return [
+            Reservation(
+                user=reservation.user, court=court, date=reservation.date + timedelta(weeks=week),
+                start_time=reservation.start_time, end_time=reservation.end_time,
+            )
+            for week in range(self.cleaned_data.get('weeks') or 1)
+            for court in courts
+        ]
+
 class SignUpForm(UserCreationForm):
     username = forms.CharField(max_length=30, widget=forms.TextInput(attrs={'class': 'form-control'}))
     email = forms.EmailField(max_length=254, help_text='Required. Inform a valid email address.', widget=forms.EmailInput(attrs={'class': 'form-control'}))
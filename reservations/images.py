@@ -0,0 +1,75 @@
+import os
+from io import BytesIO
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+RENDITION_WIDTHS = (320, 640, 1024)
+RENDITION_FORMATS = {'jpeg': ('JPEG', 'jpg'), 'webp': ('WEBP', 'webp')}
+RENDITION_QUALITY = 80
+
+def rendition_name(name, width, format):
+    """
+    Returns the storage name of one rendition, stored next to the original.
+
+    Args:
+        name (str): Storage name of the original image.
+        width (int): Width of the rendition in pixels.
+        format (str): A key of RENDITION_FORMATS.
+
+    Returns:
+        str: For example 'location_images/club-640w.webp'.
+    """
+    root, _ = os.path.splitext(name)
+    return f'{root}-{width}w.{RENDITION_FORMATS[format][1]}'
+
+def rendition_widths(original_width):
+    """
+    Returns the widths to render for an image without upscaling it.
+
+    Images narrower than the smallest width get a single rendition at their
+    own width, so they are still re-encoded and served as WebP.
+    """
+    widths = [width for width in RENDITION_WIDTHS if width < original_width]
+    return widths or [original_width]
+
+def generate_renditions(image):
+    """
+    Writes resized JPEG and WebP renditions of an image to its storage.
+
+    Existing renditions with the same names are replaced. EXIF orientation is
+    applied before resizing, and the renditions carry no metadata.
+
+    Args:
+        image (FieldFile): The original image.
+
+    Returns:
+        list[int]: The widths of the generated renditions.
+    """
+    with image.storage.open(image.name, 'rb') as original_file:
+        original = ImageOps.exif_transpose(Image.open(original_file))
+        original = original.convert('RGB')
+
+    widths = rendition_widths(original.width)
+    for width in widths:
+        height = max(1, round(original.height * width / original.width))
+        resized = original.resize((width, height), Image.LANCZOS)
+        for format, (pillow_format, _) in RENDITION_FORMATS.items():
+            buffer = BytesIO()
+            resized.save(buffer, pillow_format, quality=RENDITION_QUALITY, optimize=True)
+            name = rendition_name(image.name, width, format)
+            image.storage.delete(name)
+            image.storage.save(name, ContentFile(buffer.getvalue()))
+    return widths
+
+def delete_renditions(name, widths, storage):
+    """
+    Deletes the renditions of an image from its storage.
+
+    Args:
+        name (str): Storage name of the original image.
+        widths (list[int]): The widths that were generated.
+        storage (Storage): The storage holding the files.
+    """
+    for width in widths:
+        for format in RENDITION_FORMATS:
+            storage.delete(rendition_name(name, width, format))
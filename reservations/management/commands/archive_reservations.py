@@ -0,0 +1,54 @@
+import datetime
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from reservations.models import ArchivedReservation, Reservation
+from reservations.signals import archiving_reservations
+
+class Command(BaseCommand):
+    help = (
+        'Moves reservations older than the archive horizon from the Reservation table to '
+        'ArchivedReservation in batches, keeping the tables used by booking and the upcoming '
+        'reservations list small. Safe to interrupt and rerun.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=settings.RESERVATION_ARCHIVE_DAYS,
+            help='Archive reservations dated more than this many days ago.',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000, help='Reservations moved per transaction.')
+
+    def handle(self, *args, **options):
+        if options['days'] < 1:
+            raise CommandError('--days must be at least 1.')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1.')
+
+        started = time.perf_counter()
+        cutoff = timezone.localtime(timezone.now()).date() - datetime.timedelta(days=options['days'])
+        moved = 0
+        while True:
+            # Each batch is copied and deleted in one transaction, so an
+            # interrupted run leaves every reservation in exactly one table.
+            with transaction.atomic():
+                batch = list(Reservation.objects.filter(date__lt=cutoff).order_by('id')[:options['batch_size']])
+                if not batch:
+                    break
+                ArchivedReservation.objects.bulk_create(
+                    ArchivedReservation(
+                        id=reservation.id, user_id=reservation.user_id, court_id=reservation.court_id,
+                        date=reservation.date, start_time=reservation.start_time,
+                        end_time=reservation.end_time, status=reservation.status,
+                    )
+                    for reservation in batch
+                )
+                # Slot claims and reminders of the archived reservations go too.
+                with archiving_reservations():
+                    Reservation.objects.filter(id__in=[reservation.id for reservation in batch]).delete()
+            moved += len(batch)
+            self.stdout.write(f'Archived {moved} reservations...')
+
+        self.stdout.write(f'Archived {moved} reservations dated before {cutoff} in {time.perf_counter() - started:.2f}s.')
@@ -0,0 +1,162 @@
+import asyncio
+import json
+import platform
+import statistics
+import threading
+import time
+import django
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import AsyncClient, Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from django.utils import timezone
+from .bench_reservations import Command as BenchReservationsCommand, percentile
+
+DEFAULT_URLS = ['reservations_list', 'past_reservations', 'cancelled_reservations', 'locations_list']
+
+class Command(BaseCommand):
+    help = (
+        'Compares the throughput of the read-heavy pages served through the WSGI and ASGI '
+        'handlers at a given concurrency. Both handlers run in-process against a throwaway '
+        'test database: WSGI with one thread per concurrent client, ASGI with concurrent '
+        'coroutines on one event loop.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--locations', type=int, default=3, help='Number of locations to seed.')
+        parser.add_argument('--courts-per-location', type=int, default=4, help='Courts seeded per location.')
+        parser.add_argument('--users', type=int, default=50, help='Number of users to seed.')
+        parser.add_argument('--years', type=float, default=1, help='Years of reservation history to seed.')
+        parser.add_argument('--slots-per-day', type=int, default=6, help='Booked hours per court and day.')
+        parser.add_argument('--seed', type=int, default=2024, help='Random seed for the dataset.')
+        parser.add_argument('--concurrency', type=int, default=64, help='Concurrent clients per handler.')
+        parser.add_argument('--requests', type=int, default=1000, help='Requests per URL and handler.')
+        parser.add_argument('--url', action='append', dest='urls', help='URL name to drive; repeatable.')
+        parser.add_argument('--output', default='bench_asgi.json', help='Path of the JSON results file.')
+        parser.add_argument(
+            '--use-current-db', action='store_true',
+            help='Seed into the current database instead of creating a throwaway test database.',
+        )
+
+    def handle(self, *args, **options):
+        if options['use_current_db']:
+            results = self.run(options)
+        else:
+            setup_test_environment(debug=False)
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+            try:
+                results = self.run(options)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+                teardown_test_environment()
+
+        with open(options['output'], 'w') as output:
+            json.dump(results, output, indent=2)
+
+        self.stdout.write(f"{'url':<26}{'handler':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'errors':>8}")
+        for name, handlers in results['results'].items():
+            for handler, result in handlers.items():
+                self.stdout.write(
+                    f"{name:<26}{handler:>8}{result['requests_per_second']:>10.1f}{result['p50_ms']:>10.2f}"
+                    f"{result['p95_ms']:>10.2f}{result['errors']:>8}"
+                )
+        self.stdout.write(f"Results written to {options['output']}")
+
+    def run(self, options):
+        dataset = BenchReservationsCommand().seed(options)
+        login = Client()
+        login.force_login(dataset['users'][0])
+        cookies = login.cookies
+        paths = {name: reverse(name) for name in options['urls'] or DEFAULT_URLS}
+
+        results = {}
+        for name, path in paths.items():
+            results[name] = {
+                'wsgi': self.measure_wsgi(cookies, path, options['concurrency'], options['requests']),
+                'asgi': asyncio.run(self.measure_asgi(cookies, path, options['concurrency'], options['requests'])),
+            }
+
+        return {
+            'meta': {
+                'timestamp': timezone.now().isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'reservations': dataset['reservation_count'],
+                'options': {key: options[key] for key in (
+                    'locations', 'courts_per_location', 'users', 'years', 'slots_per_day', 'seed', 'concurrency', 'requests',
+                )},
+            },
+            'results': results,
+        }
+
+    def measure_wsgi(self, cookies, path, concurrency, requests):
+        """
+        Drives a URL through the WSGI handler from one thread per client.
+
+        Every client shares one logged-in session so the timed work is limited
+        to serving the page.
+        """
+        remaining = iter(range(requests))
+        remaining_lock = threading.Lock()
+        timings = []
+        errors = []
+
+        def worker():
+            client = Client(raise_request_exception=False)
+            client.cookies = cookies
+            try:
+                while True:
+                    with remaining_lock:
+                        if next(remaining, None) is None:
+                            return
+                    started = time.perf_counter()
+                    response = client.get(path)
+                    timings.append((time.perf_counter() - started) * 1000)
+                    if response.status_code != 200:
+                        errors.append(response.status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return self.summarize(timings, errors, time.perf_counter() - started)
+
+    async def measure_asgi(self, cookies, path, concurrency, requests):
+        """
+        Drives a URL through the ASGI handler from concurrent coroutines.
+        """
+        client = AsyncClient(raise_request_exception=False)
+        client.cookies = cookies
+        semaphore = asyncio.Semaphore(concurrency)
+        timings = []
+        errors = []
+
+        async def fetch():
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.get(path)
+                timings.append((time.perf_counter() - started) * 1000)
+                if response.status_code != 200:
+                    errors.append(response.status_code)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(fetch() for _ in range(requests)))
+        return self.summarize(timings, errors, time.perf_counter() - started)
+
+    def summarize(self, timings, errors, seconds):
+        return {
+            'requests': len(timings),
+            'seconds': round(seconds, 3),
+            'requests_per_second': round(len(timings) / seconds, 1) if seconds else 0,
+            'mean_ms': round(statistics.fmean(timings), 3),
+            'p50_ms': round(percentile(timings, 50), 3),
+            'p95_ms': round(percentile(timings, 95), 3),
+            'errors': len(errors),
+            'status_codes': sorted(set(errors)),
+        }
@@ -0,0 +1,322 @@
+import datetime
+import json
+import math
+import platform
+import random
+import re
+import statistics
+import time
+import tracemalloc
+from io import StringIO
+import django
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection, reset_queries
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings, setup_test_environment, teardown_test_environment
+from django.urls import URLPattern, reverse
+from django.utils import timezone
+from reservations import urls
+from reservations.availability import reservation_hours
+from reservations.catalog import invalidate_catalog
+from reservations.exports import calendar_token
+from reservations.models import Court, Location, OutboxEmail, Reservation, ReservationSlot, User
+from reservations.utils import VERIFICATION_COOKIE, make_verification_token
+
+BENCH_PASSWORD = 'bench-Passw0rd'
+
+def send(bench_client, method, path, data):
+    """
+    Sends one request, reading a streamed response to the end so that the
+    work done while streaming is measured too.
+    """
+    response = getattr(bench_client, method)(path, data)
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+    return response
+
+def percentile(values, percent):
+    """
+    Returns the nearest-rank percentile of a list of values.
+    """
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(percent / 100 * len(ordered)) - 1)]
+
+class Command(BaseCommand):
+    help = (
+        'Seeds a synthetic dataset into a throwaway test database, drives every URL in '
+        'reservations/urls.py through the test client and reports latency percentiles, '
+        'queries and peak allocated memory per request as JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--locations', type=int, default=3, help='Number of locations to seed.')
+        parser.add_argument('--courts-per-location', type=int, default=4, help='Courts seeded per location.')
+        parser.add_argument('--users', type=int, default=50, help='Number of users to seed.')
+        parser.add_argument('--years', type=float, default=1, help='Years of reservation history to seed.')
+        parser.add_argument('--slots-per-day', type=int, default=6, help='Booked hours per court and day.')
+        parser.add_argument('--iterations', type=int, default=50, help='Timed requests per URL.')
+        parser.add_argument('--seed', type=int, default=2024, help='Random seed for the dataset.')
+        parser.add_argument('--output', default='bench_reservations.json', help='Path of the JSON results file.')
+        parser.add_argument(
+            '--use-current-db', action='store_true',
+            help='Seed into the current database instead of creating a throwaway test database.',
+        )
+
+    def handle(self, *args, **options):
+        if options['use_current_db']:
+            results = self.run(options)
+        else:
+            setup_test_environment(debug=False)
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+            try:
+                results = self.run(options)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+                teardown_test_environment()
+
+        with open(options['output'], 'w') as output:
+            json.dump(results, output, indent=2)
+
+        self.stdout.write(f"{'url':<28}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'queries':>10}{'peak KiB':>10}")
+        for name, result in results['results'].items():
+            self.stdout.write(
+                f"{name:<28}{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}{result['p99_ms']:>10.2f}"
+                f"{result['queries']:>10}{result['peak_alloc_kib']:>10.1f}"
+            )
+        for name, flow in results['flows'].items():
+            self.stdout.write(
+                f"{name} flow: {flow['queries']} queries, {flow['db_writes']} database writes, "
+                f"{flow['session_writes']} session writes"
+            )
+        self.stdout.write(f"Results written to {options['output']}")
+
+    def run(self, options):
+        started = time.perf_counter()
+        dataset = self.seed(options)
+        seed_seconds = time.perf_counter() - started
+
+        results = {}
+        # Measure the views themselves, not the 429 responses of rate limiting.
+        with override_settings(RATE_LIMITS={}):
+            for name, build_request in self.scenarios(dataset, options['iterations']).items():
+                results[name] = self.measure(build_request, options['iterations'])
+            flows = {'signup': self.measure_signup_flow()}
+
+        return {
+            'meta': {
+                'timestamp': timezone.now().isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'seed_seconds': round(seed_seconds, 3),
+                'reservations': dataset['reservation_count'],
+                'options': {key: options[key] for key in (
+                    'locations', 'courts_per_location', 'users', 'years', 'slots_per_day', 'iterations', 'seed',
+                )},
+            },
+            'results': results,
+            'flows': flows,
+        }
+
+    def seed(self, options):
+        """
+        Bulk inserts locations, courts, users and reservation history.
+
+        Every court gets slots_per_day distinct one-hour bookings for each day
+        from the start of the history up to two weeks ahead. Confirmed bookings
+        also get their slot claims and the occupancy rollup is rebuilt. One
+        staff user drives the staff-only views.
+        """
+        rng = random.Random(options['seed'])
+        locations = Location.objects.bulk_create(
+            Location(
+                name=f'Bench Club {index}', city='Monterrey', state='NL', address=f'Calle {index}',
+                zip_code=64000 + index, phone_number=8180000000 + index,
+            )
+            for index in range(options['locations'])
+        )
+        courts = Court.objects.bulk_create(
+            Court(location=location, name=f'Court {index + 1}')
+            for location in locations
+            for index in range(options['courts_per_location'])
+        )
+        password = make_password(BENCH_PASSWORD)
+        users = User.objects.bulk_create(
+            User(username=f'bench{index}', email=f'bench{index}@example.com', password=password)
+            for index in range(options['users'])
+        )
+        staff = User.objects.create(username='bench-staff', email='bench-staff@example.com', password=password, is_staff=True)
+        invalidate_catalog()
+
+        today = timezone.localtime(timezone.now()).date()
+        first_day = today - datetime.timedelta(days=int(options['years'] * 365))
+        hours = list(range(7, 23))
+        slots_per_day = min(options['slots_per_day'], len(hours))
+        reservation_count = 0
+        day = first_day
+        while day <= today + datetime.timedelta(days=14):
+            reservations = [
+                Reservation(
+                    user=rng.choice(users), court=court, date=day,
+                    start_time=f'{hour:02}:00', end_time=f'{hour:02}:59',
+                    status='cancelled' if rng.random() < 0.1 else 'confirmed',
+                )
+                for court in courts
+                for hour in rng.sample(hours, slots_per_day)
+            ]
+            Reservation.objects.bulk_create(reservations, batch_size=500)
+            ReservationSlot.objects.bulk_create(
+                (
+                    ReservationSlot(reservation=reservation, court_id=reservation.court_id, date=day, hour=hour)
+                    for reservation in reservations if reservation.status == 'confirmed'
+                    for hour in reservation_hours(reservation.start_time, reservation.end_time)
+                ),
+                batch_size=500,
+            )
+            reservation_count += len(reservations)
+            day += datetime.timedelta(days=1)
+        call_command('rebuild_occupancy_rollup', stdout=StringIO())
+
+        return {'users': users, 'staff': staff, 'courts': courts, 'reservation_count': reservation_count, 'today': today}
+
+    def scenarios(self, dataset, iterations):
+        """
+        Returns a request builder for every named URL in reservations/urls.py.
+
+        A builder returns the client, method, path and data for one request.
+        Write endpoints are driven with GET so repeated iterations measure the
+        same work; cancel_reservation targets a fresh upcoming reservation on
+        every call.
+        """
+        user = dataset['users'][0]
+        court = dataset['courts'][0]
+        tomorrow = (dataset['today'] + datetime.timedelta(days=1)).isoformat()
+        first_free_day = dataset['today'] + datetime.timedelta(days=30)
+        cancellable = Reservation.objects.bulk_create(
+            Reservation(
+                user=user, court=court, date=first_free_day + datetime.timedelta(days=index // 16),
+                start_time=f'{7 + index % 16:02}:00', end_time=f'{7 + index % 16:02}:59',
+            )
+            for index in range(iterations + 3)
+        )
+        upcoming = iter([reservation.id for reservation in cancellable])
+
+        def client(authenticated=True, as_user=user):
+            bench_client = Client(raise_request_exception=False)
+            if authenticated:
+                bench_client.force_login(as_user)
+            return bench_client
+
+        anonymous = client(authenticated=False)
+        member = client()
+        staff = client(as_user=dataset['staff'])
+        verifying = client(authenticated=False)
+        verifying.cookies[VERIFICATION_COOKIE] = make_verification_token(user, '123456')
+
+        special = {
+            'court_availability': lambda: (member, 'get', reverse('court_availability', args=[court.id]), {'date': tomorrow}),
+            'location_availability': lambda: (member, 'get', reverse('location_availability', args=[court.location_id]), {'start': tomorrow}),
+            'utilization_report': lambda: (staff, 'get', reverse('utilization_report', args=[court.location_id]), {}),
+            'reservations_export': lambda: (staff, 'get', reverse('reservations_export'), {}),
+            'metrics': lambda: (staff, 'get', reverse('metrics'), {}),
+            'calendar_feed': lambda: (anonymous, 'get', reverse('calendar_feed', args=[calendar_token(user)]), {}),
+            'cancel_reservation': lambda: (member, 'get', reverse('cancel_reservation', args=[next(upcoming, 0)]), {}),
+            'home': lambda: (anonymous, 'get', reverse('home'), {}),
+            'locations_list': lambda: (anonymous, 'get', reverse('locations_list'), {}),
+            'signup': lambda: (anonymous, 'get', reverse('signup'), {}),
+            'login': lambda: (anonymous, 'get', reverse('login'), {}),
+            'logout': lambda: (client(), 'get', reverse('logout'), {}),
+            'verify_email': lambda: (verifying, 'get', reverse('verify_email'), {}),
+            'resend_code': lambda: (verifying, 'get', reverse('resend_code'), {}),
+        }
+
+        scenarios = {}
+        for pattern in urls.urlpatterns:
+            if not isinstance(pattern, URLPattern) or not pattern.name:
+                continue
+            if pattern.name in special:
+                scenarios[pattern.name] = special[pattern.name]
+            elif not pattern.pattern.converters:
+                scenarios[pattern.name] = lambda name=pattern.name: (member, 'get', reverse(name), {})
+            else:
+                self.stderr.write(f'Skipping {pattern.name}: no sample arguments defined.')
+        return scenarios
+
+    def measure_signup_flow(self):
+        """
+        Walks signup, resend code and verification, counting database writes.
+
+        Outbox inserts are left out since they are the same for every
+        session configuration.
+        """
+        flow_client = Client(raise_request_exception=False)
+        queries = writes = session_writes = 0
+
+        def step(method, path, data=None):
+            nonlocal queries, writes, session_writes
+            reset_queries()
+            with CaptureQueriesContext(connection) as captured:
+                getattr(flow_client, method)(path, data or {})
+            statements = [query['sql'] for query in captured.captured_queries]
+            changes = [sql for sql in statements if re.match(r'(INSERT|UPDATE|DELETE)', sql) and 'outboxemail' not in sql]
+            queries += len(statements)
+            writes += len(changes)
+            session_writes += len([sql for sql in changes if 'django_session' in sql])
+
+        step('post', reverse('signup'), {
+            'username': 'bench-signup', 'email': 'bench-signup@example.com', 'first_name': 'Bench', 'last_name': 'Signup',
+            'password1': BENCH_PASSWORD, 'password2': BENCH_PASSWORD,
+        })
+        step('get', reverse('verify_email'))
+        step('get', reverse('resend_code'))
+        code = re.search(r'\b\d{6}\b', OutboxEmail.objects.filter(to='bench-signup@example.com').latest('id').text_body).group()
+        step('post', reverse('verify_email'), {'code': code})
+        return {'queries': queries, 'db_writes': writes, 'session_writes': session_writes}
+
+    def measure(self, build_request, iterations):
+        """
+        Drives one URL and returns its latency, query and allocation figures.
+
+        Latency is timed without query capture or tracemalloc; queries and
+        peak allocated memory are taken from one extra instrumented request.
+        """
+        bench_client, method, path, data = build_request()
+        send(bench_client, method, path, data)
+
+        timings = []
+        status_codes = set()
+        for _ in range(iterations):
+            bench_client, method, path, data = build_request()
+            started = time.perf_counter()
+            response = send(bench_client, method, path, data)
+            timings.append((time.perf_counter() - started) * 1000)
+            status_codes.add(response.status_code)
+
+        bench_client, method, path, data = build_request()
+        reset_queries()
+        with CaptureQueriesContext(connection) as queries:
+            send(bench_client, method, path, data)
+        query_count = len(queries)
+
+        bench_client, method, path, data = build_request()
+        tracemalloc.start()
+        try:
+            send(bench_client, method, path, data)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        return {
+            'path': path,
+            'status_codes': sorted(status_codes),
+            'iterations': iterations,
+            'mean_ms': round(statistics.fmean(timings), 3),
+            'p50_ms': round(percentile(timings, 50), 3),
+            'p95_ms': round(percentile(timings, 95), 3),
+            'p99_ms': round(percentile(timings, 99), 3),
+            'queries': query_count,
+            'peak_alloc_kib': round(peak / 1024, 1),
+        }
@@ -0,0 +1,189 @@
+import datetime
+import json
+import os
+import platform
+import statistics
+import tempfile
+import threading
+import time
+import django
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, close_old_connections, connection, connections
+from django.test.utils import override_settings
+from django.utils import timezone
+from reservations.booking import book_reservation
+from reservations.catalog import invalidate_catalog
+from reservations.models import Court, Location, Reservation
+from .bench_reservations import percentile
+
+# The stock configuration is Django's sqlite3 backend as shipped, which
+# connects with Python's default 5 second lock timeout; it states SQLite's
+# defaults explicitly so that the journal mode left behind by the previous run
+# is reset. no-wait is the same with timeout=0, SQLite's own default of failing
+# at once on a locked database, for comparison only.
+STOCK_PRAGMAS = {'journal_mode': 'delete', 'synchronous': 'full'}
+CONFIGURATIONS = {
+    'stock': {'pragmas': STOCK_PRAGMAS, 'options': None, 'conn_max_age': 0},
+    'no-wait': {'pragmas': STOCK_PRAGMAS, 'options': {'timeout': 0}, 'conn_max_age': 0},
+    'tuned': {'pragmas': None, 'options': None, 'conn_max_age': 60},
+}
+
+class Command(BaseCommand):
+    help = (
+        'Runs concurrent booking writers and listing readers against a throwaway SQLite file '
+        'with the stock SQLite settings, with the stock settings and no lock wait, and with '
+        'SQLITE_PRAGMAS and persistent connections, and reports write throughput and '
+        '"database is locked" error rates.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=16, help='Concurrent booking threads.')
+        parser.add_argument('--readers', type=int, default=4, help='Concurrent threads listing reservations.')
+        parser.add_argument('--bookings', type=int, default=400, help='Bookings attempted per configuration.')
+        parser.add_argument('--output', default='bench_sqlite_writes.json', help='Path of the JSON results file.')
+        parser.add_argument(
+            '--use-current-db', action='store_true',
+            help='Run against the current database instead of a throwaway SQLite file.',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('bench_sqlite_writes only runs against SQLite.')
+
+        if options['use_current_db']:
+            results = {name: self.run(configuration, options) for name, configuration in CONFIGURATIONS.items()}
+        else:
+            with tempfile.TemporaryDirectory() as directory:
+                # WAL needs a file; the default test database lives in memory.
+                connection.settings_dict['TEST']['NAME'] = os.path.join(directory, 'bench.sqlite3')
+                old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+                try:
+                    results = {name: self.run(configuration, options) for name, configuration in CONFIGURATIONS.items()}
+                finally:
+                    connections.close_all()
+                    connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        results = {
+            'meta': {
+                'timestamp': timezone.now().isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'options': {key: options[key] for key in ('writers', 'readers', 'bookings')},
+            },
+            'results': results,
+        }
+        with open(options['output'], 'w') as output:
+            json.dump(results, output, indent=2)
+
+        self.stdout.write(f"{'config':<8}{'writes/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'locked':>8}{'error %':>9}{'reads/s':>10}")
+        for name, result in results['results'].items():
+            self.stdout.write(
+                f"{name:<8}{result['writes_per_second']:>10.1f}{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}"
+                f"{result['locked_errors']:>8}{result['error_rate'] * 100:>9.2f}{result['reads_per_second']:>10.1f}"
+            )
+        self.stdout.write(f"Results written to {options['output']}")
+
+    def run(self, configuration, options):
+        """
+        Books options['bookings'] distinct slots from concurrent writers while
+        readers list reservations, closing connections between operations the
+        way request_finished does.
+        """
+        connections.close_all()
+        pragmas = configuration['pragmas']
+        overrides = {} if pragmas is None else {'SQLITE_PRAGMAS': pragmas}
+        settings_dict = connections.settings[connection.alias]
+        previous_max_age, previous_options = settings_dict['CONN_MAX_AGE'], settings_dict['OPTIONS']
+        settings_dict['CONN_MAX_AGE'] = configuration['conn_max_age']
+        if configuration['options'] is not None:
+            settings_dict['OPTIONS'] = {**previous_options, **configuration['options']}
+        try:
+            with override_settings(**overrides):
+                court, users, first_day = self.seed(options['writers'])
+                connections.close_all()
+                return self.drive(court, users, first_day, options)
+        finally:
+            settings_dict['CONN_MAX_AGE'], settings_dict['OPTIONS'] = previous_max_age, previous_options
+            connections.close_all()
+
+    def seed(self, writers):
+        location = Location.objects.create(
+            name='Bench Club', city='Monterrey', state='NL', address='Calle 1', zip_code=64000, phone_number=8180000000,
+        )
+        court = Court.objects.create(location=location, name='Court 1')
+        invalidate_catalog()
+        users = [User.objects.create(username=f'writer-{location.id}-{index}') for index in range(writers)]
+        first_day = timezone.localtime(timezone.now()).date() + datetime.timedelta(days=1)
+        return court, users, first_day
+
+    def drive(self, court, users, first_day, options):
+        slots = iter(range(options['bookings']))
+        slots_lock = threading.Lock()
+        writing = threading.Event()
+        timings, errors, locked = [], [], []
+        reads, read_errors = [], []
+
+        def writer(user):
+            try:
+                while True:
+                    with slots_lock:
+                        index = next(slots, None)
+                    if index is None:
+                        return
+                    hour = 7 + index % 16
+                    reservation = Reservation(
+                        user=user, court=court, date=first_day + datetime.timedelta(days=index // 16),
+                        start_time=f'{hour:02}:00', end_time=f'{hour:02}:59',
+                    )
+                    started = time.perf_counter()
+                    try:
+                        book_reservation(reservation)
+                        timings.append((time.perf_counter() - started) * 1000)
+                    except OperationalError as error:
+                        (locked if 'locked' in str(error) else errors).append(str(error))
+                    finally:
+                        close_old_connections()
+            finally:
+                connection.close()
+
+        def reader():
+            try:
+                while writing.is_set():
+                    try:
+                        list(Reservation.objects.filter(court=court).order_by('-date')[:20])
+                        reads.append(1)
+                    except OperationalError as error:
+                        read_errors.append(str(error))
+                    finally:
+                        close_old_connections()
+            finally:
+                connection.close()
+
+        writing.set()
+        threads = [threading.Thread(target=reader) for _ in range(options['readers'])]
+        writer_threads = [threading.Thread(target=writer, args=(user,)) for user in users]
+        started = time.perf_counter()
+        for thread in threads + writer_threads:
+            thread.start()
+        for thread in writer_threads:
+            thread.join()
+        seconds = time.perf_counter() - started
+        writing.clear()
+        for thread in threads:
+            thread.join()
+
+        attempts = len(timings) + len(locked) + len(errors)
+        return {
+            'bookings': len(timings),
+            'seconds': round(seconds, 3),
+            'writes_per_second': round(len(timings) / seconds, 1),
+            'reads_per_second': round(len(reads) / seconds, 1),
+            'p50_ms': round(percentile(timings, 50), 3) if timings else None,
+            'p95_ms': round(percentile(timings, 95), 3) if timings else None,
+            'mean_ms': round(statistics.fmean(timings), 3) if timings else None,
+            'locked_errors': len(locked),
+            'other_errors': len(errors),
+            'read_errors': len(read_errors),
+            'error_rate': round((len(locked) + len(errors)) / attempts, 4) if attempts else 0,
+        }
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from reservations.catalog import invalidate_catalog
+from reservations.models import Location
+
+class Command(BaseCommand):
+    help = (
+        'Generates the resized JPEG and WebP renditions of every location image that is '
+        'missing them. Run it once after deploying renditions or after restoring media files.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Regenerate renditions that are already current.')
+
+    def handle(self, *args, **options):
+        generated = failed = 0
+        for location in Location.objects.exclude(image='').exclude(image=None).order_by('id').iterator():
+            try:
+                if location.update_image_renditions(force=options['force']):
+                    generated += 1
+            except OSError as error:
+                failed += 1
+                self.stderr.write(f'Skipping location {location.id} ({location.image.name}): {error}')
+
+        if generated:
+            invalidate_catalog()
+        self.stdout.write(f'Generated renditions for {generated} locations, {failed} failed.')
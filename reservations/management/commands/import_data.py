@@ -0,0 +1,248 @@
+import csv
+import json
+import os
+import time
+from itertools import islice
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from reservations.availability import invalidate_occupancy, reservation_hours
+from reservations.booking import bump_availability_version, update_occupancy_rollup
+from reservations.catalog import invalidate_catalog
+from reservations.models import Court, ImportCheckpoint, Location, Reservation, ReservationSlot, User
+
+FORMATS = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl'}
+# Fields checked by the in-memory lookup maps instead of one query per row.
+CLEAN_OPTIONS = {'validate_unique': False, 'validate_constraints': False}
+
+def read_rows(path, format):
+    """
+    Streams the rows of a CSV file with a header line or of a JSON Lines file.
+
+    Yields:
+        tuple: The 1-based row number, the row as a dict and None, or the row
+        number, None and an error message for a line that cannot be parsed.
+    """
+    with open(path, newline='', encoding='utf-8') as source:
+        if format == 'csv':
+            for number, row in enumerate(csv.DictReader(source), start=1):
+                yield number, row, None
+            return
+        number = 0
+        for line in source:
+            if not line.strip():
+                continue
+            number += 1
+            try:
+                row = json.loads(line)
+            except ValueError as error:
+                yield number, None, f'Invalid JSON: {error}'
+                continue
+            if isinstance(row, dict):
+                yield number, row, None
+            else:
+                yield number, None, 'Expected a JSON object.'
+
+def field(row, name):
+    value = row.get(name)
+    return value.strip() if isinstance(value, str) else value
+
+class LocationImporter:
+    """
+    Imports locations. Names identify locations in court and reservation
+    files, so a name that already exists is rejected.
+    """
+    fields = ('name', 'city', 'state', 'address', 'zip_code', 'phone_number')
+
+    def __init__(self):
+        self.names = set(Location.objects.values_list('name', flat=True))
+
+    def build(self, row):
+        location = Location(**{name: field(row, name) for name in self.fields})
+        location.full_clean(exclude=['image'], **CLEAN_OPTIONS)
+        if location.name in self.names:
+            raise ValidationError({'name': 'A location with this name already exists.'})
+        self.names.add(location.name)
+        return location
+
+    def save(self, entries):
+        Location.objects.bulk_create([location for _, _, location in entries])
+        transaction.on_commit(invalidate_catalog)
+        return []
+
+class CourtImporter:
+    """
+    Imports courts, given the name of their location.
+    """
+
+    def __init__(self):
+        self.locations = dict(Location.objects.values_list('name', 'id'))
+        self.existing = set(Court.objects.values_list('location_id', 'name'))
+
+    def build(self, row):
+        court = Court(location_id=self.locations.get(field(row, 'location')), name=field(row, 'name'))
+        errors = {} if court.location_id else {'location': ['Unknown location.']}
+        try:
+            court.full_clean(exclude=['location'], **CLEAN_OPTIONS)
+        except ValidationError as error:
+            errors.update(error.message_dict)
+        if not errors and (court.location_id, court.name) in self.existing:
+            errors['name'] = ['This location already has a court with this name.']
+        if errors:
+            raise ValidationError(errors)
+        self.existing.add((court.location_id, court.name))
+        return court
+
+    def save(self, entries):
+        Court.objects.bulk_create([court for _, _, court in entries])
+        transaction.on_commit(invalidate_catalog)
+        return []
+
+class ReservationImporter:
+    """
+    Imports reservations, given the username, the location and court names,
+    the date, start and end times on the HOUR_CHOICES grid and the status.
+
+    Confirmed reservations claim their slots and update the occupancy rollup
+    like booking.py does; one that overlaps an existing or earlier imported
+    booking is rejected.
+    """
+
+    def __init__(self):
+        self.users = dict(User.objects.values_list('username', 'id'))
+        self.courts = {
+            (location, name): court_id
+            for court_id, location, name in Court.objects.values_list('id', 'location__name', 'name')
+        }
+
+    def build(self, row):
+        reservation = Reservation(
+            user_id=self.users.get(field(row, 'username')),
+            court_id=self.courts.get((field(row, 'location'), field(row, 'court'))),
+            date=field(row, 'date'), start_time=field(row, 'start_time'), end_time=field(row, 'end_time'),
+            status=field(row, 'status') or 'confirmed',
+        )
+        errors = {}
+        if not reservation.user_id:
+            errors['username'] = ['Unknown user.']
+        if not reservation.court_id:
+            errors['court'] = ['Unknown location and court.']
+        try:
+            reservation.full_clean(exclude=['user', 'court'], **CLEAN_OPTIONS)
+        except ValidationError as error:
+            errors.update(error.message_dict)
+        if not errors and not reservation_hours(reservation.start_time, reservation.end_time):
+            errors['end_time'] = ['End time must be after the start time.']
+        if errors:
+            raise ValidationError(errors)
+        return reservation
+
+    def save(self, entries):
+        confirmed = [reservation for _, _, reservation in entries if reservation.status == 'confirmed']
+        # One query per batch for every slot already claimed on its courts and dates.
+        claimed = set(ReservationSlot.objects.filter(
+            court_id__in={reservation.court_id for reservation in confirmed},
+            date__in={reservation.date for reservation in confirmed},
+        ).values_list('court_id', 'date', 'hour')) if confirmed else set()
+
+        accepted, rejects = [], []
+        for number, row, reservation in entries:
+            if reservation.status == 'confirmed':
+                slots = {(reservation.court_id, reservation.date, hour) for hour in reservation_hours(reservation.start_time, reservation.end_time)}
+                if slots & claimed:
+                    rejects.append((number, row, {'__all__': ['Court is already booked for this time.']}))
+                    continue
+                claimed |= slots
+            accepted.append(reservation)
+
+        Reservation.objects.bulk_create(accepted)
+        confirmed = [reservation for reservation in accepted if reservation.status == 'confirmed']
+        if confirmed:
+            ReservationSlot.objects.bulk_create(
+                ReservationSlot(reservation=reservation, court_id=reservation.court_id, date=reservation.date, hour=hour)
+                for reservation in confirmed
+                for hour in reservation_hours(reservation.start_time, reservation.end_time)
+            )
+            bump_availability_version(reservation.court_id for reservation in confirmed)
+            update_occupancy_rollup(confirmed, booked=True)
+            pairs = {(reservation.court_id, reservation.date) for reservation in confirmed}
+            transaction.on_commit(lambda: invalidate_occupancy(pairs))
+        return rejects
+
+IMPORTERS = {
+    'locations': LocationImporter,
+    'courts': CourtImporter,
+    'reservations': ReservationImporter,
+}
+
+class Command(BaseCommand):
+    help = (
+        'Imports locations, courts or reservations from a CSV or JSON Lines file. Rows are '
+        'streamed, validated and written with bulk_create, one transaction per batch. Progress '
+        'is checkpointed with each batch, so an interrupted import resumes where it stopped when '
+        'run again. Rejected rows are written with their errors to a JSON Lines file. Import '
+        'locations, then courts, then reservations; run archive_reservations afterwards to move '
+        'old history out of the reservations table.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=IMPORTERS, help='What the file contains.')
+        parser.add_argument('path', help='CSV or JSON Lines file to import.')
+        parser.add_argument('--format', choices=sorted(set(FORMATS.values())), help='File format; guessed from the extension by default.')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows validated and written per transaction.')
+        parser.add_argument('--rejects', help='Where to write rejected rows; defaults to <path>.rejects.jsonl.')
+        parser.add_argument('--restart', action='store_true', help='Ignore the checkpoint and start from the first row.')
+
+    def handle(self, *args, **options):
+        path, batch_size = options['path'], options['batch_size']
+        format = options['format'] or FORMATS.get(os.path.splitext(path)[1].lower())
+        if format is None:
+            raise CommandError('Unknown file format; pass --format csv or --format jsonl.')
+        if not os.path.isfile(path):
+            raise CommandError(f'{path} does not exist.')
+        if batch_size < 1:
+            raise CommandError('--batch-size must be at least 1.')
+
+        checkpoint, _ = ImportCheckpoint.objects.get_or_create(source=f"{options['kind']}:{os.path.abspath(path)}")
+        skipped = 0 if options['restart'] else checkpoint.rows
+        if skipped:
+            self.stdout.write(f'Resuming after row {skipped}.')
+        importer = IMPORTERS[options['kind']]()
+        rows = islice(read_rows(path, format), skipped, None)
+
+        started = time.perf_counter()
+        read = imported = rejected = 0
+        with open(options['rejects'] or f'{path}.rejects.jsonl', 'a' if skipped else 'w', encoding='utf-8') as rejects_file:
+            while batch := list(islice(rows, batch_size)):
+                entries, rejects = [], []
+                for number, row, error in batch:
+                    if error:
+                        rejects.append((number, row, {'__all__': [error]}))
+                        continue
+                    try:
+                        entries.append((number, row, importer.build(row)))
+                    except ValidationError as error:
+                        rejects.append((number, row, error.message_dict))
+
+                with transaction.atomic():
+                    saved_rejects = importer.save(entries)
+                    checkpoint.rows = skipped + read + len(batch)
+                    checkpoint.save(update_fields=['rows', 'updated_at'])
+
+                read += len(batch)
+                imported += len(entries) - len(saved_rejects)
+                rejects += saved_rejects
+                rejected += len(rejects)
+                for number, row, errors in sorted(rejects, key=lambda reject: reject[0]):
+                    rejects_file.write(json.dumps({'row': number, 'errors': errors, 'data': row}) + '\n')
+                rejects_file.flush()
+                self.stdout.write(
+                    f'{skipped + read} rows read, {imported} imported, {rejected} rejected, '
+                    f'{read / (time.perf_counter() - started):.0f} rows/s'
+                )
+
+        seconds = time.perf_counter() - started
+        self.stdout.write(
+            f"Imported {imported} {options['kind']} and rejected {rejected} of {read} rows in {seconds:.2f}s "
+            f"({read / seconds if seconds else 0:.0f} rows/s)."
+        )
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from reservations.checks import cache_is_per_process
+from reservations.ratelimit import rate_limit_counters, reset_rate_limit_counters
+
+class Command(BaseCommand):
+    help = (
+        'Shows how many requests each rate limited view allowed and rejected, to help tune RATE_LIMITS. '
+        'Reads the counters from the cache, so it needs a cache shared with the web workers; otherwise '
+        'read reservations_rate_limit_requests_total from /metrics.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Reset the counters after showing them.')
+
+    def handle(self, *args, **options):
+        if cache_is_per_process():
+            self.stderr.write(
+                'The default cache is local to each process, so these counters are not the web workers\'. '
+                'Set RESERVATIONS_CACHE_DIR or RESERVATIONS_REDIS_URL, or read the '
+                'reservations_rate_limit_requests_total series from /metrics.'
+            )
+        self.stdout.write(f"{'scope':<14}{'allowed':>10}{'limited':>10}{'limited %':>11}")
+        for scope, counters in rate_limit_counters().items():
+            total = counters['allowed'] + counters['limited']
+            share = counters['limited'] / total * 100 if total else 0
+            self.stdout.write(f"{scope:<14}{counters['allowed']:>10}{counters['limited']:>10}{share:>11.1f}")
+        if options['reset']:
+            reset_rate_limit_counters()
+            self.stdout.write('Counters reset.')
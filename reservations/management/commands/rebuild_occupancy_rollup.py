@@ -0,0 +1,60 @@
+import datetime
+import heapq
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from reservations.availability import hours_mask, reservation_hours
+from reservations.models import ArchivedReservation, CourtDayOccupancy, Reservation
+
+class Command(BaseCommand):
+    help = (
+        'Rebuilds the CourtDayOccupancy rollup from confirmed reservations, archived ones included. '
+        'Run it once to backfill the rollup, or to repair it after reservations were changed outside booking.py.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since', type=datetime.date.fromisoformat,
+            help='Only rebuild days from this date (YYYY-MM-DD) on; earlier rollup rows are kept.',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rollup rows inserted per query.')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1.')
+
+        started = time.perf_counter()
+        sources = [Reservation.objects.filter(status='confirmed'), ArchivedReservation.objects.filter(status='confirmed')]
+        rollup = CourtDayOccupancy.objects.all()
+        if options['since']:
+            sources = [reservations.filter(date__gte=options['since']) for reservations in sources]
+            rollup = rollup.filter(date__gte=options['since'])
+
+        # Archived reservations still count; merge both tables in (court, date) order.
+        rows = heapq.merge(
+            *(
+                reservations.order_by('court_id', 'date').values_list('court_id', 'date', 'start_time', 'end_time')
+                .iterator(chunk_size=options['batch_size'])
+                for reservations in sources
+            ),
+            key=lambda row: row[:2],
+        )
+        written = 0
+        with transaction.atomic():
+            rollup.delete()
+            batch = []
+            current, mask = None, 0
+            for court_id, date, start_time, end_time in rows:
+                if (court_id, date) != current:
+                    if current:
+                        batch.append(CourtDayOccupancy(court_id=current[0], date=current[1], hours_mask=mask))
+                    current, mask = (court_id, date), 0
+                mask |= hours_mask(reservation_hours(start_time, end_time))
+                if len(batch) >= options['batch_size']:
+                    written += len(CourtDayOccupancy.objects.bulk_create(batch))
+                    batch = []
+            if current:
+                batch.append(CourtDayOccupancy(court_id=current[0], date=current[1], hours_mask=mask))
+            written += len(CourtDayOccupancy.objects.bulk_create(batch))
+
+        self.stdout.write(f'Rebuilt {written} court days in {time.perf_counter() - started:.2f}s.')
@@ -0,0 +1,21 @@
+import time
+from django.core.management.base import BaseCommand
+from reservations.outbox import BATCH_SIZE, MAX_ATTEMPTS, drain_outbox
+
+class Command(BaseCommand):
+    help = 'Delivers queued outbox emails in batches over a single mail connection.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Emails claimed per batch.')
+        parser.add_argument('--max-attempts', type=int, default=MAX_ATTEMPTS, help='Attempts before an email is dead-lettered.')
+        parser.add_argument('--loop', action='store_true', help='Keep polling the outbox instead of exiting once it is drained.')
+        parser.add_argument('--interval', type=float, default=5, help='Seconds to wait between polls with --loop.')
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed = drain_outbox(options['batch_size'], options['max_attempts'])
+            if sent or failed or not options['loop']:
+                self.stdout.write(f'Sent {sent} emails, {failed} failed.')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
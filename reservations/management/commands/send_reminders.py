@@ -0,0 +1,96 @@
+import datetime
+from itertools import islice
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from reservations.models import Reservation, ReservationReminder
+from reservations.utils import reservation_reminder_message
+
+def due_reminders(hours, now=None):
+    """
+    Returns the confirmed reservations starting within the next hours that
+    have not had a reminder yet.
+
+    Args:
+        hours (int): Size of the look-ahead window.
+        now (datetime, optional): Start of the window, defaults to now.
+
+    Returns:
+        QuerySet: The due reservations with user and court location selected.
+    """
+    start = timezone.localtime(now or timezone.now())
+    end = start + datetime.timedelta(hours=hours)
+    start_time, end_time = start.strftime('%H:%M'), end.strftime('%H:%M')
+
+    return Reservation.objects.filter(
+        Q(date__gt=start.date()) | Q(date=start.date(), start_time__gte=start_time),
+        Q(date__lt=end.date()) | Q(date=end.date(), start_time__lte=end_time),
+        status='confirmed',
+        reminder__isnull=True,
+    ).select_related('user', 'court__location').order_by('date', 'start_time', 'id')
+
+def claim_reminders(reservations):
+    """
+    Records the reminders of reservations before they are sent, so a crash
+    never leads to a second reminder.
+
+    Reminders live in their own table, so recording them never modifies the
+    reservation rows the caller's iterator is still reading.
+
+    Args:
+        reservations (list[Reservation]): The due reservations.
+
+    Returns:
+        list[Reservation]: The reservations claimed by this run; those another
+        run claimed first are left out.
+    """
+    try:
+        with transaction.atomic():
+            ReservationReminder.objects.bulk_create([ReservationReminder(reservation=reservation) for reservation in reservations])
+        return reservations
+    except IntegrityError:
+        return [
+            reservation for reservation in reservations
+            if ReservationReminder.objects.get_or_create(reservation=reservation)[1]
+        ]
+
+class Command(BaseCommand):
+    help = (
+        'Sends reminder emails for confirmed reservations starting in the next hours. '
+        'Reservations are streamed in fixed-size chunks and each chunk is sent over one '
+        'connection. Reminders are recorded before they are sent and released again if '
+        'sending fails, so reruns never send a reminder twice.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=24, help='Look-ahead window in hours.')
+        parser.add_argument('--chunk-size', type=int, default=200, help='Reservations fetched and sent per chunk.')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        reservations = due_reminders(options['hours']).iterator(chunk_size=chunk_size)
+
+        sent = 0
+        while chunk := list(islice(reservations, chunk_size)):
+            claimed = claim_reminders(chunk)
+            if not claimed:
+                continue
+            connection = get_connection()
+            index = 0
+            try:
+                connection.open()
+                for index, reservation in enumerate(claimed):
+                    connection.send_messages([reservation_reminder_message(reservation, connection)])
+                    sent += 1
+            except Exception:
+                # Release the failed reminder and the rest of the chunk, or the
+                # whole chunk if the relay could not be reached, so the next
+                # run sends them; the ones already sent stay recorded.
+                ReservationReminder.objects.filter(reservation__in=claimed[index:]).delete()
+                raise
+            finally:
+                connection.close()
+
+        self.stdout.write(f'Sent {sent} reminders.')
@@ -0,0 +1,41 @@
+import sqlite3
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from reservations.routers import REPLICA_ALIAS
+
+class Command(BaseCommand):
+    help = (
+        'Copies the primary SQLite database onto the replica file configured through '
+        'RESERVATIONS_REPLICA_DB. Uses the SQLite online backup API, so the primary can '
+        'keep serving writes while it runs. Schedule it to emulate replication lag locally.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, help='Keep copying every INTERVAL seconds.')
+
+    def handle(self, *args, **options):
+        if REPLICA_ALIAS not in connections:
+            raise CommandError('No replica database is configured; set RESERVATIONS_REPLICA_DB.')
+        primary, replica = connections[DEFAULT_DB_ALIAS].settings_dict, connections[REPLICA_ALIAS].settings_dict
+        if primary['ENGINE'] != 'django.db.backends.sqlite3' or replica['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError('sync_replica only copies SQLite databases; use your database replication instead.')
+        if primary['NAME'] == replica['NAME']:
+            raise CommandError('The replica points at the primary database file.')
+
+        while True:
+            started = time.perf_counter()
+            self.copy(primary['NAME'], replica['NAME'])
+            self.stdout.write(f"Copied {primary['NAME']} to {replica['NAME']} in {time.perf_counter() - started:.3f}s.")
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
+
+    def copy(self, source_name, target_name):
+        source = sqlite3.connect(source_name)
+        target = sqlite3.connect(target_name)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
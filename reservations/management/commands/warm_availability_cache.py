@@ -0,0 +1,38 @@
+import datetime
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from reservations.availability import OCCUPANCY_TIMEOUT, availability_versions, occupancy, occupancy_key, occupancy_versions
+from reservations.catalog import get_catalog
+from reservations.checks import cache_is_per_process
+
+class Command(BaseCommand):
+    help = (
+        'Precomputes the cached occupancy of every court for the coming days. '
+        'Schedule it shortly after midnight so the first visitors of the day hit a warm cache. '
+        'Needs a cache shared with the web workers.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=14, help='Number of days to warm, starting today.')
+
+    def handle(self, *args, **options):
+        if cache_is_per_process():
+            raise CommandError(
+                'The default cache is local to each process, so the web workers would never see the '
+                'warmed entries. Set RESERVATIONS_CACHE_DIR or RESERVATIONS_REDIS_URL first.'
+            )
+        today = timezone.localtime(timezone.now()).date()
+        dates = [today + datetime.timedelta(days=offset) for offset in range(options['days'])]
+        court_ids = [court.id for court in get_catalog().courts]
+
+        # Versions are read before the query so a booking committed meanwhile
+        # invalidates what is stored here.
+        tokens = occupancy_versions((court_id, day) for court_id in court_ids for day in dates)
+        versions = availability_versions(court_ids)
+        bitmaps = occupancy(court_ids, dates)
+        cache.set_many(
+            {occupancy_key(*pair, tokens[pair]): (versions.get(pair[0], 0), bitmap) for pair, bitmap in bitmaps.items()},
+            timeout=OCCUPANCY_TIMEOUT,
+        )
+        self.stdout.write(f'Warmed {len(bitmaps)} court days for {len(court_ids)} courts.')
@@ -0,0 +1,238 @@
+import contextvars
+import threading
+from bisect import bisect_left
+from functools import wraps
+from time import perf_counter
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates, Template, reraise
+
+# Upper bounds, in seconds, of the request latency histogram buckets.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class RequestTimings:
+    """
+    Time spent by the current request in SQL, template rendering and email
+    helpers, filled in by record_query, TimedTemplate and timed_email.
+    """
+    __slots__ = ('sql_queries', 'sql_seconds', 'template_seconds', 'email_seconds')
+
+    def __init__(self):
+        self.sql_queries = 0
+        self.sql_seconds = self.template_seconds = self.email_seconds = 0.0
+
+_timings = contextvars.ContextVar('reservations_metrics', default=None)
+
+class ViewStats:
+    __slots__ = ('buckets', 'count', 'seconds', 'statuses', 'sql_queries', 'sql_seconds', 'template_seconds', 'email_seconds')
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.seconds = self.sql_seconds = self.template_seconds = self.email_seconds = 0.0
+        self.sql_queries = 0
+        self.statuses = {}
+
+class MetricsRegistry:
+    """
+    Process-wide request and email metrics.
+
+    Each request is added under one short lock once it finished, so worker
+    threads never contend while a request runs. Every process keeps its own
+    registry; scrape each worker, or sum them, when running several.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+        self.emails = {}
+
+    def observe_request(self, view, status, seconds, timings):
+        bucket = bisect_left(LATENCY_BUCKETS, seconds)
+        status_class = f'{status // 100}xx'
+        with self.lock:
+            stats = self.views.get(view)
+            if stats is None:
+                stats = self.views[view] = ViewStats()
+            stats.buckets[bucket] += 1
+            stats.count += 1
+            stats.seconds += seconds
+            stats.statuses[status_class] = stats.statuses.get(status_class, 0) + 1
+            stats.sql_queries += timings.sql_queries
+            stats.sql_seconds += timings.sql_seconds
+            stats.template_seconds += timings.template_seconds
+            stats.email_seconds += timings.email_seconds
+
+    def observe_email(self, helper, seconds):
+        with self.lock:
+            count, total = self.emails.get(helper, (0, 0.0))
+            self.emails[helper] = (count + 1, total + seconds)
+
+    def snapshot(self):
+        with self.lock:
+            views = {
+                view: {name: getattr(stats, name) for name in ViewStats.__slots__}
+                for view, stats in self.views.items()
+            }
+            for stats in views.values():
+                stats['buckets'] = list(stats['buckets'])
+                stats['statuses'] = dict(stats['statuses'])
+            return views, dict(self.emails)
+
+    def reset(self):
+        with self.lock:
+            self.views.clear()
+            self.emails.clear()
+
+registry = MetricsRegistry()
+
+def start_request():
+    """
+    Starts collecting the timings of a request.
+
+    Returns:
+        tuple: The RequestTimings, the context token to pass to finish_request
+        and the start time.
+    """
+    timings = RequestTimings()
+    return timings, _timings.set(timings), perf_counter()
+
+def finish_request(request, response, timings, token, started):
+    """
+    Records a finished request and adds its Server-Timing header.
+    """
+    _timings.reset(token)
+    seconds = perf_counter() - started
+    match = request.resolver_match
+    registry.observe_request(match.view_name if match else 'unmatched', response.status_code, seconds, timings)
+    response['Server-Timing'] = (
+        f'app;dur={seconds * 1000:.1f}, '
+        f'db;dur={timings.sql_seconds * 1000:.1f};desc="{timings.sql_queries} queries", '
+        f'tpl;dur={timings.template_seconds * 1000:.1f}, '
+        f'email;dur={timings.email_seconds * 1000:.1f}'
+    )
+    return response
+
+def record_query(execute, sql, params, many, context):
+    """
+    Execute wrapper adding every query's count and duration to the timings
+    of the request it runs for, if any.
+    """
+    timings = _timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.sql_seconds += perf_counter() - started
+        timings.sql_queries += 1
+
+def install_query_recorder(connection):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+def timed_email(helper):
+    """
+    Records how long an email helper takes, per helper and for the current
+    request.
+    """
+    @wraps(helper)
+    def wrapper(*args, **kwargs):
+        started = perf_counter()
+        try:
+            return helper(*args, **kwargs)
+        finally:
+            seconds = perf_counter() - started
+            timings = _timings.get()
+            if timings is not None:
+                timings.email_seconds += seconds
+            registry.observe_email(helper.__name__, seconds)
+    return wrapper
+
+class TimedTemplate(Template):
+
+    def render(self, context=None, request=None):
+        timings = _timings.get()
+        if timings is None:
+            return super().render(context, request)
+        started = perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            timings.template_seconds += perf_counter() - started
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """
+    Django template backend that adds the render time of top-level templates
+    to the current request's timings. Included templates are part of their
+    parent's render.
+    """
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
+
+def label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def render_metrics(rate_limits=None):
+    """
+    Renders the aggregated metrics in the Prometheus text exposition format.
+
+    Args:
+        rate_limits (dict, optional): Counters of ratelimit.rate_limit_counters.
+
+    Returns:
+        str: The metrics document.
+    """
+    views, emails = registry.snapshot()
+    lines = [
+        '# HELP reservations_request_duration_seconds Time to produce a response, per view.',
+        '# TYPE reservations_request_duration_seconds histogram',
+    ]
+    for view, stats in sorted(views.items()):
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), stats['buckets']):
+            cumulative += count
+            lines.append(f'reservations_request_duration_seconds_bucket{{view="{label(view)}",le="{bound}"}} {cumulative}')
+        lines.append(f'reservations_request_duration_seconds_sum{{view="{label(view)}"}} {stats["seconds"]:.6f}')
+        lines.append(f'reservations_request_duration_seconds_count{{view="{label(view)}"}} {stats["count"]}')
+
+    lines += ['# HELP reservations_responses_total Responses per view and status class.', '# TYPE reservations_responses_total counter']
+    for view, stats in sorted(views.items()):
+        for status, count in sorted(stats['statuses'].items()):
+            lines.append(f'reservations_responses_total{{view="{label(view)}",status="{status}"}} {count}')
+
+    totals = (
+        ('sql_queries', 'reservations_sql_queries_total', 'SQL queries run by requests, per view.', '{}'),
+        ('sql_seconds', 'reservations_sql_seconds_total', 'Time spent in SQL queries, per view.', '{:.6f}'),
+        ('template_seconds', 'reservations_template_render_seconds_total', 'Time spent rendering templates, per view.', '{:.6f}'),
+        ('email_seconds', 'reservations_email_seconds_total', 'Time spent in email helpers, per view.', '{:.6f}'),
+    )
+    for field, name, help_text, number in totals:
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+        for view, stats in sorted(views.items()):
+            lines.append(f'{name}{{view="{label(view)}"}} {number.format(stats[field])}')
+
+    lines += [
+        '# HELP reservations_email_helper_seconds Time spent in each email helper.',
+        '# TYPE reservations_email_helper_seconds summary',
+    ]
+    for helper, (count, seconds) in sorted(emails.items()):
+        lines.append(f'reservations_email_helper_seconds_sum{{helper="{label(helper)}"}} {seconds:.6f}')
+        lines.append(f'reservations_email_helper_seconds_count{{helper="{label(helper)}"}} {count}')
+
+    if rate_limits is not None:
+        lines += [
+            '# HELP reservations_rate_limit_requests_total Requests allowed and limited per rate limit scope.',
+            '# TYPE reservations_rate_limit_requests_total counter',
+        ]
+        for scope, counters in sorted(rate_limits.items()):
+            for outcome, count in sorted(counters.items()):
+                lines.append(f'reservations_rate_limit_requests_total{{scope="{label(scope)}",outcome="{outcome}"}} {count}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,171 @@
+import mimetypes
+import os
+from collections import namedtuple
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import FileResponse
+from django.utils.cache import get_conditional_response
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.http import http_date
+from .metrics import finish_request, start_request
+from .routers import PRIMARY_PIN_COOKIE, current_routing, finish_routing, start_routing
+
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+MUTABLE_MAX_AGE = 60
+
+StaticAsset = namedtuple('StaticAsset', 'path gzip_path content_type etag last_modified immutable')
+
+def accepts_gzip(header):
+    """
+    Returns whether an Accept-Encoding header allows a gzip response.
+
+    Args:
+        header (str): The raw header value, e.g. 'gzip, deflate, br;q=0.9'.
+
+    Returns:
+        bool: False when gzip is absent or explicitly refused with q=0.
+    """
+    for coding in header.split(','):
+        token, _, params = coding.strip().partition(';')
+        if token.strip().lower() not in ('gzip', '*'):
+            continue
+        quality = params.strip()
+        if quality.startswith('q='):
+            try:
+                return float(quality[2:]) > 0
+            except ValueError:
+                return False
+        return True
+    return False
+
+class StaticFilesMiddleware(MiddlewareMixin):
+    """
+    Serves the collected static files from STATIC_ROOT without a separate server.
+
+    STATIC_ROOT is indexed once at startup, so requests never touch the file
+    system until the response body is streamed; restart the workers after
+    running collectstatic. Content-hashed names from the staticfiles manifest
+    are cached for a year as immutable, other files for MUTABLE_MAX_AGE
+    seconds. Clients that accept gzip get the precompressed sibling written
+    by CompressedManifestStaticFilesStorage; both encodings share a weak ETag.
+
+    The middleware removes itself when STATIC_ROOT has not been collected.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        root = settings.STATIC_ROOT
+        if not root or not os.path.isdir(root):
+            raise MiddlewareNotUsed
+        self.prefix = settings.STATIC_URL if settings.STATIC_URL.startswith('/') else f'/{settings.STATIC_URL}'
+        self.assets = self.index(root)
+
+    def index(self, root):
+        hashed_names = set(getattr(staticfiles_storage, 'hashed_files', {}).values())
+        assets = {}
+        for directory, _, filenames in os.walk(root):
+            for filename in filenames:
+                path = os.path.join(directory, filename)
+                name = os.path.relpath(path, root).replace(os.sep, '/')
+                if name.endswith('.gz') and os.path.exists(path[:-3]):
+                    continue
+                stat = os.stat(path)
+                gzip_path = f'{path}.gz' if os.path.exists(f'{path}.gz') else None
+                assets[self.prefix + name] = StaticAsset(
+                    path=path,
+                    gzip_path=gzip_path,
+                    content_type=mimetypes.guess_type(name)[0] or 'application/octet-stream',
+                    etag=f'W/"{stat.st_size:x}-{int(stat.st_mtime):x}"',
+                    last_modified=int(stat.st_mtime),
+                    immutable=name in hashed_names,
+                )
+        return assets
+
+    def process_request(self, request):
+        asset = self.assets.get(request.path_info)
+        if asset is None or request.method not in ('GET', 'HEAD'):
+            return None
+
+        response = get_conditional_response(request, etag=asset.etag, last_modified=asset.last_modified)
+        if response is None:
+            if asset.gzip_path and accepts_gzip(request.META.get('HTTP_ACCEPT_ENCODING', '')):
+                response = FileResponse(open(asset.gzip_path, 'rb'), content_type=asset.content_type)
+                response['Content-Encoding'] = 'gzip'
+            else:
+                response = FileResponse(open(asset.path, 'rb'), content_type=asset.content_type)
+            del response['Content-Disposition']
+
+        if asset.gzip_path:
+            response['Vary'] = 'Accept-Encoding'
+        response['ETag'] = asset.etag
+        response['Last-Modified'] = http_date(asset.last_modified)
+        response['Cache-Control'] = (
+            f'public, max-age={IMMUTABLE_MAX_AGE}, immutable' if asset.immutable else f'public, max-age={MUTABLE_MAX_AGE}'
+        )
+        return response
+
+class ReplicaRoutingMiddleware:
+    """
+    Tracks the database routing state of every request for PrimaryReplicaRouter.
+
+    When a request writes to the primary, a cookie pins the client's reads to
+    the primary for REPLICA_PIN_SECONDS (read-your-writes), long enough for
+    the replica to catch up. Runs natively in
+    both sync and async chains so async views do not pay a thread switch.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = start_routing(request)
+        try:
+            return self.pin(request, self.get_response(request), token)
+        finally:
+            finish_routing(token)
+
+    async def __acall__(self, request):
+        token = start_routing(request)
+        try:
+            return self.pin(request, await self.get_response(request), token)
+        finally:
+            finish_routing(token)
+
+    def pin(self, request, response, token):
+        if current_routing().wrote:
+            response.set_cookie(PRIMARY_PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS, httponly=True, samesite='Lax')
+        return response
+
+class MetricsMiddleware:
+    """
+    Records the latency, SQL, template and email time of every request in the
+    metrics registry and reports them in a Server-Timing header.
+
+    Time spent streaming a response body after the view returned is not
+    included. Runs natively in both sync and async chains.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings, token, started = start_request()
+        return finish_request(request, self.get_response(request), timings, token, started)
+
+    async def __acall__(self, request):
+        timings, token, started = start_request()
+        return finish_request(request, await self.get_response(request), timings, token, started)
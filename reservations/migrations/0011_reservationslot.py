@@ -0,0 +1,47 @@
+# Generated by Django 5.0.14 on 2026-10-18 01:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def claim_existing_slots(apps, schema_editor):
+    Reservation = apps.get_model('reservations', 'Reservation')
+    ReservationSlot = apps.get_model('reservations', 'ReservationSlot')
+    slots = []
+    for reservation in Reservation.objects.filter(status='confirmed').order_by('id').iterator():
+        start_hour = int(reservation.start_time[:2])
+        end_hour = int(reservation.end_time[:2]) + (1 if int(reservation.end_time[3:5]) else 0)
+        slots.extend(
+            ReservationSlot(reservation_id=reservation.id, court_id=reservation.court_id, date=reservation.date, hour=hour)
+            for hour in range(start_hour, end_hour)
+        )
+        if len(slots) >= 1000:
+            # Pre-existing double bookings keep the slot of the earliest reservation.
+            ReservationSlot.objects.bulk_create(slots, ignore_conflicts=True)
+            slots = []
+    ReservationSlot.objects.bulk_create(slots, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservations', '0010_outboxemail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReservationSlot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('hour', models.PositiveSmallIntegerField()),
+                ('court', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='reservations.court')),
+                ('reservation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slots', to='reservations.reservation')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='reservationslot',
+            constraint=models.UniqueConstraint(fields=('court', 'date', 'hour'), name='unique_court_date_hour'),
+        ),
+        migrations.RunPython(claim_existing_slots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.14 on 2026-10-18 01:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservations', '0012_reservation_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='location',
+            name='availability_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
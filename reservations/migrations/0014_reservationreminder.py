@@ -0,0 +1,21 @@
+# Generated by Django 5.0.14 on 2026-10-18 01:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservations', '0013_location_availability_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReservationReminder',
+            fields=[
+                ('reservation', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='reminder', serialize=False, to='reservations.reservation')),
+                ('sent_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
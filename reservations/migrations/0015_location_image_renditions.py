@@ -0,0 +1,18 @@
+# Generated by Django 5.0.14 on 2026-10-18 01:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservations', '0014_reservationreminder'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='location',
+            name='image_renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
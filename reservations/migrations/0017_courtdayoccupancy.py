@@ -0,0 +1,27 @@
+# Generated by Django 5.0.14 on 2026-10-18 01:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservations', '0016_reservation_date_status_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourtDayOccupancy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('hours_mask', models.PositiveIntegerField(default=0)),
+                ('court', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='reservations.court')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='courtdayoccupancy',
+            constraint=models.UniqueConstraint(fields=('court', 'date'), name='unique_court_day_occupancy'),
+        ),
+    ]
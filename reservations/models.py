@@ -1,5 +1,7 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import User
+from .images import delete_renditions, generate_renditions, rendition_name
 
 class Location(models.Model):
     name = models.CharField(max_length=50)
@@ -9,10 +11,76 @@ class Location(models.Model):
     zip_code = models.IntegerField()
     phone_number = models.IntegerField()
     image = models.ImageField(upload_to='location_images/', blank=True, null=True)
+    # Bumped whenever a reservation at this location is created or cancelled.
+    availability_version = models.PositiveIntegerField(default=0, editable=False)
+    # Source image name and widths of the resized renditions stored next to it.
+    image_renditions = models.JSONField(default=dict, blank=True, editable=False)
 
     def __str__(self):
         return f'{self.name} - {self.city}, {self.state} - {self.address}'
 
+    def has_current_renditions(self):
+        return bool(self.image) and self.image_renditions.get('source') == self.image.name
+
+    def update_image_renditions(self, force=False):
+        """
+        Regenerates the image renditions when the image changed since they were built.
+
+        Renditions of a replaced or removed image are deleted. The new state is
+        written with an update query so no save signals fire again.
+
+        Args:
+            force (bool): Regenerate even if the renditions are current.
+
+        Returns:
+            bool: True if renditions were generated or removed.
+        """
+        source = self.image.name if self.image else None
+        previous = self.image_renditions.get('source')
+        if previous == source and not force:
+            return False
+
+        if previous and previous != source:
+            delete_renditions(previous, self.image_renditions.get('widths', []), self.image.storage)
+        self.image_renditions = {'source': source, 'widths': generate_renditions(self.image)} if source else {}
+        Location.objects.filter(pk=self.pk).update(image_renditions=self.image_renditions)
+        return True
+
+    def rendition_srcset(self, format):
+        """
+        Returns a srcset attribute value listing the renditions of one format.
+
+        Args:
+            format (str): 'jpeg' or 'webp'.
+
+        Returns:
+            str: For example '/media/location_images/club-320w.webp 320w, ...', or
+            an empty string if the renditions are missing or stale.
+        """
+        if not self.has_current_renditions():
+            return ''
+        return ', '.join(
+            f'{self.image.storage.url(rendition_name(self.image.name, width, format))} {width}w'
+            for width in self.image_renditions['widths']
+        )
+
+    @property
+    def image_srcset(self):
+        return self.rendition_srcset('jpeg')
+
+    @property
+    def image_webp_srcset(self):
+        return self.rendition_srcset('webp')
+
+    @property
+    def image_src(self):
+        """
+        URL of the largest JPEG rendition, falling back to the original image.
+        """
+        if not self.has_current_renditions():
+            return self.image.url
+        return self.image.storage.url(rendition_name(self.image.name, self.image_renditions['widths'][-1], 'jpeg'))
+
 class Court(models.Model):
     location = models.ForeignKey(Location, on_delete=models.CASCADE)
     name = models.CharField(max_length=100)
@@ -33,6 +101,136 @@ class Reservation(models.Model):
     start_time = models.CharField(max_length=5, choices=HOUR_CHOICES)
     end_time = models.CharField(max_length=5, choices=HOUR_CHOICES)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='confirmed')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Per-user history pages: filter on user and status, seek on (date, start_time).
+            models.Index(fields=['user', 'status', 'date', 'start_time'], name='reservation_user_status_idx'),
+            # Last-Modified of a user's calendar feed.
+            models.Index(fields=['user', 'updated_at'], name='reservation_user_updated_idx'),
+            # Availability and conflict checks: filter on court and date, then status.
+            models.Index(fields=['court', 'date', 'status'], name='reservation_court_date_idx'),
+            # Admin date filter and date hierarchy, optionally narrowed by status.
+            models.Index(fields=['date', 'status'], name='reservation_date_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.court.name} - {self.date} - {self.start_time} to {self.end_time}"
+
+class ArchivedReservation(models.Model):
+    """
+    A reservation moved out of the Reservation table by archive_reservations.
+
+    Rows keep the id they had as a Reservation, so keyset cursors stay valid
+    across both tables.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    court = models.ForeignKey(Court, on_delete=models.CASCADE)
+    date = models.DateField()
+    start_time = models.CharField(max_length=5, choices=Reservation.HOUR_CHOICES)
+    end_time = models.CharField(max_length=5, choices=Reservation.HOUR_CHOICES)
+    status = models.CharField(max_length=10, choices=Reservation.STATUS_CHOICES)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'status', 'date', 'start_time'], name='archived_user_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.court.name} - {self.date} - {self.start_time} to {self.end_time}"
+
+class ReservationReminder(models.Model):
+    """
+    Records that the reminder email of a reservation was sent.
+    """
+    reservation = models.OneToOneField(Reservation, on_delete=models.CASCADE, primary_key=True, related_name='reminder')
+    sent_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Reminder for reservation {self.reservation_id} sent at {self.sent_at}"
+
+
+class OutboxEmail(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('dead', 'Dead'),
+    ]
+
+    subject = models.CharField(max_length=255)
+    from_email = models.CharField(max_length=254, blank=True)
+    to = models.EmailField(max_length=254)
+    text_body = models.TextField()
+    html_body = models.TextField(blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_status_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} to {self.to} ({self.status})"
+
+
+class ReservationSlot(models.Model):
+    """
+    One occupied hour of a confirmed reservation.
+
+    The unique constraint on (court, date, hour) is what makes double bookings
+    impossible: two reservations can never claim the same court hour.
+    """
+    reservation = models.ForeignKey(Reservation, on_delete=models.CASCADE, related_name='slots')
+    court = models.ForeignKey(Court, on_delete=models.CASCADE)
+    date = models.DateField()
+    hour = models.PositiveSmallIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['court', 'date', 'hour'], name='unique_court_date_hour'),
+        ]
+
+    def __str__(self):
+        return f"{self.court_id} - {self.date} - {self.hour:02}:00"
+
+class CourtDayOccupancy(models.Model):
+    """
+    Daily rollup of the booked hours of one court.
+
+    Bit 0 of hours_mask is the 07:00 slot, as in availability.hours_mask.
+    Maintained by booking.py in the same transaction as every booking and
+    cancellation; rebuild it with the rebuild_occupancy_rollup command.
+    """
+    court = models.ForeignKey(Court, on_delete=models.CASCADE)
+    date = models.DateField()
+    hours_mask = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['court', 'date'], name='unique_court_day_occupancy'),
+        ]
+
+    def __str__(self):
+        return f"{self.court_id} - {self.date}"
+
+class ImportCheckpoint(models.Model):
+    """
+    Number of rows of an import source already processed by import_data.
+
+    Updated in the same transaction as each imported batch, so a rerun
+    resumes exactly after the last committed batch.
+    """
+    source = models.CharField(max_length=255, unique=True)
+    rows = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
-        return f"{self.court.name} - {self.date} - {self.start_time} to {self.end_time}"
\ No newline at end of file
+        return f"{self.source}: {self.rows} rows"
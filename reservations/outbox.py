@@ -0,0 +1,160 @@
+import datetime
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.utils import timezone
+from .models import OutboxEmail
+
+BATCH_SIZE = 50
+MAX_ATTEMPTS = 5
+BACKOFF_SECONDS = 30
+MAX_BACKOFF_SECONDS = 3600
+LEASE_SECONDS = 300
+
+def queue_email(subject, text_body, from_email, to, html_body=''):
+    """
+    Stores an email in the outbox for delivery by the send_outbox worker.
+
+    Args:
+        subject (str): The email subject.
+        text_body (str): The plain text body.
+        from_email (str): The sender address.
+        to (str): The recipient address.
+        html_body (str, optional): The HTML alternative.
+
+    Returns:
+        OutboxEmail: The queued email.
+    """
+    return OutboxEmail.objects.create(
+        subject=subject,
+        text_body=text_body,
+        from_email=from_email,
+        to=to,
+        html_body=html_body,
+    )
+
+def backoff_delay(attempts):
+    """
+    Returns the exponential backoff delay before the next delivery attempt.
+
+    Args:
+        attempts (int): Number of failed attempts so far.
+
+    Returns:
+        timedelta: The delay, capped at MAX_BACKOFF_SECONDS.
+    """
+    return datetime.timedelta(seconds=min(BACKOFF_SECONDS * 2 ** (attempts - 1), MAX_BACKOFF_SECONDS))
+
+def build_message(email, connection):
+    message = EmailMultiAlternatives(email.subject, email.text_body, email.from_email, [email.to], connection=connection)
+    if email.html_body:
+        message.attach_alternative(email.html_body, 'text/html')
+    return message
+
+def claim_batch(batch_size):
+    """
+    Claims the next batch of due outbox emails for this worker.
+
+    Claimed rows get their next_attempt_at pushed to a lease deadline that is
+    unique to this call, and only the rows carrying that deadline are returned.
+    Concurrent workers therefore never send the same email, no transaction is
+    held open while talking to the mail server, and emails claimed by a worker
+    that crashes become due again once the lease expires.
+
+    Args:
+        batch_size (int): Maximum number of emails to claim.
+
+    Returns:
+        list[OutboxEmail]: The claimed emails.
+    """
+    now = timezone.now()
+    lease_until = now + datetime.timedelta(seconds=LEASE_SECONDS)
+    with transaction.atomic():
+        ids = list(
+            OutboxEmail.objects.select_for_update(skip_locked=True)
+            .filter(status='pending', next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        OutboxEmail.objects.filter(id__in=ids, status='pending', next_attempt_at__lte=now).update(next_attempt_at=lease_until)
+    return list(OutboxEmail.objects.filter(id__in=ids, next_attempt_at=lease_until).order_by('id'))
+
+def record_failure(email, error, max_attempts=MAX_ATTEMPTS):
+    """
+    Records a failed delivery attempt, rescheduling the email with exponential
+    backoff or dead-lettering it once it reaches max_attempts.
+    """
+    email.attempts += 1
+    email.last_error = f'{type(error).__name__}: {error}'
+    if email.attempts >= max_attempts:
+        email.status = 'dead'
+    else:
+        email.next_attempt_at = timezone.now() + backoff_delay(email.attempts)
+    email.save(update_fields=['attempts', 'last_error', 'status', 'next_attempt_at'])
+
+def deliver_batch(emails, connection, max_attempts=MAX_ATTEMPTS):
+    """
+    Sends a batch of outbox emails over an already open connection.
+
+    Failed emails are rescheduled with exponential backoff, and dead-lettered
+    once they reach max_attempts.
+
+    Args:
+        emails (list[OutboxEmail]): The emails to send.
+        connection: An open email backend connection.
+        max_attempts (int): Attempts after which an email is marked dead.
+
+    Returns:
+        tuple: The number of sent and failed emails.
+    """
+    sent = failed = 0
+    for email in emails:
+        try:
+            build_message(email, connection).send()
+        except Exception as error:
+            failed += 1
+            record_failure(email, error, max_attempts)
+        else:
+            sent += 1
+            email.attempts += 1
+            email.status = 'sent'
+            email.sent_at = timezone.now()
+            email.save(update_fields=['attempts', 'status', 'sent_at'])
+    return sent, failed
+
+def drain_outbox(batch_size=BATCH_SIZE, max_attempts=MAX_ATTEMPTS):
+    """
+    Delivers every due outbox email in batches over one reused connection.
+
+    If the connection cannot be opened, the first claimed batch is rescheduled
+    with backoff and the error recorded on each email.
+
+    Args:
+        batch_size (int): Number of emails claimed per batch.
+        max_attempts (int): Attempts after which an email is marked dead.
+
+    Returns:
+        tuple: The number of sent and failed emails.
+    """
+    sent = failed = 0
+    emails = claim_batch(batch_size)
+    if not emails:
+        return sent, failed
+
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as error:
+        # Mail server unreachable: count the attempt on the claimed batch and
+        # return, so a looping worker keeps polling.
+        for email in emails:
+            record_failure(email, error, max_attempts)
+        return sent, len(emails)
+    try:
+        while emails:
+            batch_sent, batch_failed = deliver_batch(emails, connection, max_attempts)
+            sent += batch_sent
+            failed += batch_failed
+            emails = claim_batch(batch_size)
+    finally:
+        connection.close()
+    return sent, failed
@@ -0,0 +1,172 @@
+import datetime
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.db.models import Max, Q
+from django.utils.functional import cached_property
+
+PAGE_SIZE = 20
+
+def encode_cursor(reservation):
+    """
+    Encodes the (date, start_time, id) position of a reservation as a cursor.
+
+    Args:
+        reservation (Reservation): The last reservation shown on a page.
+
+    Returns:
+        str: A cursor such as '2024-07-01_08:00_42'.
+    """
+    return f'{reservation.date.isoformat()}_{reservation.start_time}_{reservation.pk}'
+
+def decode_cursor(cursor):
+    """
+    Decodes a cursor produced by encode_cursor.
+
+    Args:
+        cursor (str): The cursor taken from the query string.
+
+    Returns:
+        tuple | None: The (date, start_time, id) position, or None if the
+        cursor is missing or malformed.
+    """
+    try:
+        date, start_time, pk = cursor.split('_')
+        return datetime.date.fromisoformat(date), start_time, int(pk)
+    except (AttributeError, ValueError):
+        return None
+
+def keyset_page(queryset, cursor=None, descending=False, page_size=PAGE_SIZE):
+    """
+    Returns one page of reservations using keyset (seek) pagination.
+
+    The queryset is ordered on (date, start_time, id) and filtered to the rows
+    strictly after the cursor position, so the cost of a page does not depend
+    on how many rows precede it. Court and location are fetched in the same
+    query.
+
+    Args:
+        queryset (QuerySet): The reservations to paginate.
+        cursor (str, optional): Cursor of the last row of the previous page.
+        descending (bool): Whether to walk the rows from newest to oldest.
+        page_size (int): Maximum number of rows per page.
+
+    Returns:
+        tuple: The list of reservations on the page and the cursor of the next
+        page, or None if this is the last page.
+    """
+    return split_page(list(page_queryset(queryset, cursor, descending)[:page_size + 1]), page_size)
+
+async def akeyset_page(queryset, cursor=None, descending=False, page_size=PAGE_SIZE):
+    """
+    Async counterpart of keyset_page, fetching the page with the async ORM.
+
+    Returns:
+        tuple: The list of reservations on the page and the cursor of the next
+        page, or None if this is the last page.
+    """
+    rows = [row async for row in page_queryset(queryset, cursor, descending)[:page_size + 1]]
+    return split_page(rows, page_size)
+
+async def akeyset_page_union(querysets, cursor=None, descending=False, page_size=PAGE_SIZE):
+    """
+    Pages across several reservation querysets as if they were one table.
+
+    Each queryset is seeked past the cursor and limited to one page plus the
+    look-ahead row, then the rows are merged on (date, start_time, id). Ids
+    must be unique across the querysets, as they are for reservations and
+    their archived copies.
+
+    Args:
+        querysets (list[QuerySet]): The reservations to paginate, such as the
+        hot and the archived ones of a user.
+        cursor (str, optional): Cursor of the last row of the previous page.
+        descending (bool): Whether to walk the rows from newest to oldest.
+        page_size (int): Maximum number of rows per page.
+
+    Returns:
+        tuple: The list of reservations on the page and the cursor of the next
+        page, or None if this is the last page.
+    """
+    rows = []
+    for queryset in querysets:
+        rows += [row async for row in page_queryset(queryset, cursor, descending)[:page_size + 1]]
+    rows.sort(key=lambda row: (row.date, row.start_time, row.pk), reverse=descending)
+    return split_page(rows[:page_size + 1], page_size)
+
+def page_queryset(queryset, cursor, descending):
+    """
+    Orders a reservation queryset for keyset pagination and seeks past the cursor.
+    """
+    direction = '-' if descending else ''
+    lookup = 'lt' if descending else 'gt'
+    queryset = queryset.select_related('court__location').order_by(
+        f'{direction}date', f'{direction}start_time', f'{direction}id'
+    )
+
+    position = decode_cursor(cursor)
+    if position:
+        date, start_time, pk = position
+        queryset = queryset.filter(
+            Q(**{f'date__{lookup}': date}) |
+            Q(date=date, **{f'start_time__{lookup}': start_time}) |
+            Q(date=date, start_time=start_time, **{f'id__{lookup}': pk})
+        )
+    return queryset
+
+def split_page(rows, page_size):
+    """
+    Trims the look-ahead row of a page and builds the cursor of the next page.
+    """
+    next_cursor = encode_cursor(rows[page_size - 1]) if len(rows) > page_size else None
+    return rows[:page_size], next_cursor
+
+def estimated_table_rows(model, using):
+    """
+    Returns the planner's estimate of a table's row count without scanning it.
+
+    PostgreSQL reads pg_class.reltuples and SQLite reads sqlite_stat1 when
+    ANALYZE has run. Otherwise the largest primary key is used, which is an
+    upper bound found through the primary key index.
+
+    Args:
+        model (Model): The model whose table to estimate.
+        using (str): The database alias.
+
+    Returns:
+        int: The estimated number of rows.
+    """
+    table = model._meta.db_table
+    connection = connections[using]
+    queries = {
+        'postgresql': ('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [table]),
+        'sqlite': ('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [table]),
+    }
+    if connection.vendor in queries:
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(*queries[connection.vendor])
+                row = cursor.fetchone()
+            if row and row[0] is not None and int(str(row[0]).split()[0]) > 0:
+                return int(str(row[0]).split()[0])
+        except DatabaseError:
+            pass
+    return model._default_manager.using(using).aggregate(estimate=Max('pk'))['estimate'] or 0
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that never counts more than exact_count_limit rows.
+
+    Up to the limit the count is exact, computed over a LIMITed subquery.
+    Beyond it, unfiltered querysets report the table estimate from
+    estimated_table_rows and filtered ones report the limit plus one, so large
+    admin changelists page without a full COUNT(*).
+    """
+    exact_count_limit = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        bounded = queryset[:self.exact_count_limit + 1].count()
+        if bounded <= self.exact_count_limit or queryset.query.where:
+            return bounded
+        return max(bounded, estimated_table_rows(queryset.model, queryset.db))
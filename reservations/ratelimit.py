@@ -0,0 +1,108 @@
+import hashlib
+import math
+import time
+from django.conf import settings
+from django.core.cache import cache
+
+RATE_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+COUNTER_OUTCOMES = ('allowed', 'limited')
+
+def parse_rate(rate):
+    """
+    Parses a rate such as '5/m' into tokens per second.
+
+    Args:
+        rate (str): A number of requests per second, minute, hour or day.
+
+    Returns:
+        float: The refill rate in tokens per second.
+    """
+    count, unit = rate.split('/')
+    return int(count) / RATE_UNITS[unit]
+
+def bucket_key(scope, kind, value):
+    # Hashed so that emails and addresses are neither stored in the clear nor
+    # able to produce invalid cache keys.
+    digest = hashlib.sha256(str(value).encode()).hexdigest()[:32]
+    return f'ratelimit:{scope}:{kind}:{digest}'
+
+def counter_key(scope, outcome):
+    return f'ratelimit:counter:{scope}:{outcome}'
+
+def take_tokens(scope, identities, now=None):
+    """
+    Takes one token from the bucket of every identity of a request.
+
+    Each bucket holds up to burst tokens and refills at its rate. A request is
+    allowed only if every bucket has a token, and denied requests take none,
+    so a client that keeps retrying does not extend its own wait. Buckets are
+    read and written with one get_many and one set_many; concurrent requests
+    may both take the last token, which lets a burst exceed the limit by the
+    number of workers but never lets a client sustain more than its rate.
+
+    Args:
+        scope (str): The RATE_LIMITS entry, such as 'login'.
+        identities (dict): Maps each kind of key in the scope, such as 'ip'
+        or 'account', to the request's value; None values are not limited.
+        now (float, optional): The current time in seconds.
+
+    Returns:
+        int: 0 if the request is allowed, otherwise the seconds until it
+        would be.
+    """
+    limits = settings.RATE_LIMITS.get(scope, {})
+    now = time.time() if now is None else now
+    buckets = {
+        bucket_key(scope, kind, value): (parse_rate(limits[kind][0]), limits[kind][1])
+        for kind, value in identities.items()
+        if value is not None and kind in limits
+    }
+    if not buckets:
+        return 0
+
+    stored = cache.get_many(list(buckets))
+    updated, retry_after = {}, 0
+    for key, (rate, burst) in buckets.items():
+        tokens, checked = stored.get(key, (burst, now))
+        tokens = min(burst, tokens + (now - checked) * rate)
+        if tokens < 1:
+            retry_after = max(retry_after, math.ceil((1 - tokens) / rate))
+        updated[key] = (tokens - 1, now, math.ceil(burst / rate))
+
+    if retry_after:
+        count(scope, 'limited')
+        return retry_after
+    # Buckets expire once they would have refilled anyway.
+    cache.set_many(
+        {key: (tokens, checked) for key, (tokens, checked, _) in updated.items()},
+        timeout=max(timeout for _, _, timeout in updated.values()),
+    )
+    count(scope, 'allowed')
+    return 0
+
+def count(scope, outcome):
+    key = counter_key(scope, outcome)
+    if not cache.add(key, 1, timeout=None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, 1, timeout=None)
+
+def rate_limit_counters():
+    """
+    Returns how many requests each rate limited scope allowed and limited
+    since the counters were last reset.
+
+    Returns:
+        dict: Maps each scope in RATE_LIMITS to its 'allowed' and 'limited'
+        counts.
+    """
+    keys = {counter_key(scope, outcome): (scope, outcome) for scope in settings.RATE_LIMITS for outcome in COUNTER_OUTCOMES}
+    values = cache.get_many(list(keys))
+    counters = {scope: dict.fromkeys(COUNTER_OUTCOMES, 0) for scope in settings.RATE_LIMITS}
+    for key, (scope, outcome) in keys.items():
+        counters[scope][outcome] = values.get(key, 0)
+    return counters
+
+def reset_rate_limit_counters():
+    cache.delete_many([counter_key(scope, outcome) for scope in settings.RATE_LIMITS for outcome in COUNTER_OUTCOMES])
@@ -0,0 +1,78 @@
+import contextvars
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA_ALIAS = 'replica'
+PRIMARY_PIN_COOKIE = 'primary_pin'
+# Writes that the views reading from the replica never show, such as session
+# saves, the last_login update of every login and queued emails, do not pin
+# the client to the primary.
+UNPINNED_WRITES = {'sessions.Session', 'auth.User', 'reservations.OutboxEmail'}
+
+class RequestRouting:
+    """
+    Per-request routing state shared by ReplicaRoutingMiddleware, the
+    read_replica decorator and PrimaryReplicaRouter.
+
+    Attributes:
+        pinned (bool): The client wrote within the last REPLICA_PIN_SECONDS.
+        replica (bool): The view only reads and may use the replica.
+        wrote (bool): This request wrote data the replica-backed views show.
+    """
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.replica = False
+        self.wrote = False
+
+_routing = contextvars.ContextVar('reservations_routing', default=None)
+
+def current_routing():
+    return _routing.get()
+
+def start_routing(request):
+    return _routing.set(RequestRouting(pinned=PRIMARY_PIN_COOKIE in request.COOKIES))
+
+def finish_routing(token):
+    _routing.reset(token)
+
+class PrimaryReplicaRouter:
+    """
+    Sends reads of views marked with read_replica to the replica alias and
+    everything else to the primary.
+
+    Reads stay on the primary once the request wrote or the client is pinned
+    by a recent write, so a user always sees their own bookings even while
+    the replica lags. Without a configured replica, or outside a request,
+    every query goes to the primary.
+    """
+    replica_alias = REPLICA_ALIAS
+
+    def use_replica(self):
+        routing = current_routing()
+        return bool(routing and routing.replica and not routing.pinned and not routing.wrote)
+
+    def replica_ready(self):
+        # A replica pointing at the primary's database, such as a test mirror,
+        # is not a separate copy.
+        return (
+            self.replica_alias in connections and
+            connections[self.replica_alias].settings_dict['NAME'] != connections[DEFAULT_DB_ALIAS].settings_dict['NAME']
+        )
+
+    def db_for_read(self, model, **hints):
+        if self.use_replica() and self.replica_ready():
+            return self.replica_alias
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        routing = current_routing()
+        if routing is not None and model._meta.label not in UNPINNED_WRITES:
+            routing.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica is a copy of the primary; see the sync_replica command.
+        return db == DEFAULT_DB_ALIAS
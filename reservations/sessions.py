@@ -0,0 +1,24 @@
+import copy
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+
+class SessionStore(CachedDBStore):
+    """
+    Cache-first session store that skips saves of unchanged sessions.
+
+    Reads are served from the cache and fall back to the database, as with the
+    cached_db engine. Views can mark a session as modified without changing
+    its content (for example by assigning the same value again); such saves
+    are coalesced away instead of rewriting the django_session row.
+    """
+    _persisted = None
+
+    def load(self):
+        data = super().load()
+        self._persisted = copy.deepcopy(data) if self.session_key else None
+        return data
+
+    def save(self, must_create=False):
+        if not must_create and self._persisted is not None and self._session == self._persisted:
+            return
+        super().save(must_create=must_create)
+        self._persisted = copy.deepcopy(self._get_session(no_load=must_create))
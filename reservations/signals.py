@@ -0,0 +1,86 @@
+import contextvars
+from contextlib import contextmanager
+from django.conf import settings
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .availability import invalidate_occupancy
+from .booking import bump_availability_version
+from .catalog import invalidate_catalog
+from .metrics import install_query_recorder
+from .models import Court, Location, Reservation
+
+@receiver([post_save, post_delete], sender=Location)
+@receiver([post_save, post_delete], sender=Court)
+def catalog_changed(sender, **kwargs):
+    """
+    Invalidates the court catalog whenever a location or court changes.
+
+    The catalog version is also part of the template fragment cache keys, so
+    this rebuilds the cached home, locations and navbar fragments as well.
+
+    The catalog is invalidated immediately and again once the transaction
+    commits, so a worker that reloads in between does not keep a snapshot
+    missing the change.
+    """
+    invalidate_catalog()
+    transaction.on_commit(invalidate_catalog)
+
+@receiver(post_save, sender=Location)
+def location_image_saved(sender, instance, raw=False, **kwargs):
+    """
+    Builds the resized renditions of a location image when it is uploaded or replaced.
+    """
+    if not raw:
+        instance.update_image_renditions()
+
+_archiving = contextvars.ContextVar('reservations_archiving', default=False)
+
+@contextmanager
+def archiving_reservations():
+    """
+    Skips reservation_changed for the reservations deleted inside the block.
+
+    archive_reservations only moves past reservations, whose occupancy no
+    booking depends on, so bumping the availability counter once per row
+    would only cost an UPDATE each and throw away every cached grid.
+    """
+    token = _archiving.set(True)
+    try:
+        yield
+    finally:
+        _archiving.reset(token)
+
+@receiver([post_save, post_delete], sender=Reservation)
+def reservation_changed(sender, instance, **kwargs):
+    """
+    Invalidates the cached occupancy of a reservation's court and date and
+    bumps its location's availability counter.
+
+    Booking and cancelling invalidate through booking.py; this catches
+    reservations saved or deleted elsewhere, such as in the admin.
+    """
+    if _archiving.get():
+        return
+    bump_availability_version([instance.court_id])
+    transaction.on_commit(lambda: invalidate_occupancy([(instance.court_id, instance.date)]))
+
+@receiver(connection_created)
+def tune_sqlite_connection(sender, connection, **kwargs):
+    """
+    Applies settings.SQLITE_PRAGMAS to every new SQLite connection.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+@receiver(connection_created)
+def record_connection_queries(sender, connection, **kwargs):
+    """
+    Adds the query recorder of the metrics middleware to every connection,
+    including those opened by async views in worker threads.
+    """
+    install_query_recorder(connection)
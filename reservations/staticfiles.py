@@ -0,0 +1,51 @@
+import gzip
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg', '.json', '.txt', '.html', '.xml', '.map', '.ico')
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Manifest storage that also writes a gzip sibling next to every text asset.
+
+    collectstatic stores content-hashed copies of every file, such as
+    'styles.3f2a9c1b7d4e.css', and a 'styles.3f2a9c1b7d4e.css.gz' copy when
+    compressing saves space. StaticFilesMiddleware serves the gzip copy to
+    clients that accept it.
+
+    Until collectstatic has written a manifest (during development and in
+    tests) the {% static %} tag falls back to the unhashed file names, as it
+    does for names missing from the collected files, rather than failing the
+    page that references them.
+    """
+    manifest_strict = False
+
+    def stored_name(self, name):
+        if not self.hashed_files:
+            return name
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        for name in {*self.hashed_files.keys(), *self.hashed_files.values()}:
+            if name.endswith(COMPRESSIBLE_EXTENSIONS):
+                self.compress(name)
+
+    def compress(self, name):
+        """
+        Writes name + '.gz' if gzip makes the file smaller.
+
+        The gzip header carries no timestamp, so collecting the same files
+        twice produces byte-identical output.
+        """
+        with self.open(name) as original:
+            content = original.read()
+        compressed = gzip.compress(content, compresslevel=9, mtime=0)
+        self.delete(f'{name}.gz')
+        if len(compressed) < len(content):
+            self._save(f'{name}.gz', ContentFile(compressed))
@@ -1,3 +1,1673 @@
-from django.test import TestCase
+import csv
+import datetime
+import gzip
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from io import BytesIO, StringIO
+from unittest import mock
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core import mail
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import CommandError, call_command
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connection, connections
+from django.contrib.sessions.models import Session
+from django.test import Client, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.formats import date_format
+from PIL import Image
+from .catalog import catalog_rows, get_catalog
+from .checks import check_shared_cache
+from .availability import (
+    FULL_MASK, SLOT_HOURS, cached_occupancy, find_conflicts, hours_mask, is_available, mask_hours, occupancy, occupancy_key,
+    occupancy_versions, reservation_hours,
+)
+from . import urls
+from .booking import SlotUnavailable, book_reservation, cancel_booking
+from .exports import CSV_HEADER, calendar_token
+from .forms import ReservationForm
+from .images import rendition_name
+from .metrics import RequestTimings, registry
+from .management.commands.bench_sqlite_writes import CONFIGURATIONS as SQLITE_BENCH_CONFIGURATIONS, Command as BenchSqliteWritesCommand
+from .management.commands.import_data import ReservationImporter
+from .management.commands.send_reminders import due_reminders
+from .management.commands.sync_replica import Command as SyncReplicaCommand
+from .models import ArchivedReservation, Court, CourtDayOccupancy, Location, OutboxEmail, Reservation, ReservationReminder, ReservationSlot
+from .outbox import drain_outbox, queue_email
+from .pagination import PAGE_SIZE, EstimatedCountPaginator
+from .ratelimit import rate_limit_counters, take_tokens
+from .routers import PRIMARY_PIN_COOKIE, PrimaryReplicaRouter, current_routing, finish_routing, start_routing
+from .sessions import SessionStore
+from .utils import VERIFICATION_CODE_MAX_AGE, VERIFICATION_COOKIE, make_verification_token
 
-# Create your tests here.
+
+def create_location(name='Club Norte'):
+    return Location.objects.create(
+        name=name, city='Monterrey', state='NL', address='Av. Siempre Viva 742',
+        zip_code=64000, phone_number=8180000000,
+    )
+
+
+class ReservationTestCase(TestCase):
+    """
+    Base test case with a location, two courts and an active user.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.location = create_location()
+        cls.court = Court.objects.create(location=cls.location, name='Court 1')
+        cls.other_court = Court.objects.create(location=cls.location, name='Court 2')
+        cls.user = User.objects.create_user('player', 'player@example.com', 'secret-pass-123')
+        cls.tomorrow = timezone.localtime(timezone.now()).date() + datetime.timedelta(days=1)
+
+    def setUp(self):
+        # Test rollbacks undo catalog and reservation rows without firing signals.
+        cache.clear()
+
+    def reserve(self, start_time, end_time, court=None, date=None, status='confirmed', user=None):
+        return Reservation.objects.create(
+            user=user or self.user, court=court or self.court, date=date or self.tomorrow,
+            start_time=start_time, end_time=end_time, status=status,
+        )
+
+
+class AvailabilityTests(ReservationTestCase):
+
+    def test_reservation_hours_uses_inclusive_end_time(self):
+        self.assertEqual(list(reservation_hours('08:00', '09:59')), [8, 9])
+        self.assertEqual(list(reservation_hours('08:00', '10:00')), [8, 9])
+
+    def test_mask_round_trip(self):
+        self.assertEqual(mask_hours(hours_mask([7, 12, 22])), [7, 12, 22])
+        self.assertEqual(hours_mask(range(7, 23)), FULL_MASK)
+
+    def test_occupancy_loads_all_pairs_in_one_query(self):
+        self.reserve('08:00', '09:59')
+        self.reserve('20:00', '20:59', court=self.other_court)
+        self.reserve('10:00', '10:59', status='cancelled')
+        day_after = self.tomorrow + datetime.timedelta(days=1)
+
+        with self.assertNumQueries(1):
+            bitmaps = occupancy([self.court.id, self.other_court.id], [self.tomorrow, day_after])
+
+        self.assertEqual(mask_hours(bitmaps[(self.court.id, self.tomorrow)]), [8, 9])
+        self.assertEqual(mask_hours(bitmaps[(self.other_court.id, self.tomorrow)]), [20])
+        self.assertEqual(bitmaps[(self.court.id, day_after)], 0)
+
+    def test_is_available_detects_overlap(self):
+        self.reserve('10:00', '11:59')
+        self.assertFalse(is_available(self.court.id, self.tomorrow, '11:00', '12:59'))
+        self.assertTrue(is_available(self.court.id, self.tomorrow, '12:00', '12:59'))
+        self.assertTrue(is_available(self.other_court.id, self.tomorrow, '10:00', '10:59'))
+
+    def test_availability_view_lists_free_slots(self):
+        self.reserve('07:00', '08:59')
+        response = self.client.get(reverse('court_availability', args=[self.court.id]), {'date': self.tomorrow.isoformat()})
+        self.assertEqual(response.status_code, 200)
+        free = response.json()['free']
+        self.assertNotIn('07:00', free)
+        self.assertNotIn('08:00', free)
+        self.assertEqual(free[0], '09:00')
+        self.assertEqual(free[-1], '22:00')
+
+    def test_availability_view_rejects_bad_date(self):
+        response = self.client.get(reverse('court_availability', args=[self.court.id]), {'date': 'tomorrow'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_new_reservation_rejects_conflict(self):
+        self.reserve('10:00', '11:59')
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('new_reservation'), {
+            'court': self.court.id, 'date': self.tomorrow.isoformat(), 'start_time': '11:00', 'end_time': '12:00',
+        })
+        self.assertContains(response, 'Court is already booked for this time.')
+        self.assertEqual(Reservation.objects.count(), 1)
+
+
+class ReservationHistoryPaginationTests(ReservationTestCase):
+    # Session (on a cold cache), user and the page itself; independent of history length.
+    QUERY_BUDGET = 3
+    # History pages also read the archive table.
+    HISTORY_QUERY_BUDGET = QUERY_BUDGET + 1
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def create_history(self, count, status='confirmed', future=True):
+        today = timezone.localtime(timezone.now()).date()
+        Reservation.objects.bulk_create(
+            Reservation(
+                user=self.user, court=self.court if day % 2 else self.other_court,
+                date=today + datetime.timedelta(days=day + 1 if future else -day - 1),
+                start_time='09:00', end_time='09:59', status=status,
+            )
+            for day in range(count)
+        )
+
+    def assert_page_within_budget(self, url_name, context_key, count, budget=QUERY_BUDGET, **history):
+        self.create_history(count, **history)
+        url = reverse(url_name)
+        seen = []
+        cursor = None
+        while True:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url, {'after': cursor} if cursor else {})
+            self.assertLessEqual(len(queries), budget)
+            page = list(response.context[context_key])
+            self.assertLessEqual(len(page), PAGE_SIZE)
+            seen.extend(reservation.pk for reservation in page)
+            cursor = response.context['next_cursor']
+            if not cursor:
+                break
+        self.assertEqual(len(seen), count)
+        self.assertEqual(len(set(seen)), count)
+        return seen
+
+    def test_upcoming_reservations_within_budget(self):
+        seen = self.assert_page_within_budget('reservations_list', 'upcoming_reservations', PAGE_SIZE * 3 + 5)
+        dates = list(Reservation.objects.filter(pk__in=seen).order_by('date').values_list('pk', flat=True))
+        self.assertEqual(seen, dates)
+
+    def test_past_reservations_within_budget(self):
+        seen = self.assert_page_within_budget(
+            'past_reservations', 'past_reservations', PAGE_SIZE * 2 + 1, budget=self.HISTORY_QUERY_BUDGET, future=False,
+        )
+        dates = list(Reservation.objects.filter(pk__in=seen).order_by('-date').values_list('pk', flat=True))
+        self.assertEqual(seen, dates)
+
+    def test_cancelled_reservations_within_budget(self):
+        self.assert_page_within_budget(
+            'cancelled_reservations', 'cancelled_reservations', PAGE_SIZE * 2, budget=self.HISTORY_QUERY_BUDGET, status='cancelled',
+        )
+
+    def test_same_slot_rows_are_ordered_by_id(self):
+        for _ in range(PAGE_SIZE + 2):
+            self.reserve('10:00', '10:59')
+        first = self.client.get(reverse('reservations_list'))
+        second = self.client.get(reverse('reservations_list'), {'after': first.context['next_cursor']})
+        self.assertEqual(len(second.context['upcoming_reservations']), 2)
+
+    def test_malformed_cursor_starts_from_first_page(self):
+        self.create_history(3)
+        response = self.client.get(reverse('reservations_list'), {'after': 'garbage'})
+        self.assertEqual(len(response.context['upcoming_reservations']), 3)
+
+
+class CourtCatalogTests(ReservationTestCase):
+
+    def test_catalog_loads_in_one_query(self):
+        create_location('Club Sur')
+        with self.assertNumQueries(1):
+            catalog = get_catalog()
+            labels = [label for _, label in catalog.court_choices()]
+        self.assertEqual(labels, [str(self.court), str(self.other_court)])
+        self.assertEqual([location.name for location in catalog.locations], ['Club Norte', 'Club Sur'])
+        self.assertEqual(catalog.locations[1].courts, [])
+
+    def test_catalog_reloads_after_court_changes(self):
+        get_catalog()
+        Court.objects.create(location=self.location, name='Court 3')
+        self.assertIn('Court 3', [court.name for court in get_catalog().courts])
+        self.other_court.delete()
+        self.assertNotIn(self.other_court.id, get_catalog().courts_by_id)
+
+    def test_catalog_reloads_after_location_changes(self):
+        get_catalog()
+        self.location.name = 'Club Centro'
+        self.location.save()
+        self.assertEqual(get_catalog().locations[0].name, 'Club Centro')
+
+    def test_new_reservation_form_renders_without_court_queries(self):
+        self.client.force_login(self.user)
+        get_catalog()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('new_reservation'))
+        self.assertContains(response, str(self.other_court))
+        self.assertFalse([query for query in queries if 'reservations_court' in query['sql']])
+
+    def test_locations_page_uses_catalog(self):
+        get_catalog()
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('locations_list'))
+        self.assertContains(response, self.location.name)
+
+    def test_new_reservation_accepts_catalog_court(self):
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('new_reservation'), {
+            'court': self.other_court.id, 'date': self.tomorrow.isoformat(), 'start_time': '09:00', 'end_time': '10:00',
+        })
+        self.assertRedirects(response, reverse('reservations_list'), fetch_redirect_response=False)
+        reservation = Reservation.objects.get()
+        self.assertEqual((reservation.court_id, reservation.end_time), (self.other_court.id, '09:59'))
+
+
+class FailingEmailBackend(EmailBackend):
+    """
+    Locmem backend that refuses every message addressed to a bounce address.
+    """
+    opened = 0
+
+    def open(self):
+        FailingEmailBackend.opened += 1
+        return super().open()
+
+    def send_messages(self, messages):
+        if any(address.startswith('bounce') for message in messages for address in message.to):
+            raise ConnectionError('Relay refused recipient')
+        return super().send_messages(messages)
+
+
+class EmailOutboxTests(ReservationTestCase):
+
+    def test_signup_queues_instead_of_sending(self):
+        response = self.client.post(reverse('signup'), {
+            'username': 'newbie', 'email': 'newbie@example.com', 'first_name': 'New', 'last_name': 'Player',
+            'password1': 'a-long-Passw0rd', 'password2': 'a-long-Passw0rd',
+        })
+        self.assertRedirects(response, reverse('verify_email'), fetch_redirect_response=False)
+        self.assertEqual(len(mail.outbox), 0)
+        queued = OutboxEmail.objects.get()
+        self.assertEqual((queued.to, queued.status), ('newbie@example.com', 'pending'))
+
+        call_command('send_outbox', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].subject, 'Email Verification')
+        self.assertEqual(mail.outbox[0].alternatives[0][1], 'text/html')
+        self.assertEqual(OutboxEmail.objects.get().status, 'sent')
+
+    @override_settings(EMAIL_BACKEND='reservations.tests.FailingEmailBackend')
+    def test_worker_reuses_one_connection_and_backs_off(self):
+        FailingEmailBackend.opened = 0
+        for index in range(5):
+            queue_email('Hello', 'Body', 'club@example.com', f'player{index}@example.com')
+        bounced = queue_email('Hello', 'Body', 'club@example.com', 'bounce@example.com')
+
+        self.assertEqual(drain_outbox(batch_size=2), (5, 1))
+        self.assertEqual(FailingEmailBackend.opened, 1)
+        self.assertEqual(len(mail.outbox), 5)
+
+        bounced.refresh_from_db()
+        self.assertEqual((bounced.status, bounced.attempts), ('pending', 1))
+        self.assertGreater(bounced.next_attempt_at, timezone.now())
+        self.assertIn('Relay refused recipient', bounced.last_error)
+        self.assertEqual(drain_outbox(), (0, 0))
+
+    @override_settings(EMAIL_BACKEND='reservations.tests.FailingEmailBackend')
+    def test_worker_dead_letters_after_max_attempts(self):
+        bounced = queue_email('Hello', 'Body', 'club@example.com', 'bounce@example.com')
+        for _ in range(3):
+            OutboxEmail.objects.filter(pk=bounced.pk).update(next_attempt_at=timezone.now())
+            drain_outbox(max_attempts=3)
+        bounced.refresh_from_db()
+        self.assertEqual((bounced.status, bounced.attempts), ('dead', 3))
+
+    def test_unreachable_relay_backs_off_the_claimed_batch(self):
+        for index in range(3):
+            queue_email('Hello', 'Body', 'club@example.com', f'player{index}@example.com')
+        with mock.patch.object(EmailBackend, 'open', side_effect=ConnectionRefusedError('Connection refused')):
+            self.assertEqual(drain_outbox(batch_size=2), (0, 2))
+            call_command('send_outbox', stdout=StringIO())
+
+        emails = list(OutboxEmail.objects.order_by('id'))
+        self.assertEqual([email.attempts for email in emails], [1, 1, 1])
+        self.assertTrue(all('ConnectionRefusedError' in email.last_error for email in emails))
+        self.assertTrue(all(email.next_attempt_at > timezone.now() for email in emails))
+        self.assertEqual(len(mail.outbox), 0)
+
+
+class SlotClaimTests(ReservationTestCase):
+
+    def test_booking_claims_one_slot_per_hour(self):
+        reservation = Reservation(user=self.user, court=self.court, date=self.tomorrow, start_time='10:00', end_time='12:59')
+        book_reservation(reservation)
+        self.assertEqual(sorted(reservation.slots.values_list('hour', flat=True)), [10, 11, 12])
+
+    def test_booking_that_occupies_no_hour_is_rejected(self):
+        with self.assertRaises(ValidationError):
+            book_reservation(Reservation(user=self.user, court=self.court, date=self.tomorrow, start_time='18:00', end_time='09:59'))
+        self.assertFalse(Reservation.objects.exists())
+
+    def test_overlapping_booking_is_rejected_atomically(self):
+        book_reservation(Reservation(user=self.user, court=self.court, date=self.tomorrow, start_time='10:00', end_time='11:59'))
+        overlapping = Reservation(user=self.user, court=self.court, date=self.tomorrow, start_time='09:00', end_time='10:59')
+        with self.assertRaises(SlotUnavailable):
+            book_reservation(overlapping)
+        self.assertIsNone(overlapping.pk)
+        self.assertEqual(Reservation.objects.count(), 1)
+        self.assertEqual(ReservationSlot.objects.count(), 2)
+
+    def test_cancel_releases_slots(self):
+        reservation = Reservation(user=self.user, court=self.court, date=self.tomorrow, start_time='10:00', end_time='10:59')
+        book_reservation(reservation)
+        self.client.force_login(self.user)
+        self.client.get(reverse('cancel_reservation', args=[reservation.pk]))
+        self.assertFalse(ReservationSlot.objects.exists())
+        book_reservation(Reservation(user=self.user, court=self.court, date=self.tomorrow, start_time='10:00', end_time='10:59'))
+
+    def test_concurrent_cancel_sends_one_email(self):
+        reservation = Reservation(user=self.user, court=self.court, date=self.tomorrow, start_time='10:00', end_time='10:59')
+        book_reservation(reservation)
+        self.client.force_login(self.user)
+        # Both requests loaded the reservation before either cancelled it.
+        loaded = [Reservation.objects.get(pk=reservation.pk) for _ in range(2)]
+        with mock.patch('reservations.views.get_object_or_404', side_effect=loaded):
+            self.client.get(reverse('cancel_reservation', args=[reservation.pk]))
+            self.client.get(reverse('cancel_reservation', args=[reservation.pk]))
+        self.assertEqual(OutboxEmail.objects.count(), 1)
+
+
+class ConcurrentBookingStressTests(TransactionTestCase):
+    ATTEMPTS = 300
+    WORKERS = 32
+
+    def test_hot_slot_is_booked_exactly_once(self):
+        court = Court.objects.create(location=create_location(), name='Center Court')
+        users = User.objects.bulk_create(User(username=f'player{index}') for index in range(self.WORKERS))
+        date = timezone.localtime(timezone.now()).date() + datetime.timedelta(days=1)
+        outcomes = {'booked': 0, 'rejected': 0}
+        lock = threading.Lock()
+        start = threading.Barrier(self.WORKERS)
+
+        def attempt(index):
+            if index < self.WORKERS:
+                start.wait()
+            try:
+                while True:
+                    reservation = Reservation(
+                        user=users[index % self.WORKERS], court=court, date=date,
+                        start_time='19:00', end_time='20:59',
+                    )
+                    try:
+                        book_reservation(reservation)
+                        outcome = 'booked'
+                    except SlotUnavailable:
+                        outcome = 'rejected'
+                    except OperationalError:
+                        # SQLite reports writer contention instead of waiting.
+                        time.sleep(0.001)
+                        continue
+                    with lock:
+                        outcomes[outcome] += 1
+                    return
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=self.WORKERS) as executor:
+            list(executor.map(attempt, range(self.ATTEMPTS)))
+
+        self.assertEqual(outcomes, {'booked': 1, 'rejected': self.ATTEMPTS - 1})
+        self.assertEqual(Reservation.objects.filter(court=court, date=date).count(), 1)
+        self.assertEqual(ReservationSlot.objects.filter(court=court, date=date).count(), 2)
+
+
+class QueryPlanTests(ReservationTestCase):
+    """
+    Runs EXPLAIN QUERY PLAN on every reservation query issued by the hot views
+    and fails if any of them reads the table with a full scan.
+    """
+    TABLES = (Reservation._meta.db_table, ReservationSlot._meta.db_table)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+        self.reservation = self.reserve('10:00', '10:59')
+        self.reserve('12:00', '12:59', status='cancelled')
+
+    def assert_no_full_scans(self, method, url, data=None):
+        with CaptureQueriesContext(connection) as queries:
+            getattr(self.client, method)(url, data or {})
+        plans = []
+        for query in queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT') or not any(table in sql for table in self.TABLES):
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                plan = [row[-1] for row in cursor.fetchall()]
+            plans.append(plan)
+            for step in plan:
+                for table in self.TABLES:
+                    self.assertFalse(
+                        step.startswith(f'SCAN {table}') and 'COVERING INDEX' not in step,
+                        f'Full scan of {table} in {sql!r}: {plan}',
+                    )
+        self.assertTrue(plans, f'No reservation queries captured for {url}')
+        return plans
+
+    def test_reservations_list_plan(self):
+        self.assert_no_full_scans('get', reverse('reservations_list'))
+
+    def test_past_reservations_plan(self):
+        self.assert_no_full_scans('get', reverse('past_reservations'))
+
+    def test_cancelled_reservations_plan(self):
+        self.assert_no_full_scans('get', reverse('cancelled_reservations'))
+
+    def test_new_reservation_conflict_check_plan(self):
+        self.assert_no_full_scans('post', reverse('new_reservation'), {
+            'court': self.court.id, 'date': self.tomorrow.isoformat(), 'start_time': '10:00', 'end_time': '11:00',
+        })
+
+    def test_court_availability_plan(self):
+        self.assert_no_full_scans('get', reverse('court_availability', args=[self.court.id]), {'date': self.tomorrow.isoformat()})
+
+    def test_cancel_reservation_plan(self):
+        self.assert_no_full_scans('get', reverse('cancel_reservation', args=[self.reservation.pk]))
+
+
+class BenchReservationsCommandTests(TestCase):
+
+    def test_bench_reports_every_url(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'bench.json')
+            call_command(
+                'bench_reservations', use_current_db=True, locations=1, courts_per_location=2, users=3,
+                years=0.05, iterations=2, output=output, stdout=StringIO(), stderr=StringIO(),
+            )
+            with open(output) as results_file:
+                results = json.load(results_file)
+
+        self.assertGreater(results['meta']['reservations'], 0)
+        self.assertEqual(set(results['results']), {pattern.name for pattern in urls.urlpatterns})
+        for result in results['results'].values():
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+            self.assertNotIn(500, result['status_codes'])
+        self.assertEqual(results['results']['reservations_list']['queries'], 2)
+        self.assertEqual(results['results']['utilization_report']['status_codes'], [200])
+        self.assertEqual(results['results']['reservations_export']['status_codes'], [200])
+        self.assertEqual(results['results']['metrics']['status_codes'], [200])
+        self.assertTrue(CourtDayOccupancy.objects.exists())
+        self.assertEqual(results['flows']['signup'], {'queries': 6, 'db_writes': 2, 'session_writes': 0})
+
+
+class RecurringBookingTests(ReservationTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def post_reservation(self, **data):
+        return self.client.post(reverse('new_reservation'), {
+            'court': self.court.id, 'date': self.tomorrow.isoformat(), 'start_time': '18:00', 'end_time': '20:00', **data,
+        })
+
+    def test_end_time_must_be_after_start_time(self):
+        response = self.post_reservation(start_time='18:00', end_time='10:00')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('end_time', response.context['form'].errors)
+        self.assertContains(response, 'End time must be after the start time.')
+        self.assertFalse(Reservation.objects.exists())
+
+    def test_single_booking_confirms_the_saved_reservation(self):
+        with mock.patch('reservations.views.send_reservation_confirmation_email') as send:
+            self.post_reservation()
+        self.assertEqual(send.call_args.args[0], Reservation.objects.get())
+
+    def test_weekly_booking_creates_every_occurrence(self):
+        response = self.post_reservation(weeks=4)
+        self.assertRedirects(response, reverse('reservations_list'), fetch_redirect_response=False)
+        dates = list(Reservation.objects.order_by('date').values_list('date', flat=True))
+        self.assertEqual(dates, [self.tomorrow + datetime.timedelta(weeks=week) for week in range(4)])
+        self.assertEqual(ReservationSlot.objects.count(), 8)
+
+        summary = OutboxEmail.objects.get()
+        self.assertEqual(summary.subject, 'New Reservations Confirmation')
+        self.assertIn(date_format(self.tomorrow + datetime.timedelta(weeks=3)), summary.text_body)
+
+    def test_multi_court_booking(self):
+        self.post_reservation(extra_courts=[self.other_court.id, self.court.id], weeks=2)
+        self.assertEqual(
+            sorted(Reservation.objects.values_list('court_id', 'date')),
+            sorted((court.id, self.tomorrow + datetime.timedelta(weeks=week)) for court in (self.court, self.other_court) for week in range(2)),
+        )
+
+    def test_conflict_in_any_week_books_nothing(self):
+        self.reserve('19:00', '19:59', date=self.tomorrow + datetime.timedelta(weeks=2))
+        response = self.post_reservation(weeks=3)
+        self.assertContains(response, f'Court 1 on {self.tomorrow + datetime.timedelta(weeks=2)}')
+        self.assertEqual(Reservation.objects.count(), 1)
+        self.assertFalse(OutboxEmail.objects.exists())
+
+    def test_conflict_check_queries_do_not_grow_with_occurrences(self):
+        form = ReservationForm({
+            'court': self.court.id, 'date': self.tomorrow.isoformat(), 'start_time': '18:00', 'end_time': '20:00',
+            'extra_courts': [self.other_court.id], 'weeks': 6,
+        })
+        self.assertTrue(form.is_valid(), form.errors)
+        reservation = form.save(commit=False)
+        reservation.user = self.user
+        reservations = form.occurrences(reservation)
+        self.assertEqual(len(reservations), 12)
+        with self.assertNumQueries(2):
+            self.assertEqual(find_conflicts(reservations), [])
+
+    def test_weeks_are_bounded(self):
+        response = self.post_reservation(weeks=ReservationForm.MAX_RECURRING_WEEKS + 1)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Reservation.objects.exists())
+
+
+class LocationAvailabilityGridTests(ReservationTestCase):
+
+    def grid(self, **headers):
+        return self.client.get(
+            reverse('location_availability', args=[self.location.id]),
+            {'start': self.tomorrow.isoformat(), 'days': 2}, headers=headers,
+        )
+
+    def test_grid_lists_every_court_and_day(self):
+        self.reserve('07:00', '08:59')
+        self.reserve('22:00', '22:59', court=self.other_court, date=self.tomorrow + datetime.timedelta(days=1))
+        get_catalog()
+        with self.assertNumQueries(2):
+            response = self.grid()
+        grid = response.json()
+        self.assertEqual(len(grid['hours']), 16)
+        first, second = self.tomorrow.isoformat(), (self.tomorrow + datetime.timedelta(days=1)).isoformat()
+        courts = {court['id']: court['occupancy'] for court in grid['courts']}
+        self.assertEqual(courts[self.court.id][first], '1100000000000000')
+        self.assertEqual(courts[self.court.id][second], '0' * 16)
+        self.assertEqual(courts[self.other_court.id][second], '0' * 15 + '1')
+
+    def test_unchanged_grid_returns_not_modified(self):
+        etag = self.grid()['ETag']
+        with self.assertNumQueries(1):
+            response = self.grid(if_none_match=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_booking_and_cancelling_change_the_etag(self):
+        etag = self.grid()['ETag']
+        reservation = Reservation(user=self.user, court=self.court, date=self.tomorrow, start_time='10:00', end_time='10:59')
+        book_reservation(reservation)
+        booked_etag = self.grid(if_none_match=etag)
+        self.assertEqual(booked_etag.status_code, 200)
+        cancel_booking(reservation)
+        self.assertEqual(self.grid(if_none_match=booked_etag['ETag']).status_code, 200)
+
+    def test_new_etag_is_never_served_with_stale_occupancy(self):
+        self.grid()
+        # Booked through another worker, whose invalidation does not reach this cache.
+        with mock.patch('reservations.booking.invalidate_occupancy'):
+            book_reservation(Reservation(user=self.user, court=self.court, date=self.tomorrow, start_time='10:00', end_time='10:59'))
+        courts = {court['id']: court['occupancy'] for court in self.grid().json()['courts']}
+        self.assertEqual(courts[self.court.id][self.tomorrow.isoformat()], '0001000000000000')
+
+    def test_unknown_location_is_not_found(self):
+        response = self.client.get(reverse('location_availability', args=[999]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_invalid_range_is_rejected(self):
+        response = self.client.get(reverse('location_availability', args=[self.location.id]), {'days': 'many'})
+        self.assertEqual(response.status_code, 400)
+
+
+class OccupancyCacheTests(ReservationTestCase):
+
+    def test_warm_reads_are_served_from_cache(self):
+        self.reserve('08:00', '08:59')
+        with self.assertNumQueries(2):
+            cold = cached_occupancy([self.court.id], [self.tomorrow])
+        with self.assertNumQueries(1):
+            warm = cached_occupancy([self.court.id], [self.tomorrow])
+        self.assertEqual(cold, warm)
+        self.assertEqual(mask_hours(warm[(self.court.id, self.tomorrow)]), [8])
+
+    def test_booking_invalidates_on_commit(self):
+        cached_occupancy([self.court.id], [self.tomorrow])
+        reservation = Reservation(user=self.user, court=self.court, date=self.tomorrow, start_time='09:00', end_time='09:59')
+        with self.captureOnCommitCallbacks(execute=True):
+            book_reservation(reservation)
+        self.assertEqual(mask_hours(cached_occupancy([self.court.id], [self.tomorrow])[(self.court.id, self.tomorrow)]), [9])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            cancel_booking(reservation)
+        self.assertEqual(cached_occupancy([self.court.id], [self.tomorrow])[(self.court.id, self.tomorrow)], 0)
+
+    def test_cancel_view_invalidates_availability(self):
+        reservation = Reservation(user=self.user, court=self.court, date=self.tomorrow, start_time='09:00', end_time='09:59')
+        book_reservation(reservation)
+        url = reverse('court_availability', args=[self.court.id])
+        self.assertNotIn('09:00', self.client.get(url, {'date': self.tomorrow.isoformat()}).json()['free'])
+        self.client.force_login(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse('cancel_reservation', args=[reservation.pk]))
+        self.assertIn('09:00', self.client.get(url, {'date': self.tomorrow.isoformat()}).json()['free'])
+
+    def test_waiters_reuse_the_value_computed_by_the_lock_holder(self):
+        pair = (self.court.id, self.tomorrow)
+        key = occupancy_key(*pair, occupancy_versions([pair])[pair])
+        cache.add(f'{key}:lock', 1)
+        timer = threading.Timer(0.05, cache.set, args=(key, (0, 0b101)))
+        timer.start()
+        try:
+            with self.assertNumQueries(0):
+                bitmaps = cached_occupancy([self.court.id], [self.tomorrow], {self.court.id: 0})
+        finally:
+            timer.join()
+        self.assertEqual(mask_hours(bitmaps[pair]), [7, 9])
+
+    def test_warm_up_command_precomputes_upcoming_days(self):
+        directory = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(self.settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory}}))
+        get_catalog()
+        call_command('warm_availability_cache', days=14, stdout=StringIO())
+        today = timezone.localtime(timezone.now()).date()
+        with self.assertNumQueries(1):
+            cached_occupancy([self.court.id, self.other_court.id], [today + datetime.timedelta(days=offset) for offset in range(14)])
+
+    def test_warm_up_command_refuses_a_per_process_cache(self):
+        with self.assertRaises(CommandError):
+            call_command('warm_availability_cache', stdout=StringIO())
+
+    def test_entries_older_than_the_availability_version_are_ignored(self):
+        cached_occupancy([self.court.id], [self.tomorrow])
+        # Another worker books and invalidates its own cache, not this one.
+        with mock.patch('reservations.booking.invalidate_occupancy'):
+            book_reservation(Reservation(user=self.user, court=self.court, date=self.tomorrow, start_time='09:00', end_time='09:59'))
+        self.assertEqual(mask_hours(cached_occupancy([self.court.id], [self.tomorrow])[(self.court.id, self.tomorrow)]), [9])
+        with self.assertNumQueries(1):
+            cached_occupancy([self.court.id], [self.tomorrow])
+
+    def test_deploy_check_warns_about_a_per_process_cache(self):
+        self.assertEqual([warning.id for warning in check_shared_cache(None)], ['reservations.W001'])
+        with self.settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': '/tmp/cache'}}):
+            self.assertEqual(check_shared_cache(None), [])
+
+
+class SignupVerificationTests(TestCase):
+
+    def setUp(self):
+        # Signups share the rate limit buckets of the test client's address.
+        cache.clear()
+
+    def sign_up(self):
+        self.client.post(reverse('signup'), {
+            'username': 'newbie', 'email': 'newbie@example.com', 'first_name': 'New', 'last_name': 'Player',
+            'password1': 'a-long-Passw0rd', 'password2': 'a-long-Passw0rd',
+        })
+        return re.search(r'\b\d{6}\b', OutboxEmail.objects.latest('id').text_body).group()
+
+    def test_flow_never_touches_the_session_table(self):
+        code = self.sign_up()
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('verify_email'))
+        self.assertEqual(response.context['user_email'], 'newbie@example.com')
+        with self.assertNumQueries(1):
+            response = self.client.post(reverse('verify_email'), {'code': code})
+        self.assertRedirects(response, reverse('login'), fetch_redirect_response=False)
+        self.assertTrue(User.objects.get(username='newbie').is_active)
+        self.assertFalse(Session.objects.exists())
+
+    def test_wrong_code_is_rejected(self):
+        self.sign_up()
+        response = self.client.post(reverse('verify_email'), {'code': '000000'})
+        self.assertContains(response, 'Invalid code')
+        self.assertFalse(User.objects.get(username='newbie').is_active)
+
+    def test_expired_code_is_rejected(self):
+        code = self.sign_up()
+        later = time.time() + VERIFICATION_CODE_MAX_AGE + 1
+        with mock.patch('django.core.signing.time.time', return_value=later):
+            response = self.client.post(reverse('verify_email'), {'code': code})
+        self.assertContains(response, 'Code has expired')
+
+    def test_resend_replaces_the_code(self):
+        with mock.patch('reservations.views.generate_code', side_effect=['111111', '222222']):
+            self.sign_up()
+            self.client.get(reverse('resend_code'))
+        self.assertContains(self.client.post(reverse('verify_email'), {'code': '111111'}), 'Invalid code')
+        self.client.post(reverse('verify_email'), {'code': '222222'})
+        self.assertTrue(User.objects.get(username='newbie').is_active)
+
+    def test_tampered_or_missing_token_restarts_signup(self):
+        self.client.cookies[VERIFICATION_COOKIE] = 'forged'
+        self.assertRedirects(self.client.get(reverse('verify_email')), reverse('signup'))
+        del self.client.cookies[VERIFICATION_COOKIE]
+        self.assertRedirects(self.client.get(reverse('resend_code')), reverse('signup'))
+
+
+class CoalescingSessionStoreTests(TestCase):
+
+    def test_unchanged_session_is_not_written(self):
+        store = SessionStore()
+        store['cart'] = [1, 2]
+        store.save(must_create=True)
+
+        reloaded = SessionStore(store.session_key)
+        reloaded['cart'] = [1, 2]
+        with self.assertNumQueries(0):
+            reloaded.save()
+
+        reloaded['cart'].append(3)
+        reloaded.modified = True
+        reloaded.save()
+        self.assertEqual(SessionStore(store.session_key)['cart'], [1, 2, 3])
+
+
+class CountingEmailBackend(EmailBackend):
+    """
+    Locmem backend that counts how many connections are created.
+    """
+    created = 0
+
+    def __init__(self, *args, **kwargs):
+        CountingEmailBackend.created += 1
+        super().__init__(*args, **kwargs)
+
+
+@override_settings(EMAIL_BACKEND='reservations.tests.CountingEmailBackend')
+class ReminderCommandTests(ReservationTestCase):
+
+    def setUp(self):
+        super().setUp()
+        CountingEmailBackend.created = 0
+        self.now = timezone.localtime(timezone.now()).replace(hour=10, minute=30, second=0, microsecond=0)
+        self.today = self.now.date()
+
+    def test_only_upcoming_confirmed_reservations_are_due(self):
+        due = self.reserve('11:00', '11:59', date=self.today)
+        self.reserve('10:00', '10:59', date=self.today)
+        self.reserve('12:00', '12:59', date=self.today, status='cancelled')
+        tomorrow_due = self.reserve('10:00', '10:59', date=self.today + datetime.timedelta(days=1))
+        self.reserve('11:00', '11:59', date=self.today + datetime.timedelta(days=1))
+        self.assertEqual(list(due_reminders(24, now=self.now)), [due, tomorrow_due])
+
+    def test_reminders_are_chunked_and_idempotent(self):
+        for hour in range(11, 23):
+            self.reserve(f'{hour:02}:00', f'{hour:02}:59', date=self.today + datetime.timedelta(days=1))
+
+        with mock.patch('django.utils.timezone.now', return_value=self.now + datetime.timedelta(minutes=1)):
+            call_command('send_reminders', hours=48, chunk_size=5, stdout=StringIO())
+            self.assertEqual(len(mail.outbox), 12)
+            self.assertEqual(CountingEmailBackend.created, 3)
+            self.assertEqual(ReservationReminder.objects.count(), 12)
+
+            call_command('send_reminders', hours=48, chunk_size=5, stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 12)
+        self.assertEqual(mail.outbox[0].subject, 'Reminder: Upcoming Reservation')
+        self.assertIn(self.location.name, mail.outbox[0].body)
+
+    def test_failed_send_releases_only_unsent_reminders(self):
+        for hour in range(11, 16):
+            self.reserve(f'{hour:02}:00', f'{hour:02}:59', date=self.today + datetime.timedelta(days=1))
+        send_messages = EmailBackend.send_messages
+
+        def flaky_send(backend, messages):
+            if len(mail.outbox) == 2:
+                raise ConnectionResetError('relay went away')
+            return send_messages(backend, messages)
+
+        with mock.patch('django.utils.timezone.now', return_value=self.now + datetime.timedelta(minutes=1)):
+            with mock.patch.object(EmailBackend, 'send_messages', flaky_send):
+                with self.assertRaises(ConnectionResetError):
+                    call_command('send_reminders', hours=48, stdout=StringIO())
+            self.assertEqual(ReservationReminder.objects.count(), 2)
+
+            call_command('send_reminders', hours=48, stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(len({message.body for message in mail.outbox}), 5)
+
+    def test_unreachable_relay_releases_the_claimed_chunk(self):
+        self.reserve('11:00', '11:59', date=self.today + datetime.timedelta(days=1))
+        with mock.patch('django.utils.timezone.now', return_value=self.now + datetime.timedelta(minutes=1)):
+            with mock.patch.object(EmailBackend, 'open', side_effect=ConnectionRefusedError('Connection refused')):
+                with self.assertRaises(ConnectionRefusedError):
+                    call_command('send_reminders', hours=48, stdout=StringIO())
+            self.assertFalse(ReservationReminder.objects.exists())
+
+            stdout = StringIO()
+            call_command('send_reminders', hours=48, stdout=stdout)
+        self.assertIn('Sent 1 reminders.', stdout.getvalue())
+        self.assertEqual(len(mail.outbox), 1)
+
+
+class AsyncReadViewTests(ReservationTestCase):
+
+    async def test_reservations_list_is_served_under_asgi(self):
+        reservation = await Reservation.objects.acreate(
+            user=self.user, court=self.court, date=self.tomorrow, start_time='18:00', end_time='18:59',
+        )
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('reservations_list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['upcoming_reservations'], [reservation])
+
+    async def test_anonymous_user_is_redirected_to_login(self):
+        response = await self.async_client.get(reverse('cancelled_reservations'))
+        self.assertRedirects(response, '/login/?next=' + reverse('cancelled_reservations'), fetch_redirect_response=False)
+
+    async def test_locations_list_renders_logged_in_user(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('locations_list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['user'], self.user)
+        self.assertEqual([location.name for location in response.context['locations']], [self.location.name])
+
+
+class BenchAsgiCommandTests(TransactionTestCase):
+
+    def test_bench_compares_both_handlers(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'bench.json')
+            call_command(
+                'bench_asgi', use_current_db=True, locations=1, courts_per_location=2, users=3, years=0.05,
+                concurrency=4, requests=8, output=output, stdout=StringIO(),
+            )
+            with open(output) as results_file:
+                results = json.load(results_file)
+
+        self.assertEqual(set(results['results']), {'reservations_list', 'past_reservations', 'cancelled_reservations', 'locations_list'})
+        for handlers in results['results'].values():
+            for handler in ('wsgi', 'asgi'):
+                self.assertEqual(handlers[handler]['requests'], 8)
+                self.assertEqual(handlers[handler]['errors'], 0)
+
+
+def jpeg_upload(name='club.jpg', size=(1600, 900)):
+    buffer = BytesIO()
+    Image.new('RGB', size, 'green').save(buffer, 'JPEG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+
+class LocationRenditionTests(ReservationTestCase):
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root.name))
+
+    def test_saving_an_image_generates_renditions(self):
+        self.location.image = jpeg_upload()
+        self.location.save()
+
+        self.location.refresh_from_db()
+        self.assertEqual(self.location.image_renditions, {'source': self.location.image.name, 'widths': [320, 640, 1024]})
+        storage = self.location.image.storage
+        with Image.open(storage.path(rendition_name(self.location.image.name, 640, 'webp'))) as rendition:
+            self.assertEqual((rendition.format, rendition.size), ('WEBP', (640, 360)))
+        self.assertIn('-320w.webp 320w', self.location.image_webp_srcset)
+        self.assertTrue(self.location.image_src.endswith('-1024w.jpg'))
+
+    def test_replacing_the_image_deletes_old_renditions(self):
+        self.location.image = jpeg_upload('old.jpg')
+        self.location.save()
+        old_name = self.location.image.name
+
+        self.location.image = jpeg_upload('new.jpg', size=(200, 100))
+        self.location.save()
+        storage = self.location.image.storage
+        self.assertFalse(storage.exists(rendition_name(old_name, 320, 'jpeg')))
+        self.assertEqual(self.location.image_renditions['widths'], [200])
+
+    def test_locations_page_uses_lazy_srcset(self):
+        self.location.image = jpeg_upload()
+        self.location.save()
+
+        response = self.client.get(reverse('locations_list'))
+        self.assertContains(response, 'type="image/webp" srcset=')
+        self.assertContains(response, 'loading="lazy"')
+
+    def test_backfill_generates_missing_renditions(self):
+        self.location.image = jpeg_upload()
+        self.location.save()
+        Location.objects.update(image_renditions={})
+
+        stdout = StringIO()
+        call_command('generate_location_renditions', stdout=stdout)
+        self.location.refresh_from_db()
+        self.assertTrue(self.location.has_current_renditions())
+        self.assertIn('Generated renditions for 1 locations', stdout.getvalue())
+
+
+class StaticFilesTests(TestCase):
+
+    def setUp(self):
+        static_root = tempfile.TemporaryDirectory()
+        self.addCleanup(static_root.cleanup)
+        self.enterContext(override_settings(STATIC_ROOT=static_root.name))
+        call_command('collectstatic', interactive=False, verbosity=0)
+        self.hashed_name = staticfiles_storage.stored_name('styles.css')
+        with open(finders.find('styles.css'), 'rb') as source:
+            self.source = source.read()
+
+    def test_collectstatic_writes_hashed_gzip_siblings(self):
+        self.assertRegex(self.hashed_name, r'^styles\.[0-9a-f]{12}\.css$')
+        with staticfiles_storage.open(f'{self.hashed_name}.gz') as compressed:
+            self.assertEqual(gzip.decompress(compressed.read()), self.source)
+        self.assertFalse(staticfiles_storage.exists('images/logo.jpg.gz'))
+
+    def test_hashed_asset_is_served_compressed_and_immutable(self):
+        response = Client().get(f'/static/{self.hashed_name}', HTTP_ACCEPT_ENCODING='br, gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), self.source)
+
+    def test_identity_encoding_and_revalidation(self):
+        response = Client().get('/static/styles.css', HTTP_ACCEPT_ENCODING='gzip;q=0, deflate')
+        self.assertNotIn('Content-Encoding', response)
+        self.assertEqual(response['Cache-Control'], 'public, max-age=60')
+        self.assertEqual(b''.join(response.streaming_content), self.source)
+
+        response = Client().get('/static/styles.css', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_pages_reference_hashed_names(self):
+        response = Client().get(reverse('home'))
+        self.assertContains(response, f'/static/{self.hashed_name}')
+
+
+class FragmentCacheTests(ReservationTestCase):
+
+    def test_anonymous_landing_pages_cost_no_queries_when_warm(self):
+        self.client.get(reverse('home'))
+        self.client.get(reverse('locations_list'))
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(reverse('home')).status_code, 200)
+            self.assertEqual(self.client.get(reverse('locations_list')).status_code, 200)
+
+    def test_locations_fragment_is_invalidated_by_signals(self):
+        self.assertContains(self.client.get(reverse('locations_list')), 'Club Norte')
+
+        Location.objects.filter(pk=self.location.pk).update(name='Club Sur')
+        self.assertContains(self.client.get(reverse('locations_list')), 'Club Norte')
+
+        self.location.name = 'Club Sur'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.location.save()
+        response = self.client.get(reverse('locations_list'))
+        self.assertContains(response, 'Club Sur')
+        self.assertNotContains(response, 'Club Norte')
+
+    def test_navbar_varies_by_authentication(self):
+        self.assertContains(self.client.get(reverse('home')), reverse('signup'))
+
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, self.user.username)
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        self.assertNotContains(response, reverse('signup'))
+
+
+class ReplicaRoutingTests(ReservationTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+        self.decisions = []
+        use_replica = PrimaryReplicaRouter.use_replica
+
+        def record(router):
+            self.decisions.append(use_replica(router))
+            return self.decisions[-1]
+
+        # The test database has no replica alias, so "replica" reads go to default.
+        self.enterContext(mock.patch.object(PrimaryReplicaRouter, 'replica_alias', 'default'))
+        self.enterContext(mock.patch.object(PrimaryReplicaRouter, 'use_replica', record))
+
+    def test_listing_views_read_from_the_replica(self):
+        self.client.get(reverse('reservations_list'))
+        self.assertTrue(self.decisions)
+        self.assertTrue(all(self.decisions))
+
+        self.decisions.clear()
+        self.client.get(reverse('my_account'))
+        self.assertFalse(any(self.decisions))
+
+    def test_writes_pin_later_reads_to_the_primary(self):
+        response = self.client.post(reverse('new_reservation'), {
+            'court': self.court.id, 'date': self.tomorrow.isoformat(), 'start_time': '18:00', 'end_time': '19:00',
+        })
+        self.assertIn(PRIMARY_PIN_COOKIE, response.cookies)
+
+        self.assertEqual(response.cookies[PRIMARY_PIN_COOKIE]['max-age'], settings.REPLICA_PIN_SECONDS)
+
+        self.decisions.clear()
+        response = self.client.get(reverse('reservations_list'))
+        self.assertTrue(self.decisions)
+        self.assertFalse(any(self.decisions))
+        self.assertEqual(len(response.context['upcoming_reservations']), 1)
+
+    def test_logging_in_does_not_pin_reads_to_the_primary(self):
+        self.client.logout()
+        response = self.client.post(reverse('login'), {'username': 'player', 'password': 'secret-pass-123'})
+        self.assertRedirects(response, reverse('reservations_list'), fetch_redirect_response=False)
+        self.assertNotIn(PRIMARY_PIN_COOKIE, response.cookies)
+
+        self.decisions.clear()
+        self.client.get(reverse('reservations_list'))
+        self.assertTrue(self.decisions)
+        self.assertTrue(all(self.decisions))
+
+    def test_catalog_always_loads_from_the_primary(self):
+        token = start_routing(RequestFactory().get('/'))
+        self.addCleanup(finish_routing, token)
+        current_routing().replica = True
+        with mock.patch.object(PrimaryReplicaRouter, 'replica_alias', 'lagging'), \
+                mock.patch.object(PrimaryReplicaRouter, 'replica_ready', lambda router: True):
+            self.assertEqual(Location.objects.all().db, 'lagging')
+            self.assertEqual(catalog_rows().db, DEFAULT_DB_ALIAS)
+
+    def test_sync_replica_copies_the_database(self):
+        with tempfile.TemporaryDirectory() as directory:
+            primary, replica = os.path.join(directory, 'primary.sqlite3'), os.path.join(directory, 'replica.sqlite3')
+            with closing(sqlite3.connect(primary)) as source:
+                source.execute('CREATE TABLE booking (id INTEGER PRIMARY KEY)')
+                source.execute('INSERT INTO booking DEFAULT VALUES')
+                source.commit()
+
+            SyncReplicaCommand().copy(primary, replica)
+            with closing(sqlite3.connect(replica)) as target:
+                self.assertEqual(target.execute('SELECT COUNT(*) FROM booking').fetchone(), (1,))
+
+        # Tests either have no replica or one mirroring the primary; both are refused.
+        with self.assertRaises(CommandError):
+            call_command('sync_replica', stdout=StringIO())
+
+
+class SQLiteTuningTests(TransactionTestCase):
+
+    def test_new_connections_apply_the_configured_pragmas(self):
+        with override_settings(SQLITE_PRAGMAS={'busy_timeout': 1234, 'synchronous': 'normal', 'cache_size': -1000}):
+            new_connection = connections.create_connection(DEFAULT_DB_ALIAS)
+            new_connection.ensure_connection()
+            self.addCleanup(new_connection.connection.close)
+            with new_connection.cursor() as cursor:
+                self.assertEqual(cursor.execute('PRAGMA busy_timeout').fetchone(), (1234,))
+                self.assertEqual(cursor.execute('PRAGMA synchronous').fetchone(), (1,))
+                self.assertEqual(cursor.execute('PRAGMA cache_size').fetchone(), (-1000,))
+
+    def test_write_benchmark_reports_every_configuration(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'bench.json')
+            call_command(
+                'bench_sqlite_writes', use_current_db=True, writers=4, readers=1, bookings=20, output=output, stdout=StringIO(),
+            )
+            with open(output) as results_file:
+                results = json.load(results_file)['results']
+
+        self.assertEqual(set(results), {'stock', 'no-wait', 'tuned'})
+        for result in results.values():
+            self.assertEqual(result['bookings'] + result['locked_errors'] + result['other_errors'], 20)
+            self.assertGreater(result['bookings'], 0)
+
+    def test_write_benchmark_lock_timeouts(self):
+        def busy_timeout(command, *args):
+            new_connection = connections.create_connection(DEFAULT_DB_ALIAS)
+            new_connection.ensure_connection()
+            try:
+                with new_connection.cursor() as cursor:
+                    return cursor.execute('PRAGMA busy_timeout').fetchone()[0]
+            finally:
+                new_connection.connection.close()
+
+        with mock.patch.object(BenchSqliteWritesCommand, 'drive', autospec=True, side_effect=busy_timeout):
+            timeouts = {name: BenchSqliteWritesCommand().run(configuration, {'writers': 1}) for name, configuration in SQLITE_BENCH_CONFIGURATIONS.items()}
+        self.assertEqual(timeouts, {'stock': 5000, 'no-wait': 0, 'tuned': settings.SQLITE_PRAGMAS['busy_timeout']})
+        self.assertNotIn('timeout', connection.settings_dict['OPTIONS'])
+
+
+class ReservationAdminTests(ReservationTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'secret-pass-123')
+        self.client.force_login(self.admin)
+
+    def changelist_queries(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('admin:reservations_reservation_changelist'), params)
+        self.assertEqual(response.status_code, 200)
+        return [query['sql'] for query in queries.captured_queries]
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        for hour in range(7, 10):
+            self.reserve(f'{hour:02}:00', f'{hour:02}:59')
+        few = len(self.changelist_queries())
+        for hour in range(10, 23):
+            self.reserve(f'{hour:02}:00', f'{hour:02}:59', court=self.other_court)
+        statements = self.changelist_queries(status__exact='confirmed')
+
+        self.assertEqual(len(statements), few)
+        counts = [sql for sql in statements if 'COUNT(' in sql and 'reservations_reservation' in sql]
+        self.assertTrue(counts)
+        self.assertTrue(all('LIMIT' in sql for sql in counts))
+
+    def test_paginator_estimates_beyond_the_exact_limit(self):
+        for hour in range(7, 17):
+            self.reserve(f'{hour:02}:00', f'{hour:02}:59')
+        paginator = EstimatedCountPaginator(Reservation.objects.order_by('-id'), 2)
+        paginator.exact_count_limit = 3
+        self.assertGreaterEqual(paginator.count, 10)
+
+        filtered = EstimatedCountPaginator(Reservation.objects.filter(status='confirmed').order_by('-id'), 2)
+        filtered.exact_count_limit = 3
+        self.assertEqual(filtered.count, 4)
+
+    def test_admin_bookings_claim_and_release_slots(self):
+        response = self.client.post(reverse('admin:reservations_reservation_add'), {
+            'user': self.user.id, 'court': self.court.id, 'date': self.tomorrow.isoformat(),
+            'start_time': '18:00', 'end_time': '19:00', 'status': 'confirmed',
+        })
+        self.assertEqual(response.status_code, 302)
+        reservation = Reservation.objects.get()
+        self.assertEqual(list(reservation.slots.values_list('hour', flat=True)), [18])
+
+        response = self.client.post(reverse('admin:reservations_reservation_add'), {
+            'user': self.user.id, 'court': self.court.id, 'date': self.tomorrow.isoformat(),
+            'start_time': '17:00', 'end_time': '19:00', 'status': 'confirmed',
+        })
+        self.assertContains(response, 'Court is already booked for this time.')
+
+        self.client.post(reverse('admin:reservations_reservation_change', args=[reservation.id]), {'status': 'cancelled'})
+        reservation.refresh_from_db()
+        self.assertEqual(reservation.status, 'cancelled')
+        self.assertFalse(reservation.slots.exists())
+
+    def add(self, start_time, end_time, status='confirmed'):
+        return self.client.post(reverse('admin:reservations_reservation_add'), {
+            'user': self.user.id, 'court': self.court.id, 'date': self.tomorrow.isoformat(),
+            'start_time': start_time, 'end_time': end_time, 'status': status,
+        })
+
+    def test_admin_rejects_reservations_ending_before_they_start(self):
+        response = self.add('18:00', '10:00')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Reservation.objects.exists())
+
+    def test_cancelled_admin_adds_claim_nothing(self):
+        self.assertEqual(self.add('18:00', '19:00', status='cancelled').status_code, 302)
+        self.assertFalse(ReservationSlot.objects.exists())
+        self.assertFalse(CourtDayOccupancy.objects.exclude(hours_mask=0).exists())
+
+        self.assertEqual(self.add('18:00', '19:00').status_code, 302)
+        self.assertEqual(Reservation.objects.filter(status='confirmed').count(), 1)
+
+    def test_slot_claimed_after_validation_is_reported(self):
+        with mock.patch('reservations.admin.is_available', return_value=True):
+            self.add('18:00', '19:00')
+            response = self.add('18:00', '19:00')
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Reservation.objects.count(), 1)
+        messages = [str(message) for message in response.wsgi_request._messages]
+        self.assertIn('Court is already booked for this time.', messages)
+
+
+class OccupancyRollupTests(ReservationTestCase):
+
+    def book(self, start_time, end_time, court=None, date=None):
+        reservation = Reservation(
+            user=self.user, court=court or self.court, date=date or self.tomorrow,
+            start_time=start_time, end_time=end_time,
+        )
+        book_reservation(reservation)
+        return reservation
+
+    def rollup(self):
+        return dict(((row.court_id, row.date), row.hours_mask) for row in CourtDayOccupancy.objects.all())
+
+    def test_booking_and_cancelling_update_the_rollup(self):
+        self.book('07:00', '08:00')
+        evening = self.book('18:00', '20:00')
+        self.assertEqual(self.rollup(), {(self.court.id, self.tomorrow): hours_mask([7, 18, 19])})
+
+        cancel_booking(evening)
+        self.assertEqual(self.rollup(), {(self.court.id, self.tomorrow): hours_mask([7])})
+
+    def test_second_cancel_of_the_same_reservation_releases_nothing(self):
+        first = self.book('18:00', '18:59')
+        second = Reservation.objects.get(pk=first.pk)
+        self.assertTrue(cancel_booking(first))
+        rebooked = self.book('18:00', '18:59')
+
+        self.assertFalse(cancel_booking(second))
+        self.assertEqual(self.rollup(), {(self.court.id, self.tomorrow): hours_mask([18])})
+        self.assertEqual(list(rebooked.slots.values_list('hour', flat=True)), [18])
+
+    def test_rebuild_matches_incremental_rollup(self):
+        self.book('07:00', '09:00')
+        self.book('10:00', '10:59', court=self.other_court)
+        cancel_booking(self.book('12:00', '13:00', date=self.tomorrow + datetime.timedelta(days=1)))
+        incremental = self.rollup()
+
+        CourtDayOccupancy.objects.update(hours_mask=0)
+        call_command('rebuild_occupancy_rollup', stdout=StringIO())
+        self.assertEqual(
+            self.rollup(),
+            {key: mask for key, mask in incremental.items() if mask},
+        )
+
+    def test_report_is_staff_only(self):
+        url = reverse('utilization_report', args=[self.location.id])
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+    def test_report_reads_only_the_rollup(self):
+        self.book('18:00', '18:59', date=self.tomorrow)
+        staff = User.objects.create_user('staff', 'staff@example.com', 'secret-pass-123', is_staff=True)
+        self.client.force_login(staff)
+        url = reverse('utilization_report', args=[self.location.id])
+        params = {'start': self.tomorrow.isoformat(), 'end': (self.tomorrow + datetime.timedelta(days=1)).isoformat()}
+        get_catalog()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        statements = [query['sql'] for query in queries.captured_queries]
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['court_rows'][0]['cells'][SLOT_HOURS.index(18)]['percent'], 50)
+        self.assertEqual(response.context['court_rows'][1]['total'], 0)
+        self.assertEqual(len([sql for sql in statements if 'reservations_courtdayoccupancy' in sql]), 1)
+        self.assertFalse([sql for sql in statements if 'reservations_reservation' in sql])
+
+        self.assertEqual(self.client.get(url, {'start': 'soon'}).status_code, 400)
+
+
+class ReservationArchiveTests(ReservationTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.today = timezone.localtime(timezone.now()).date()
+
+    def book_past(self, days_ago, hour, status='confirmed'):
+        reservation = Reservation(
+            user=self.user, court=self.court, date=self.today - datetime.timedelta(days=days_ago),
+            start_time=f'{hour:02}:00', end_time=f'{hour:02}:59',
+        )
+        book_reservation(reservation)
+        if status == 'cancelled':
+            cancel_booking(reservation)
+        return reservation
+
+    def test_archive_moves_old_reservations_in_batches(self):
+        old = [self.book_past(100 + index, 9) for index in range(5)]
+        recent = self.book_past(10, 9)
+        output = StringIO()
+        call_command('archive_reservations', days=30, batch_size=2, stdout=output)
+
+        self.assertEqual(list(Reservation.objects.values_list('id', flat=True)), [recent.id])
+        self.assertEqual(
+            sorted(ArchivedReservation.objects.values_list('id', flat=True)),
+            [reservation.id for reservation in old],
+        )
+        self.assertFalse(ReservationSlot.objects.filter(reservation__in=[reservation.id for reservation in old]).exists())
+        self.assertIn('Archived 5 reservations', output.getvalue())
+
+        call_command('archive_reservations', days=30, stdout=output)
+        self.assertEqual(ArchivedReservation.objects.count(), 5)
+
+    def test_archive_batch_queries_do_not_grow_with_rows(self):
+        def batch_queries(rows):
+            for index in range(rows):
+                self.book_past(100 + index, 9)
+            version = Location.objects.get(pk=self.location.pk).availability_version
+            with CaptureQueriesContext(connection) as queries:
+                call_command('archive_reservations', days=30, batch_size=100, stdout=StringIO())
+            self.assertEqual(Location.objects.get(pk=self.location.pk).availability_version, version)
+            return len(queries)
+
+        self.assertEqual(batch_queries(5), batch_queries(50))
+
+    def test_history_pages_span_both_tables(self):
+        for index in range(PAGE_SIZE + 5):
+            self.book_past(index + 1, 9 + index % 2)
+        cancelled = [self.book_past(days_ago, 12, status='cancelled') for days_ago in (3, 200)]
+        expected = list(
+            Reservation.objects.filter(status='confirmed').order_by('-date', '-start_time', '-id').values_list('id', flat=True)
+        )
+        call_command('archive_reservations', days=PAGE_SIZE // 2, stdout=StringIO())
+        self.assertTrue(ArchivedReservation.objects.exists())
+        self.assertTrue(Reservation.objects.exists())
+
+        self.client.force_login(self.user)
+        seen, cursor = [], None
+        while True:
+            response = self.client.get(reverse('past_reservations'), {'after': cursor} if cursor else {})
+            seen.extend(reservation.pk for reservation in response.context['past_reservations'])
+            cursor = response.context['next_cursor']
+            if not cursor:
+                break
+        self.assertEqual(seen, expected)
+
+        response = self.client.get(reverse('cancelled_reservations'))
+        self.assertEqual([reservation.pk for reservation in response.context['cancelled_reservations']], [cancelled[0].id, cancelled[1].id])
+
+    def test_archive_changelist_joins_court_location_and_user(self):
+        for index in range(6):
+            self.book_past(100 + index, 9)
+        call_command('archive_reservations', days=30, stdout=StringIO())
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'secret-pass-123'))
+        url = reverse('admin:reservations_archivedreservation_changelist')
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(url)
+        for index in range(6):
+            self.book_past(200 + index, 10)
+        call_command('archive_reservations', days=30, stdout=StringIO())
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get(url)
+        self.assertContains(response, self.location.name)
+        self.assertEqual(len(many), len(few))
+
+    def test_rollup_rebuild_keeps_archived_days(self):
+        self.book_past(100, 9)
+        call_command('archive_reservations', days=30, stdout=StringIO())
+        CourtDayOccupancy.objects.all().delete()
+        call_command('rebuild_occupancy_rollup', stdout=StringIO())
+        self.assertEqual(
+            list(CourtDayOccupancy.objects.values_list('date', 'hours_mask')),
+            [(self.today - datetime.timedelta(days=100), hours_mask([9]))],
+        )
+
+
+class ReservationExportTests(ReservationTestCase):
+
+    def feed_url(self, user=None):
+        return reverse('calendar_feed', args=[calendar_token(user or self.user)])
+
+    def test_calendar_feed_lists_confirmed_reservations(self):
+        booked = self.reserve('18:00', '19:59')
+        self.reserve('10:00', '10:59', status='cancelled')
+        self.reserve('12:00', '12:59', user=User.objects.create_user('other', 'other@example.com', 'secret-pass-123'))
+
+        response = self.client.get(self.feed_url())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/calendar; charset=utf-8')
+        body = b''.join(response.streaming_content).decode()
+        self.assertTrue(body.startswith('BEGIN:VCALENDAR\r\n'))
+        self.assertTrue(body.endswith('END:VCALENDAR\r\n'))
+        self.assertEqual(body.count('BEGIN:VEVENT'), 1)
+        self.assertIn(f'UID:reservation-{booked.id}@testserver', body)
+        start = timezone.make_aware(datetime.datetime.combine(self.tomorrow, datetime.time(18)))
+        self.assertIn(f"DTSTART:{start.astimezone(datetime.timezone.utc):%Y%m%dT%H%M%SZ}", body)
+        self.assertIn(f"DTEND:{(start + datetime.timedelta(hours=2)).astimezone(datetime.timezone.utc):%Y%m%dT%H%M%SZ}", body)
+        self.assertTrue(all(len(line.encode()) <= 75 for line in body.split('\r\n')))
+
+    def test_calendar_feed_honours_if_modified_since(self):
+        reservation = self.reserve('18:00', '18:59')
+        last_modified = self.client.get(self.feed_url())['Last-Modified']
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.feed_url(), HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(queries), 2)
+
+        Reservation.objects.filter(pk=reservation.pk).update(updated_at=timezone.now() + datetime.timedelta(seconds=5))
+        self.assertEqual(self.client.get(self.feed_url(), HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 200)
+
+    def test_archiving_a_reservation_changes_the_calendar_feed(self):
+        self.reserve('18:00', '18:59')
+        old = self.reserve('10:00', '10:59', date=self.tomorrow - datetime.timedelta(days=400))
+        Reservation.objects.update(updated_at=timezone.now() - datetime.timedelta(days=1))
+        last_modified = self.client.get(self.feed_url())['Last-Modified']
+
+        call_command('archive_reservations', days=365, stdout=StringIO())
+        self.assertFalse(Reservation.objects.filter(pk=old.pk).exists())
+        self.assertEqual(self.client.get(self.feed_url(), HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 200)
+
+    def test_calendar_feed_rejects_forged_tokens(self):
+        self.assertEqual(self.client.get(reverse('calendar_feed', args=[f'{self.user.pk}:forged'])).status_code, 404)
+
+    def test_csv_export_streams_hot_and_archived_rows_for_staff(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('reservations_export')).status_code, 302)
+
+        archived = self.reserve('09:00', '09:59', date=self.tomorrow - datetime.timedelta(days=400))
+        call_command('archive_reservations', days=30, stdout=StringIO())
+        hot = self.reserve('18:00', '18:59')
+        self.reserve('10:00', '10:59', status='cancelled')
+        staff = User.objects.create_user('staff', 'staff@example.com', 'secret-pass-123', is_staff=True)
+        self.client.force_login(staff)
+
+        response = self.client.get(reverse('reservations_export'), {'status': 'confirmed'})
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="reservations.csv"')
+        rows = list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(rows[0], CSV_HEADER)
+        self.assertEqual([int(row[0]) for row in rows[1:]], [archived.id, hot.id])
+        self.assertEqual(rows[2][5:], [self.location.name, self.court.name, 'player', 'player@example.com'])
+
+        self.assertEqual(self.client.get(reverse('reservations_export'), {'start': 'yesterday'}).status_code, 400)
+
+    def test_my_account_shows_the_feed_address(self):
+        self.client.force_login(self.user)
+        self.assertContains(self.client.get(reverse('my_account')), f'http://testserver{self.feed_url()}')
+
+
+class ImportDataCommandTests(ReservationTestCase):
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def reservation_rows(self, rows):
+        return ''.join(json.dumps({
+            'username': 'player', 'location': self.location.name, 'court': court,
+            'date': self.tomorrow.isoformat(), 'start_time': start, 'end_time': end,
+        }) + '\n' for court, start, end in rows)
+
+    def import_data(self, *args, **options):
+        output = StringIO()
+        call_command('import_data', *args, stdout=output, **options)
+        return output.getvalue()
+
+    def test_imports_locations_and_courts_from_csv(self):
+        locations = self.write('locations.csv', (
+            'name,city,state,address,zip_code,phone_number\n'
+            'Club Sur,Monterrey,NL,Calle 2,64001,8180000001\n'
+            f'{self.location.name},Monterrey,NL,Calle 3,64002,8180000002\n'
+            'Club Este,Monterrey,NL,Calle 4,not-a-zip,8180000003\n'
+        ))
+        output = self.import_data('locations', locations)
+        self.assertIn('Imported 1 locations and rejected 2 of 3 rows', output)
+        self.assertTrue(Location.objects.filter(name='Club Sur', zip_code=64001).exists())
+        with open(f'{locations}.rejects.jsonl', encoding='utf-8') as rejects:
+            self.assertEqual([json.loads(line)['row'] for line in rejects], [2, 3])
+
+        courts = self.write('courts.csv', 'location,name\nClub Sur,Court A\nClub Sur,Court A\nNowhere,Court B\n')
+        self.import_data('courts', courts)
+        self.assertEqual(list(Court.objects.filter(location__name='Club Sur').values_list('name', flat=True)), ['Court A'])
+        self.assertIn('Club Sur', [location.name for location in get_catalog().locations])
+
+    def test_reservations_claim_slots_and_reject_invalid_rows(self):
+        self.reserve('07:00', '08:00')
+        ReservationSlot.objects.create(reservation=Reservation.objects.get(), court=self.court, date=self.tomorrow, hour=7)
+        path = self.write('reservations.jsonl', self.reservation_rows([
+            ('Court 1', '18:00', '20:00'),
+            ('Court 1', '19:00', '20:00'),
+            ('Court 1', '07:00', '08:00'),
+            ('Court 1', '18:30', '19:00'),
+            ('Court 9', '10:00', '11:00'),
+            ('Court 2', '10:00', '10:00'),
+            ('Court 2', '10:00', '12:00'),
+        ]) + 'not json\n')
+
+        with CaptureQueriesContext(connection) as queries:
+            output = self.import_data('reservations', path, batch_size=100)
+        self.assertLess(len(queries), 20)
+        self.assertIn('Imported 2 reservations and rejected 6 of 8 rows', output)
+
+        imported = Reservation.objects.exclude(start_time='07:00')
+        self.assertEqual(
+            sorted(imported.values_list('court__name', 'start_time', 'end_time')),
+            [('Court 1', '18:00', '20:00'), ('Court 2', '10:00', '12:00')],
+        )
+        self.assertEqual(
+            sorted(ReservationSlot.objects.filter(reservation__in=imported).values_list('hour', flat=True)),
+            [10, 11, 18, 19],
+        )
+        self.assertEqual(
+            CourtDayOccupancy.objects.get(court=self.other_court, date=self.tomorrow).hours_mask, hours_mask([10, 11]),
+        )
+
+    def test_interrupted_import_resumes_after_last_batch(self):
+        path = self.write('reservations.jsonl', self.reservation_rows(
+            [('Court 1', f'{hour:02}:00', f'{hour + 1:02}:00') for hour in range(7, 17)]
+        ))
+        original_save = ReservationImporter.save
+        calls = []
+
+        def failing_save(importer, entries):
+            calls.append(len(entries))
+            if len(calls) == 3:
+                raise OperationalError('disk I/O error')
+            return original_save(importer, entries)
+
+        with mock.patch.object(ReservationImporter, 'save', failing_save):
+            with self.assertRaises(OperationalError):
+                self.import_data('reservations', path, batch_size=3)
+        self.assertEqual(Reservation.objects.count(), 6)
+
+        output = self.import_data('reservations', path, batch_size=3)
+        self.assertIn('Resuming after row 6.', output)
+        self.assertEqual(Reservation.objects.count(), 10)
+        self.assertEqual(ReservationSlot.objects.count(), 10)
+
+        self.import_data('reservations', path, batch_size=3)
+        self.assertEqual(Reservation.objects.count(), 10)
+
+
+class RateLimitTests(ReservationTestCase):
+    LIMITS = {
+        'login': {'ip': ('1/h', 5), 'account': ('1/m', 2)},
+        'resend_code': {'account': ('6/h', 1)},
+    }
+
+    def setUp(self):
+        super().setUp()
+        self.enterContext(override_settings(RATE_LIMITS=self.LIMITS))
+
+    def log_in(self, username='player', address='10.0.0.1'):
+        return self.client.post(reverse('login'), {'username': username, 'password': 'wrong'}, REMOTE_ADDR=address)
+
+    def test_buckets_refill_at_their_rate(self):
+        identities = {'account': 'player'}
+        self.assertEqual(take_tokens('login', identities, now=1000), 0)
+        self.assertEqual(take_tokens('login', identities, now=1000), 0)
+        self.assertEqual(take_tokens('login', identities, now=1000), 60)
+        self.assertEqual(take_tokens('login', identities, now=1045), 15)
+        self.assertEqual(take_tokens('login', identities, now=1060), 0)
+        self.assertEqual(take_tokens('logout', identities, now=1060), 0)
+
+    def test_limited_login_returns_429_without_queries(self):
+        self.assertEqual(self.log_in().status_code, 200)
+        self.assertEqual(self.log_in('PLAYER ').status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.log_in()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '60')
+
+        self.assertEqual(self.log_in('someone-else').status_code, 200)
+        self.assertEqual(self.client.get(reverse('login'), REMOTE_ADDR='10.0.0.1').status_code, 200)
+        for username in ('a', 'b'):
+            self.log_in(username)
+        self.assertEqual(self.log_in('c').status_code, 429)
+        self.assertEqual(self.log_in('c', address='10.0.0.2').status_code, 200)
+
+        self.assertEqual(rate_limit_counters()['login'], {'allowed': 6, 'limited': 2})
+        output, errors = StringIO(), StringIO()
+        call_command('rate_limit_stats', reset=True, stdout=output, stderr=errors)
+        self.assertIn('login', output.getvalue())
+        self.assertIn('local to each process', errors.getvalue())
+        self.assertEqual(rate_limit_counters()['login'], {'allowed': 0, 'limited': 0})
+
+    def test_resend_code_is_limited_per_pending_account(self):
+        self.client.cookies[VERIFICATION_COOKIE] = make_verification_token(self.user, '123456')
+        self.assertRedirects(self.client.get(reverse('resend_code')), reverse('verify_email'), fetch_redirect_response=False)
+        outbox = OutboxEmail.objects.count()
+        response = self.client.get(reverse('resend_code'))
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(OutboxEmail.objects.count(), outbox)
+
+
+class MetricsTests(ReservationTestCase):
+
+    def setUp(self):
+        super().setUp()
+        registry.reset()
+        self.addCleanup(registry.reset)
+
+    def test_records_sql_and_template_time_per_view(self):
+        self.client.force_login(self.user)
+        self.reserve('18:00', '18:59')
+        response = self.client.get(reverse('reservations_list'))
+
+        server_timing = dict(
+            (part.split(';')[0].strip(), part) for part in response['Server-Timing'].split(',')
+        )
+        self.assertEqual(set(server_timing), {'app', 'db', 'tpl', 'email'})
+        stats = registry.snapshot()[0]['reservations_list']
+        self.assertEqual(stats['count'], 1)
+        self.assertGreater(stats['sql_queries'], 0)
+        self.assertIn(f'desc="{stats["sql_queries"]} queries"', server_timing['db'])
+        self.assertGreater(stats['template_seconds'], 0)
+        self.assertEqual(stats['statuses'], {'2xx': 1})
+
+    def test_records_email_helpers(self):
+        self.client.post(reverse('signup'), {
+            'username': 'newbie', 'email': 'newbie@example.com', 'first_name': 'New', 'last_name': 'Player',
+            'password1': 'a-long-Passw0rd', 'password2': 'a-long-Passw0rd',
+        })
+        views, emails = registry.snapshot()
+        self.assertEqual(emails['send_verification_email'][0], 1)
+        self.assertGreater(views['signup']['email_seconds'], 0)
+
+    @override_settings(METRICS_ALLOWED_IPS=['127.0.0.1'])
+    def test_metrics_endpoint_renders_histograms(self):
+        self.client.get(reverse('home'))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        body = response.content.decode()
+        self.assertIn('reservations_request_duration_seconds_bucket{view="home",le="+Inf"} 1', body)
+        self.assertIn('reservations_request_duration_seconds_count{view="home"} 1', body)
+        self.assertIn('reservations_sql_queries_total{view="home"}', body)
+        self.assertIn('reservations_rate_limit_requests_total{scope="login",outcome="limited"} 0', body)
+
+        self.assertEqual(self.client.get(reverse('metrics'), REMOTE_ADDR='203.0.113.9').status_code, 403)
+
+    def test_metrics_need_staff_or_an_allowed_address_by_default(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.client.force_login(User.objects.create_user('ops', 'ops@example.com', 'secret-pass-123', is_staff=True))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 200)
+
+    def test_aggregation_is_thread_safe(self):
+        timings = RequestTimings()
+        timings.sql_queries = 2
+
+        def observe():
+            for _ in range(2000):
+                registry.observe_request('stress', 200, 0.003, timings)
+
+        threads = [threading.Thread(target=observe) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stats = registry.snapshot()[0]['stress']
+        self.assertEqual(stats['count'], 16000)
+        self.assertEqual(stats['buckets'][0], 16000)
+        self.assertEqual(stats['sql_queries'], 32000)
@@ -1,8 +1,12 @@
 import random
 from django.conf import settings
+from django.core import signing
 from django.core.mail import EmailMultiAlternatives
+from django.utils.crypto import constant_time_compare, salted_hmac
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
+from .metrics import timed_email
+from .outbox import queue_email
 
 def generate_code():
     """
@@ -13,9 +17,72 @@ def generate_code():
     """
     return str(random.randint(100000, 999999))
 
+VERIFICATION_COOKIE = 'verification'
+VERIFICATION_SALT = 'reservations.verification'
+VERIFICATION_CODE_MAX_AGE = 3 * 60
+
+def verification_code_hash(user_id, code):
+    """
+    Returns a keyed hash of a verification code.
+
+    The hash is keyed with SECRET_KEY so that a token holder cannot recover
+    the code by brute-forcing the six digits offline.
+    """
+    return salted_hmac(VERIFICATION_SALT, f'{user_id}:{code}').hexdigest()[:32]
+
+def make_verification_token(user, code):
+    """
+    Builds a compact signed token holding the pending email verification.
+
+    The token replaces the code, user id and timestamp previously kept in the
+    session, so the signup flow does not write to the session table.
+
+    Args:
+        user (User): The user waiting for verification.
+        code (str): The verification code sent by email.
+
+    Returns:
+        str: The signed, timestamped token.
+    """
+    return signing.dumps(
+        {'u': user.id, 'e': user.email, 'h': verification_code_hash(user.id, code)},
+        salt=VERIFICATION_SALT,
+        compress=True,
+    )
+
+def read_verification_token(token, max_age=None):
+    """
+    Decodes a token produced by make_verification_token.
+
+    Args:
+        token (str): The signed token.
+        max_age (int, optional): Maximum token age in seconds.
+
+    Returns:
+        dict | None: The payload, or None if the token is missing or tampered with.
+
+    Raises:
+        signing.SignatureExpired: If the token is older than max_age.
+    """
+    if not token:
+        return None
+    try:
+        return signing.loads(token, salt=VERIFICATION_SALT, max_age=max_age)
+    except signing.SignatureExpired:
+        raise
+    except signing.BadSignature:
+        return None
+
+def check_verification_code(payload, code):
+    """
+    Checks a submitted code against the hash held in a verification token.
+    """
+    return constant_time_compare(payload['h'], verification_code_hash(payload['u'], code))
+
+@timed_email
 def send_verification_email(user, code):
     """
-    Sends an email with a verification code to the user.
+    Queues an email with a verification code to the user.
 
     Args:
         user (User): The user object to whom the email is sent.
@@ -28,13 +95,12 @@ def send_verification_email(user, code):
     html_content = render_to_string('emails/verification_email.html', {'code': code})
     text_content = strip_tags(html_content)
 
-    msg = EmailMultiAlternatives(subject, text_content, from_email, [to])
-    msg.attach_alternative(html_content, "text/html")
-    msg.send()
+    queue_email(subject, text_content, from_email, to, html_content)
 
+@timed_email
 def resend_verification_email(user, code):
     """
-    Sends a new verification email with a new code to the user.
+    Queues a new verification email with a new code to the user.
 
     Args:
         user (User): The user object to whom the email is sent.
@@ -47,13 +113,12 @@ def resend_verification_email(user, code):
     html_content = render_to_string('emails/resend_verification_email.html', {'code': code})
     text_content = strip_tags(html_content)
 
-    msg = EmailMultiAlternatives(subject, text_content, from_email, [to])
-    msg.attach_alternative(html_content, "text/html")
-    msg.send()
+    queue_email(subject, text_content, from_email, to, html_content)
 
+@timed_email
 def send_reservation_confirmation_email(reservation):
     """
-    Sends a confirmation email for a new reservation to the user.
+    Queues a confirmation email for a new reservation to the user.
 
     Args:
         reservation (Reservation): The reservation object for which the email is sent.
@@ -68,13 +133,12 @@ def send_reservation_confirmation_email(reservation):
     })
     text_content = strip_tags(html_content)
 
-    msg = EmailMultiAlternatives(subject, text_content, from_email, [to])
-    msg.attach_alternative(html_content, "text/html")
-    msg.send()
+    queue_email(subject, text_content, from_email, to, html_content)
 
+@timed_email
 def send_reservation_cancellation_email(reservation):
     """
-    Sends an email notification for a cancelled reservation to the user.
+    Queues an email notification for a cancelled reservation to the user.
 
     Args:
         reservation (Reservation): The reservation object that has been cancelled.
@@ -89,6 +153,56 @@ def send_reservation_cancellation_email(reservation):
     })
     text_content = strip_tags(html_content)
 
-    msg = EmailMultiAlternatives(subject, text_content, from_email, [to])
+    queue_email(subject, text_content, from_email, to, html_content)
+
+
+@timed_email
+def send_reservation_summary_email(reservations):
+    """
+    Queues a single confirmation email listing several new reservations.
+
+    Args:
+        reservations (list[Reservation]): The reservations booked together.
+    """
+    subject = 'New Reservations Confirmation'
+    from_email = settings.EMAIL_HOST_USER
+    user = reservations[0].user
+    to = user.email
+
+    html_content = render_to_string('emails/reservation_summary_email.html', {
+        'username': user.username,
+        'reservations': reservations
+    })
+    text_content = strip_tags(html_content)
+
+    queue_email(subject, text_content, from_email, to, html_content)
+
+
+def reservation_reminder_message(reservation, connection=None):
+    """
+    Builds the reminder email for an upcoming reservation.
+
+    The message reuses the confirmation template and is returned unsent so
+    callers can deliver many reminders over one connection.
+
+    Args:
+        reservation (Reservation): The upcoming reservation, with user and
+            court location loaded.
+        connection (optional): The email backend connection to send with.
+
+    Returns:
+        EmailMultiAlternatives: The reminder email.
+    """
+    subject = 'Reminder: Upcoming Reservation'
+    from_email = settings.EMAIL_HOST_USER
+    to = reservation.user.email
+
+    html_content = render_to_string('emails/reservation_confirmation_email.html', {
+        'username': reservation.user.username,
+        'reservation': reservation
+    })
+    text_content = strip_tags(html_content)
+
+    msg = EmailMultiAlternatives(subject, text_content, from_email, [to], connection=connection)
     msg.attach_alternative(html_content, "text/html")
-    msg.send()
+    return msg
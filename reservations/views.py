@@ -1,23 +1,314 @@
 from django.shortcuts import get_object_or_404, render, redirect
+from django.conf import settings
 from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import login, logout
 from django.utils import timezone
-from django.utils.timezone import make_aware
-from .utils import generate_code, send_verification_email, resend_verification_email, send_reservation_confirmation_email, send_reservation_cancellation_email
-from .models import Location, Reservation, User
+from django.urls import reverse
+from django.core import signing
+from .utils import VERIFICATION_COOKIE, VERIFICATION_CODE_MAX_AGE, check_verification_code, generate_code, make_verification_token, read_verification_token, send_verification_email, resend_verification_email, send_reservation_confirmation_email, send_reservation_cancellation_email, send_reservation_summary_email
+from .models import ArchivedReservation, CourtDayOccupancy, Location, Court, Reservation, User
 from .forms import ReservationForm, SignUpForm, LoginForm, UserAccountUpdateForm, CodeVerificationForm
-from django.db.models import Q
+from .availability import SLOT_HOURS, cached_occupancy, find_conflicts, free_hours, mask_string
+from .pagination import akeyset_page, akeyset_page_union
+from .catalog import aget_catalog, get_catalog, get_catalog_version
+from .decorators import async_login_required, rate_limit, read_replica
+from .booking import SlotUnavailable, book_reservations, cancel_booking
+from .exports import EXPORT_CHUNK_SIZE, calendar_token, calendar_token_user_id, csv_stream, ical_stream
+from .metrics import render_metrics
+from .ratelimit import rate_limit_counters
+from django.db.models import Max, Q
+from django.http import Http404, HttpResponse, HttpResponseBadRequest, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import condition
+import calendar
 import datetime
+import heapq
 from datetime import timedelta
 
 def home(request):
     return render(request, 'home.html')
 
-def locations_list(request):
-    locations = Location.objects.all()
+@read_replica
+async def locations_list(request):
+    request.user = await request.auser()
+    locations = (await aget_catalog()).locations
     return render(request, 'locations.html', {'locations': locations})
 
+GRID_MAX_DAYS = 14
+
+def grid_range(request):
+    """
+    Parses the date range of a location availability grid request.
+
+    The range starts at the 'start' query parameter (YYYY-MM-DD, defaults to
+    today) and covers 'days' days (defaults to 7, at most GRID_MAX_DAYS).
+
+    Returns:
+        list[date]: The dates of the grid.
+
+    Raises:
+        ValueError: If a parameter cannot be parsed.
+    """
+    start = request.GET.get('start')
+    start = datetime.date.fromisoformat(start) if start else timezone.localtime(timezone.now()).date()
+    days = min(max(int(request.GET.get('days', 7)), 1), GRID_MAX_DAYS)
+    return [start + timedelta(days=offset) for offset in range(days)]
+
+def location_grid_etag(request, id):
+    """
+    Builds the ETag of a location availability grid.
+
+    It combines the location's availability counter, which is bumped whenever
+    a reservation there is created or cancelled, with the catalog version and
+    the requested range, so it costs a single indexed lookup. The counter is
+    kept on the request so the view reads occupancy at least as recent as the
+    ETag it is served with.
+    """
+    version = Location.objects.filter(id=id).values_list('availability_version', flat=True).first()
+    if version is None:
+        return None
+    request.availability_version = version
+    try:
+        dates = grid_range(request)
+    except ValueError:
+        return None
+    return f'{id}-{version}-{get_catalog_version()}-{dates[0].isoformat()}-{len(dates)}'
+
+@condition(etag_func=location_grid_etag)
+def location_availability(request, id):
+    """
+    Returns the courts x hours availability grid of a location as JSON.
+
+    Occupancy of every court of the location over the requested dates is read
+    from the occupancy cache, with a single query for any cold or outdated
+    entries. Each court carries one string per date with a '1' for every
+    booked hour of the grid. Responses carry an ETag, so clients polling with
+    If-None-Match get a 304 until a reservation changes.
+
+    Returns:
+        JsonResponse: The grid hours and the occupancy of every court, or a 400
+        response if the range cannot be parsed.
+    """
+    location = get_catalog().locations_by_id.get(id)
+    if location is None:
+        raise Http404('Location not found.')
+
+    try:
+        dates = grid_range(request)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid range, expected start=YYYY-MM-DD and an integer days.'}, status=400)
+
+    court_ids = [court.id for court in location.courts]
+    version = getattr(request, 'availability_version', None)
+    bitmaps = cached_occupancy(court_ids, dates, None if version is None else dict.fromkeys(court_ids, version))
+    return JsonResponse({
+        'location': location.id,
+        'dates': [day.isoformat() for day in dates],
+        'hours': [f'{hour:02}:00' for hour in SLOT_HOURS],
+        'courts': [
+            {
+                'id': court.id,
+                'name': court.name,
+                'occupancy': {day.isoformat(): mask_string(bitmaps[(court.id, day)]) for day in dates},
+            }
+            for court in location.courts
+        ],
+    })
+
+REPORT_DEFAULT_DAYS = 28
+REPORT_MAX_DAYS = 366
+
+def report_range(request):
+    """
+    Parses the inclusive 'start' and 'end' dates (YYYY-MM-DD) of a report.
+
+    Defaults to the REPORT_DEFAULT_DAYS days ending today.
+
+    Returns:
+        list[date]: The dates of the report.
+
+    Raises:
+        ValueError: If a date cannot be parsed, the range is reversed or it is
+        longer than REPORT_MAX_DAYS.
+    """
+    today = timezone.localtime(timezone.now()).date()
+    end = datetime.date.fromisoformat(request.GET['end']) if request.GET.get('end') else today
+    start = datetime.date.fromisoformat(request.GET['start']) if request.GET.get('start') else end - timedelta(days=REPORT_DEFAULT_DAYS - 1)
+    days = (end - start).days + 1
+    if not 1 <= days <= REPORT_MAX_DAYS:
+        raise ValueError('Invalid report range.')
+    return [start + timedelta(days=offset) for offset in range(days)]
+
+@read_replica
+@staff_member_required(login_url='/login/')
+def utilization_report(request, id):
+    """
+    Displays the hourly utilization heatmaps of a location for staff.
+
+    Only the CourtDayOccupancy rollup is read, with one query returning at
+    most one row per court and day of the range, so the cost does not depend
+    on how much reservation history exists. Utilization is the share of days
+    in the range on which an hour was booked, per court and per weekday.
+
+    Returns:
+        HttpResponse: Renders 'utilization_report.html', or a 400 response if
+        the range cannot be parsed.
+    """
+    catalog = get_catalog()
+    location = catalog.locations_by_id.get(id)
+    if location is None:
+        raise Http404('Location not found.')
+    try:
+        dates = report_range(request)
+    except ValueError:
+        return HttpResponseBadRequest(f'Invalid range, expected start and end as YYYY-MM-DD at most {REPORT_MAX_DAYS} days apart.')
+
+    court_counts = {court.id: [0] * len(SLOT_HOURS) for court in location.courts}
+    weekday_counts = [[0] * len(SLOT_HOURS) for _ in range(7)]
+    rollup = CourtDayOccupancy.objects.filter(court__in=court_counts, date__gte=dates[0], date__lte=dates[-1])
+    for court_id, date, mask in rollup.values_list('court_id', 'date', 'hours_mask'):
+        for index in range(len(SLOT_HOURS)):
+            if mask >> index & 1:
+                court_counts[court_id][index] += 1
+                weekday_counts[date.weekday()][index] += 1
+
+    def cells(counts, total):
+        percents = [round(100 * count / total) if total else 0 for count in counts]
+        return [{'percent': percent, 'alpha': f'{percent / 100:.2f}'} for percent in percents]
+
+    weekday_days = [sum(1 for day in dates if day.weekday() == weekday) * len(location.courts) for weekday in range(7)]
+    return render(request, 'utilization_report.html', {
+        'location': location,
+        'locations': catalog.locations,
+        'start': dates[0],
+        'end': dates[-1],
+        'hours': [f'{hour:02}:00' for hour in SLOT_HOURS],
+        'court_rows': [
+            {'name': court.name, 'cells': cells(court_counts[court.id], len(dates)),
+             'total': round(100 * sum(court_counts[court.id]) / (len(dates) * len(SLOT_HOURS)))}
+            for court in location.courts
+        ],
+        'weekday_rows': [
+            {'name': calendar.day_name[weekday], 'cells': cells(weekday_counts[weekday], weekday_days[weekday])}
+            for weekday in range(7)
+        ],
+    })
+
+def calendar_feed_last_modified(request, token):
+    """
+    Returns when any reservation of the feed's user last changed or was
+    archived, since archiving removes it from the Reservation table.
+    """
+    user_id = calendar_token_user_id(token)
+    if user_id is None:
+        return None
+    changes = [
+        Reservation.objects.filter(user_id=user_id).aggregate(Max('updated_at'))['updated_at__max'],
+        ArchivedReservation.objects.filter(user_id=user_id).aggregate(Max('archived_at'))['archived_at__max'],
+    ]
+    return max((change for change in changes if change is not None), default=None)
+
+@condition(last_modified_func=calendar_feed_last_modified)
+def calendar_feed(request, token):
+    """
+    Streams the confirmed reservations of a user as an iCalendar feed.
+
+    The feed is addressed by a signed token so calendar apps can subscribe to
+    it without logging in. Polls with an If-Modified-Since newer than the
+    user's last reservation change are answered with 304 after two indexed
+    queries.
+
+    Returns:
+        StreamingHttpResponse: The 'text/calendar' feed.
+
+    Raises:
+        Http404: If the token is invalid.
+    """
+    user_id = calendar_token_user_id(token)
+    if user_id is None:
+        raise Http404('Calendar not found.')
+    reservations = Reservation.objects.filter(user_id=user_id, status='confirmed').select_related(
+        'court__location'
+    ).order_by('date', 'start_time', 'id')
+    response = StreamingHttpResponse(ical_stream(reservations, request.get_host()), content_type='text/calendar; charset=utf-8')
+    response['Content-Disposition'] = 'inline; filename="reservations.ics"'
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+@staff_member_required(login_url='/login/')
+def reservations_export(request):
+    """
+    Streams every reservation, archived ones included, as CSV for staff.
+
+    The optional 'start' and 'end' dates (YYYY-MM-DD) and 'status' narrow the
+    export. Both tables are read with chunked iterators and merged by id, so
+    memory use stays flat however many rows are exported.
+
+    Returns:
+        StreamingHttpResponse: The CSV attachment, or a 400 response if a date
+        cannot be parsed.
+    """
+    filters = {}
+    try:
+        if request.GET.get('start'):
+            filters['date__gte'] = datetime.date.fromisoformat(request.GET['start'])
+        if request.GET.get('end'):
+            filters['date__lte'] = datetime.date.fromisoformat(request.GET['end'])
+    except ValueError:
+        return HttpResponseBadRequest('Invalid date, expected YYYY-MM-DD.')
+    if request.GET.get('status'):
+        filters['status'] = request.GET['status']
+
+    rows = heapq.merge(
+        *(
+            model.objects.filter(**filters).select_related('court__location', 'user').order_by('id')
+            .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+            for model in (ArchivedReservation, Reservation)
+        ),
+        key=lambda reservation: reservation.pk,
+    )
+    response = StreamingHttpResponse(csv_stream(rows), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = 'attachment; filename="reservations.csv"'
+    return response
+
+def metrics(request):
+    """
+    Exposes the request, SQL, template, email and rate limit metrics in the
+    Prometheus text format.
+
+    Scrapers from METRICS_ALLOWED_IPS need no login; anyone else must be staff.
+    The list is empty unless configured, since REMOTE_ADDR is the proxy's
+    address behind a reverse proxy.
+
+    Returns:
+        HttpResponse: The metrics document, or a 403 response.
+    """
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS and not request.user.is_staff:
+        return HttpResponseForbidden('Forbidden')
+    return HttpResponse(render_metrics(rate_limit_counters()), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+def set_verification_cookie(response, user, code):
+    """
+    Stores the pending email verification in a signed cookie on the response.
+    """
+    response.set_cookie(
+        VERIFICATION_COOKIE, make_verification_token(user, code),
+        max_age=24 * 60 * 60, httponly=True, samesite='Lax',
+    )
+    return response
+
+def posted_username(request):
+    return request.POST.get('username', '').strip().lower() or None
+
+def posted_email(request):
+    return request.POST.get('email', '').strip().lower() or None
+
+def verifying_user_id(request):
+    payload = read_verification_token(request.COOKIES.get(VERIFICATION_COOKIE))
+    return payload['u'] if payload else None
+
+@rate_limit('signup', account=posted_email)
 def signup_view(request):
     """
     Handles user signup process.
@@ -26,6 +317,7 @@ def signup_view(request):
         - Validates SignUpForm.
         - Saves the user as inactive.
         - Generates and sends a verification code via email.
+        - Stores the pending verification in a signed cookie.
         - Redirects to 'verify_email' page.
 
     If request method is GET:
@@ -44,13 +336,10 @@ def signup_view(request):
             user.is_active = False
             user.save()
             code = generate_code()
-            request.session['code'] = code
-            request.session['user_id'] = user.id
-            request.session['code_generated_at'] = timezone.now().strftime('%Y-%m-%d %H:%M:%S') 
 
             send_verification_email(user, code)
 
-            return redirect('verify_email')
+            return set_verification_cookie(redirect('verify_email'), user, code)
     else:
         form = SignUpForm()
     return render(request, 'registration/signup.html', {'form': form})
@@ -60,70 +349,72 @@ def verify_email(request):
     Handles the email verification process for user registration.
 
     This view checks the validity of the verification code submitted by the user
-    against the code stored in the session. If valid, it activates the user account
-    and redirects to the login page. If invalid or expired, it displays appropriate
-    error messages.
+    against the hash held in the signed verification cookie. If valid, it activates
+    the user account and redirects to the login page. If invalid or expired, it
+    displays appropriate error messages. The user id and email come from the
+    cookie, so neither the session nor the user table is read.
 
     Returns:
         HttpResponse: Renders the 'registration/verify_email.html' template with
         the verification form and user email context.
     """
-    user_email = User.objects.get(id=request.session['user_id']).email
+    payload = read_verification_token(request.COOKIES.get(VERIFICATION_COOKIE))
+    if payload is None:
+        messages.error(request, 'Session expired. Please sign up again.')
+        return redirect('signup')
+
+    user_email = payload['e']
     if request.method == 'POST':
         form = CodeVerificationForm(request.POST)
         if form.is_valid():
             code = form.cleaned_data.get('code')
-            code_generated_at = request.session.get('code_generated_at')
-            
-            if code_generated_at:
-                code_generated_at = make_aware(timezone.datetime.strptime(code_generated_at, '%Y-%m-%d %H:%M:%S'))
-                if timezone.now() - code_generated_at > timedelta(minutes=3):
-                    messages.error(request, 'Code has expired. Please request a new code.')
-                    return render(request, 'registration/verify_email.html', {'form': form, 'user_email': user_email})
-
-            if code == request.session.get('code'):
-                user_id = request.session.get('user_id')
-                user = User.objects.get(id=user_id)
-                user.is_active = True
-                user.save()
-                del request.session['code']
-                del request.session['user_id']
-                del request.session['code_generated_at']
+
+            try:
+                read_verification_token(request.COOKIES[VERIFICATION_COOKIE], max_age=VERIFICATION_CODE_MAX_AGE)
+            except signing.SignatureExpired:
+                messages.error(request, 'Code has expired. Please request a new code.')
+                return render(request, 'registration/verify_email.html', {'form': form, 'user_email': user_email})
+
+            if check_verification_code(payload, code):
+                User.objects.filter(id=payload['u']).update(is_active=True)
                 messages.success(request, 'Your email has been verified. You can now log in.')
-                return redirect('login')
+                response = redirect('login')
+                response.delete_cookie(VERIFICATION_COOKIE, samesite='Lax')
+                return response
             else:
                 messages.error(request, 'Invalid code')
     else:
         form = CodeVerificationForm()
     return render(request, 'registration/verify_email.html', {'form': form, 'user_email': user_email})
 
+@rate_limit('resend_code', account=verifying_user_id, methods=None)
 def resend_code(request):
     """
     Resends a new verification code to the user's email for account activation.
 
-    This view generates a new verification code, stores it in the session, and
-    sends it to the user's email address stored in the session. It also handles
-    session expiration and redirects to the signup page if necessary.
+    This view generates a new verification code, stores its hash in a fresh
+    signed verification cookie, and sends it to the user's email address. It
+    also handles a missing or invalid cookie and redirects to the signup page
+    if necessary.
 
     Returns:
         HttpResponseRedirect: Redirects to the 'verify_email' view after sending
         the new verification code.
     """
-    user_id = request.session.get('user_id')
-    if not user_id:
+    payload = read_verification_token(request.COOKIES.get(VERIFICATION_COOKIE))
+    if payload is None:
         messages.error(request, 'Session expired. Please sign up again.')
         return redirect('signup')
 
-    user = User.objects.get(id=user_id)
+    user = User(id=payload['u'], email=payload['e'])
     code = generate_code()
-    request.session['code'] = code
-    request.session['code_generated_at'] = timezone.now().strftime('%Y-%m-%d %H:%M:%S')
 
     resend_verification_email(user, code)
 
     messages.success(request, 'A new code has been sent to your email.')
-    return redirect('verify_email')
+    return set_verification_cookie(redirect('verify_email'), user, code)
 
+@rate_limit('login', account=posted_username)
 def login_view(request):
     """
     Handles user authentication and login process.
@@ -185,20 +476,25 @@ def my_account(request):
     else:
         form = UserAccountUpdateForm(instance=request.user)
     
-    return render(request, 'registration/my_account.html', {'form': form})
-
-@login_required(login_url='/login/')
-def reservations_list(request):
+    return render(request, 'registration/my_account.html', {
+        'form': form,
+        'calendar_feed_url': request.build_absolute_uri(reverse('calendar_feed', args=[calendar_token(request.user)])),
+    })
+
+@read_replica
+@async_login_required(login_url='/login/')
+async def reservations_list(request):
     """
     Displays a list of upcoming reservations for the logged-in user.
 
     This view retrieves upcoming reservations from the database based on the current
     date and time. It filters reservations that are confirmed and haven't passed yet.
-    The filtered reservations are then rendered in the 'reservations.html' template.
+    The filtered reservations are paginated with a keyset cursor taken from the
+    'after' query parameter and rendered in the 'reservations.html' template.
 
     Returns:
-        HttpResponse: Renders the 'reservations.html' template with the upcoming
-        reservations retrieved from the database.
+        HttpResponse: Renders the 'reservations.html' template with one page of
+        upcoming reservations and the cursor of the next page.
     """
     now = timezone.localtime(timezone.now())
     today = now.date()
@@ -207,9 +503,13 @@ def reservations_list(request):
         Q(user=request.user) &
         Q(status='confirmed') &
         (Q(date__gt=today) | (Q(date=today) & Q(start_time__gt=now.time())))
-    ).order_by('date', 'start_time')
+    )
+    upcoming_reservations, next_cursor = await akeyset_page(upcoming_reservations, request.GET.get('after'))
 
-    return render(request, 'reservations.html', {'upcoming_reservations': upcoming_reservations})
+    return render(request, 'reservations.html', {
+        'upcoming_reservations': upcoming_reservations,
+        'next_cursor': next_cursor,
+    })
 
 @login_required(login_url='/login/')
 def new_reservation(request):
@@ -217,9 +517,10 @@ def new_reservation(request):
     Handles the creation of a new reservation.
 
     This view processes the submission of a reservation form, validates the form data,
-    checks for conflicting reservations, and sends a confirmation email upon successful
-    reservation creation. It also handles errors related to date/time validation and
-    conflicting bookings.
+    expands it into one occurrence per week and selected court, checks every occurrence
+    for conflicts with a single query, books them all-or-nothing in one transaction and
+    sends one confirmation or summary email upon success. It also handles errors related
+    to date/time validation and conflicting bookings.
 
     Returns:
         HttpResponse: Renders the 'new_reservation.html' template with the reservation
@@ -246,66 +547,120 @@ def new_reservation(request):
             end_time = (datetime.datetime.combine(reservation.date, end_time) - timedelta(minutes=1)).time()
             reservation.end_time = end_time.strftime('%H:%M')
 
-            conflicting_reservations = Reservation.objects.filter(
-                court=reservation.court,
-                date=reservation.date,
-                start_time__lte=reservation.end_time,
-                end_time__gte=reservation.start_time,
-                status = 'confirmed',
-            ).exclude(pk=reservation.pk)
+            reservations = form.occurrences(reservation)
+            conflicts = find_conflicts(reservations)
+            if conflicts:
+                if len(reservations) == 1:
+                    messages.error(request, 'Court is already booked for this time.')
+                else:
+                    booked = ', '.join(f'{conflict.court.name} on {conflict.date}' for conflict in conflicts)
+                    messages.error(request, f'Court is already booked for this time: {booked}.')
+                return render(request, 'new_reservation.html', {'form': form})
 
-            if conflicting_reservations.exists():
-                messages.error(request, 'Court is already booked for this time.')
+            try:
+                book_reservations(reservations)
+            except SlotUnavailable as error:
+                messages.error(request, str(error))
                 return render(request, 'new_reservation.html', {'form': form})
 
-            reservation.save()
-            send_reservation_confirmation_email(reservation)
-            messages.success(request, 'Reservation created successfully and confirmation email sent.')
+            if len(reservations) == 1:
+                send_reservation_confirmation_email(reservations[0])
+                messages.success(request, 'Reservation created successfully and confirmation email sent.')
+            else:
+                send_reservation_summary_email(reservations)
+                messages.success(request, f'{len(reservations)} reservations created successfully and confirmation email sent.')
             return redirect('reservations_list')
     else:
         form = ReservationForm()
 
     return render(request, 'new_reservation.html', {'form': form})
 
-@login_required(login_url='/login/')
-def past_reservations(request):
+def court_availability(request, id):
+    """
+    Returns the free one-hour slots of a court for a given date as JSON.
+
+    The date is read from the 'date' query parameter (YYYY-MM-DD) and defaults
+    to today. Slots that have already started today are not reported as free.
+
+    Returns:
+        JsonResponse: The court id, the date and the list of free start times,
+        or a 400 response if the date cannot be parsed.
+    """
+    court = get_object_or_404(Court, id=id)
+    now = timezone.localtime(timezone.now())
+
+    try:
+        date = datetime.datetime.strptime(request.GET['date'], '%Y-%m-%d').date() if 'date' in request.GET else now.date()
+    except ValueError:
+        return JsonResponse({'error': 'Invalid date, expected YYYY-MM-DD.'}, status=400)
+
+    if date < now.date():
+        free = []
+    else:
+        free = free_hours(court.id, date)
+        if date == now.date():
+            free = [start for start in free if int(start[:2]) > now.hour]
+
+    return JsonResponse({'court': court.id, 'date': date.isoformat(), 'free': free})
+
+@read_replica
+@async_login_required(login_url='/login/')
+async def past_reservations(request):
     """
     Displays a list of past reservations for the logged-in user.
 
     This view retrieves past reservations from the database based on the current
     date and time. It filters reservations that are confirmed and have already passed.
-    The filtered reservations are then rendered in the 'past_reservations.html' template.
+    Reservations moved to the archive are included, and both tables are paginated
+    together newest first with a keyset cursor and rendered in the
+    'past_reservations.html' template.
 
     Returns:
-        HttpResponse: Renders the 'past_reservations.html' template with the past
-        reservations retrieved from the database.
+        HttpResponse: Renders the 'past_reservations.html' template with one page of
+        past reservations and the cursor of the next page.
     """
     now = timezone.localtime(timezone.now())
     today = now.date()
 
-    past_reservations = Reservation.objects.filter(
+    past = (
         Q(user=request.user) &
         Q(status='confirmed') & 
         (Q(date__lt=today) | (Q(date=today) & Q(end_time__lt=now.time())))
-    ).order_by('-date')
-
-    return render(request, 'past_reservations.html', {'past_reservations': past_reservations})
-
-@login_required(login_url='/login/')
-def cancelled_reservations(request):
+    )
+    past_reservations, next_cursor = await akeyset_page_union(
+        [Reservation.objects.filter(past), ArchivedReservation.objects.filter(past)],
+        request.GET.get('after'), descending=True,
+    )
+
+    return render(request, 'past_reservations.html', {
+        'past_reservations': past_reservations,
+        'next_cursor': next_cursor,
+    })
+
+@read_replica
+@async_login_required(login_url='/login/')
+async def cancelled_reservations(request):
     """
     Displays a list of cancelled reservations for the logged-in user.
 
     This view retrieves cancelled reservations from the database and filters them
-    based on the logged-in user. The filtered reservations are then rendered in
-    the 'cancelled_reservations.html' template.
+    based on the logged-in user, including archived ones. Both tables are paginated
+    together newest first with a keyset cursor and rendered in the
+    'cancelled_reservations.html' template.
 
     Returns:
-        HttpResponse: Renders the 'cancelled_reservations.html' template with the
-        cancelled reservations retrieved from the database.
+        HttpResponse: Renders the 'cancelled_reservations.html' template with one page
+        of cancelled reservations and the cursor of the next page.
     """
-    cancelled_reservations = Reservation.objects.filter(user=request.user, status='cancelled').order_by('-date')
-    return render(request, 'cancelled_reservations.html', {'cancelled_reservations': cancelled_reservations})
+    cancelled_reservations, next_cursor = await akeyset_page_union(
+        [model.objects.filter(user=request.user, status='cancelled') for model in (Reservation, ArchivedReservation)],
+        request.GET.get('after'), descending=True,
+    )
+
+    return render(request, 'cancelled_reservations.html', {
+        'cancelled_reservations': cancelled_reservations,
+        'next_cursor': next_cursor,
+    })
 
 @login_required(login_url='/login/')
 def cancel_reservation(request, id):
@@ -330,12 +685,12 @@ def cancel_reservation(request, id):
 
         if reservation.date == now.date()and time_difference.total_seconds() / 3600 < 2:
            messages.error(request, 'Reservation cannot be cancelled less than 2 hours before start time.')
-        else:
-            reservation.status = 'cancelled'
-            reservation.save()
+        elif cancel_booking(reservation):
             send_reservation_cancellation_email(reservation)
             messages.info(request, 'Reservation cancelled')
             return redirect('reservations_list')
+        else:
+            messages.error(request, 'Reservation cannot be cancelled.')
     else:
         messages.error(request, 'Reservation cannot be cancelled.')
 
@@ -43,6 +43,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'reservations.middleware.StaticFilesMiddleware',
+    'reservations.middleware.MetricsMiddleware',
+    'reservations.middleware.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -55,7 +58,8 @@ ROOT_URLCONF = 'reservations_project.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates that reports render time to the metrics middleware.
+        'BACKEND': 'reservations.metrics.TimedDjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -64,6 +68,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'reservations.context_processors.fragment_cache',
             ],
         },
     },
@@ -79,9 +84,106 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Reuse connections across requests instead of reopening the file.
+        'CONN_MAX_AGE': int(os.environ.get('RESERVATIONS_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Applied to every new SQLite connection by reservations.signals. WAL lets
+# readers proceed while a booking commits, busy_timeout makes writers wait for
+# the lock instead of failing, and synchronous=NORMAL is safe under WAL.
+# Compare settings with `python manage.py bench_sqlite_writes`.
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'busy_timeout': 5000,
+    'synchronous': 'normal',
+    'mmap_size': 128 * 1024 * 1024,
+    'cache_size': -20000,
+}
+
+# Reservations older than this many days are moved to the archive table by
+# `python manage.py archive_reservations`.
+
+RESERVATION_ARCHIVE_DAYS = int(os.environ.get('RESERVATIONS_ARCHIVE_DAYS', 180))
+
+# Read replica for the listing views. Point RESERVATIONS_REPLICA_DB at a second
+# SQLite file and refresh it with `python manage.py sync_replica`.
+
+if os.environ.get('RESERVATIONS_REPLICA_DB'):
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ['RESERVATIONS_REPLICA_DB'],
+        'CONN_MAX_AGE': DATABASES['default']['CONN_MAX_AGE'],
+        'CONN_HEALTH_CHECKS': True,
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['reservations.routers.PrimaryReplicaRouter']
+
+# After a write, the client's reads stay on the primary for this many seconds.
+# Keep it above the sync_replica interval.
+
+REPLICA_PIN_SECONDS = int(os.environ.get('RESERVATIONS_REPLICA_PIN_SECONDS', 30))
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# The court catalog and availability caches are invalidated through this cache.
+# The default local-memory cache is per process: run a single worker process
+# with it. To share one cache between several workers, point
+# RESERVATIONS_CACHE_DIR at a directory for the file-based cache, or set
+# RESERVATIONS_REDIS_URL to use Redis.
+
+if os.environ.get('RESERVATIONS_REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['RESERVATIONS_REDIS_URL'],
+        }
+    }
+elif os.environ.get('RESERVATIONS_CACHE_DIR'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ['RESERVATIONS_CACHE_DIR'],
+            'OPTIONS': {'MAX_ENTRIES': 100000},
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'reservations',
+            'OPTIONS': {'MAX_ENTRIES': 100000},
+        }
+    }
+
+# Clients allowed to scrape /metrics without a staff login, as a comma-separated
+# RESERVATIONS_METRICS_ALLOWED_IPS. None by default: behind a reverse proxy on
+# the same host every client would have the proxy's loopback address.
+
+METRICS_ALLOWED_IPS = [ip.strip() for ip in os.environ.get('RESERVATIONS_METRICS_ALLOWED_IPS', '').split(',') if ip.strip()]
+
+# Token buckets of the rate limited views, per client IP and per account, as
+# (refill rate, burst). Scopes left out are not limited. Check how often the
+# limits trigger with `python manage.py rate_limit_stats`.
+
+RATE_LIMITS = {
+    'login': {'ip': ('30/m', 30), 'account': ('5/m', 10)},
+    'signup': {'ip': ('10/h', 10), 'account': ('5/h', 5)},
+    'resend_code': {'ip': ('20/h', 10), 'account': ('6/h', 3)},
+}
+
+
+# Sessions
+# Cache-first sessions: reads come from the cache and unchanged sessions are
+# never written back to the django_session table.
+
+SESSION_ENGINE = 'reservations.sessions'
+SESSION_SAVE_EVERY_REQUEST = False
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -118,6 +220,13 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/5.0/howto/static-files/
 
 STATIC_URL = '/static/'
+STATIC_ROOT = Path(BASE_DIR) / 'staticfiles'
+
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    # Content-hashed names plus gzip siblings; run collectstatic on deploy.
+    'staticfiles': {'BACKEND': 'reservations.staticfiles.CompressedManifestStaticFilesStorage'},
+}
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = Path(BASE_DIR) / 'media'